@@ -0,0 +1,102 @@
+"""企業查詢延遲：原本「研發、設備、上市櫃三段明細查詢 + pandas 組別對應」與企業 360 概覽表單次主鍵查找的比較。
+
+執行：python benchmarks/bench_company_lookup.py [--scale 1] [--db 其他資料庫.sqlite] [--companies 50] [--repeat 5]
+預設使用 synth_data 產生的暫存資料庫（放大 --scale 倍，已執行 migrate）；指定 --db 時複製到暫存目錄後才 migrate，
+不會改動 mydb.sqlite 或指定的檔案。
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import search_db  # noqa: E402
+import synth_data  # noqa: E402
+
+
+# 原本 searchV6_Lite.py 的做法：三段明細各自查詢，設備組別於 pandas 對應，指標由明細計算
+def legacy_lookup(conn, company_id):
+    rd_sql, rd_params = search_db.rd_query(company_id=company_id)
+    rd = pd.read_sql(rd_sql, conn, params=rd_params)
+    smart = pd.read_sql(
+        """
+        SELECT a.*, b.apply_amount, b.final_review
+        FROM smart_project AS a
+        LEFT JOIN smart_item AS b
+        ON a.apply_year = b.apply_year AND a.company_id = b.company_id AND a.plan_name = b.plan_name
+        WHERE a.company_id = ?
+        """,
+        conn, params=[int(company_id)],
+    )
+    smart["group"] = smart["industry_category"].map(search_db.INDUSTRY_GROUP_MAP)
+    ipo_sql, ipo_params = search_db.ipo_query(company_id=company_id)
+    ipo = pd.read_sql(ipo_sql, conn, params=ipo_params)
+    amount = pd.to_numeric(rd["apply_amount"], errors="coerce")
+    return len(rd), amount.sum(), amount[rd["approved"] == "通過"].sum(), len(smart), len(ipo)
+
+
+def lookup_360(conn, company_id):
+    rows = search_db.company_overview(conn, company_id=company_id)
+    return search_db.overview_metrics(rows, "rd"), search_db.overview_metrics(rows, "smart")
+
+
+def timings(fn, conn, ids, repeat):
+    samples = []
+    for _ in range(repeat):
+        for company_id in ids:
+            start = time.perf_counter()
+            fn(conn, company_id)
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+# 指定的資料庫以 backup API 複製（唯讀開啟來源），migrate 只作用在複本上
+def copy_database(source, path):
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    dst = sqlite3.connect(path)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+    search_db.migrate(dst)
+    dst.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=1, help="合成資料庫的放大倍數")
+    parser.add_argument("--db", help="改用此資料庫的暫存複本")
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    if args.db:
+        path = copy_database(args.db, os.path.join(tmp.name, "bench_company_lookup.sqlite"))
+    else:
+        path = synth_data.cached_database(args.scale)
+    conn = search_db.connect(path)
+    ids = [str(row[0]) for row in conn.execute("SELECT company_id FROM company_360")]
+    ids = random.Random(0).sample(ids, min(args.companies, len(ids)))
+
+    print(f"{len(ids)} 家公司 × {args.repeat} 次（毫秒）")
+    print(f"{'':>10} {'p50':>8} {'p95':>8}")
+    legacy = timings(legacy_lookup, conn, ids, args.repeat)
+    single = timings(lookup_360, conn, ids, args.repeat)
+    print(f"{'legacy':>10} {legacy[0]:8.3f} {legacy[1]:8.3f}")
+    print(f"{'360':>10} {single[0]:8.3f} {single[1]:8.3f}")
+    print(f"{'speedup':>10} {legacy[0] / single[0]:7.1f}x {legacy[1] / single[1]:7.1f}x")
+    conn.close()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
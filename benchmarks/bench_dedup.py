@@ -0,0 +1,56 @@
+"""重複申請人合併：合併耗時隨紀錄筆數的變化（確認接近線性），以及合併筆數是否符合預期。
+
+每位合成申請人有一筆護照紀錄；三分之一另有一份沒有護照號碼與出生日期的履歷（依姓名合併），
+五分之一另有一份英文姓名有 OCR 錯字的申請表（依出生日期區塊內的模糊比對合併）。
+
+執行：python benchmarks/bench_dedup.py [--sizes 1000 5000 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dedup import merge_duplicates  # noqa: E402
+from ocr_profiles import load_profile  # noqa: E402
+
+
+def make_records(profile, applicants, rng):
+    records = []
+    for i in range(applicants):
+        base = {col: "N/A" for col in profile.columns}
+        base.update({
+            "英文名字＋英文姓氏": f"Person{i} Lastname{rng.randrange(300)}",
+            "護照號碼": f"P{i:08d}",
+            "出生日期": f"{rng.randrange(1960, 2000)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+            "來源檔案": f"passport_{i}.pdf",
+        })
+        records.append(base)
+        if i % 3 == 0:
+            records.append({**base, "護照號碼": "N/A", "出生日期": "N/A", "工作經歷": "履歷內容", "來源檔案": f"cv_{i}.pdf"})
+        if i % 5 == 0:
+            typo = base["英文名字＋英文姓氏"].replace("son", "sn")
+            records.append({**base, "護照號碼": "N/A", "英文名字＋英文姓氏": typo, "來源檔案": f"form_{i}.pdf"})
+    rng.shuffle(records)
+    return records, len(records) - applicants
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000], help="申請人數")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    profile = load_profile("goldencard")
+    print(f"{'紀錄數':>8} {'合併':>8} {'預期':>8} {'耗時(s)':>9} {'每千筆(ms)':>11}")
+    for size in args.sizes:
+        records, expected = make_records(profile, size, random.Random(args.seed))
+        start = time.perf_counter()
+        _, merged = merge_duplicates(records, profile)
+        seconds = time.perf_counter() - start
+        print(f"{len(records):>8} {merged:>8} {expected:>8} {seconds:>9.3f} {seconds / len(records) * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""OCR 結果 Excel 美化：原本「寫入 → 重新載入 → 逐格套樣式 → 再存檔」與單次寫入 named style 的比較。
+
+執行：python benchmarks/bench_excel_style.py [--sizes 10 100 1000] [--repeat 3]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.styles import Alignment, Font, PatternFill
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from excel_style import write_styled_workbook  # noqa: E402
+
+COLUMNS = [
+    "英文名字＋英文姓氏", "中文姓名", "性別", "國籍", "學歷＋學校＋科系",
+    "申請資格條件", "出生日期", "護照號碼", "子領域", "現職公司", "現職職稱",
+    "其他工作經歷", "現職是否為主管", "教育背景(學校)", "教育背景(系所)",
+    "工作經歷", "產業實績專長", "求學期間", "畢業年份", "總工作年資",
+    "審查意見或備注", "勞動部檢核結果", "是否為轉自其他領域", "第1次申請", "年齡", "月薪", "來源檔案",
+]
+WIDTH_MAP = {col: 20 for col in COLUMNS} | {"工作經歷": 80, "審查意見或備注": 80}
+
+
+def make_frame(n):
+    long_text = "2019-01~2024-06_範例科技股份有限公司_資深軟體工程師，負責雲端平台開發與系統架構設計。" * 4
+    rows = [
+        {col: (long_text if col in ("工作經歷", "審查意見或備注") else f"{col}-{i}") for col in COLUMNS}
+        for i in range(n)
+    ]
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+# 原本 auto_aiV3.py 的做法
+def legacy_styled_workbook(df, width_map):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine="openpyxl")
+    buffer.seek(0)
+    wb = load_workbook(buffer)
+    ws = wb.active
+    default_font = Font(size=14)
+    for cell in ws[1]:
+        cell.font = Font(bold=True, color="FFFFFF", size=14)
+        cell.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+    for idx, col_name in enumerate(df.columns, start=1):
+        if col_name in width_map:
+            ws.column_dimensions[ws.cell(row=1, column=idx).column_letter].width = width_map[col_name]
+    for row in range(2, ws.max_row + 1):
+        ws.row_dimensions[row].height = 180
+    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
+        for cell in row:
+            if cell.value:
+                cell.font = default_font
+                cell.alignment = Alignment(wrap_text=True, vertical="top")
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'筆數':>6} {'原做法(s)':>10} {'單次寫入(s)':>12} {'加速':>6}")
+    for n in args.sizes:
+        df = make_frame(n)
+        legacy = best_of(lambda: legacy_styled_workbook(df, WIDTH_MAP), args.repeat)
+        single = best_of(lambda: write_styled_workbook(df, WIDTH_MAP), args.repeat)
+        print(f"{n:>6} {legacy:>10.3f} {single:>12.3f} {legacy / single:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
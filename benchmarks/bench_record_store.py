@@ -0,0 +1,81 @@
+"""過往申請人紀錄庫：增量加入的吞吐量，以及相似申請人 top-k 查詢延遲隨紀錄數的變化。
+
+合成紀錄由公司、職稱、學校、技能詞庫隨機組合（含中英文工作經歷），每批 --batch 筆逐批加入，
+每到 --checkpoints 指定的筆數時，以隨機抽出的既有紀錄查詢相似申請人 --queries 次。
+
+執行：python benchmarks/bench_record_store.py [--checkpoints 1000 10000 30000] [--batch 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from record_store import RecordStore  # noqa: E402
+
+COMPANIES = ["台積電", "聯發科", "鴻海精密", "Google", "Microsoft", "Amazon", "NVIDIA", "廣達電腦", "華碩電腦",
+             "宏碁", "趨勢科技", "Meta", "Apple", "瑞昱半導體", "日月光", "Intel", "Samsung", "Sony"]
+TITLES = ["資深軟體工程師", "產品經理", "研發處長", "資料科學家", "技術長", "硬體設計工程師", "專案經理", "架構師"]
+SCHOOLS = ["國立臺灣大學", "國立清華大學", "MIT", "Stanford University", "東京大學", "新加坡國立大學", "UC Berkeley"]
+SKILLS = ["機器學習", "半導體製程", "晶片設計", "雲端架構", "資訊安全", "電子商務", "金融科技", "自然語言處理",
+          "電腦視覺", "嵌入式系統", "供應鏈管理", "數位行銷", "區塊鏈", "生物資訊", "自駕車", "無線通訊"]
+SURNAMES = "陳林黃張李王吳劉蔡楊許鄭謝郭洪曾邱廖賴徐"
+GIVEN = "志明美玲家豪淑芬俊傑雅婷建宏怡君宗翰佩珊冠宇欣怡承恩詩涵"
+
+
+def make_record(rng, i):
+    company = rng.choice(COMPANIES)
+    history = "；".join(
+        f"{rng.randint(2005, 2023)} 年任職 {rng.choice(COMPANIES)} {rng.choice(TITLES)}，負責{rng.choice(SKILLS)}"
+        for _ in range(rng.randint(2, 5))
+    )
+    return {
+        "英文名字＋英文姓氏": f"Applicant{i} Test",
+        "中文姓名": rng.choice(SURNAMES) + rng.choice(GIVEN) + rng.choice(GIVEN),
+        "護照號碼": f"P{rng.randrange(10**8):08d}",
+        "現職公司": company,
+        "現職職稱": rng.choice(TITLES),
+        "教育背景(學校)": rng.choice(SCHOOLS),
+        "工作經歷": history,
+        "產業實績專長": "、".join(rng.sample(SKILLS, 3)),
+        "來源檔案": f"batch_{i // 100}.pdf",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checkpoints", type=int, nargs="+", default=[1000, 10000, 30000])
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RecordStore(os.path.join(tmp, "records.sqlite"))
+        records, add_seconds = [], 0.0
+        print(f"{'紀錄數':>8} {'加入(筆/秒)':>12} {'p50(ms)':>9} {'p95(ms)':>9} {'檔案(MB)':>9}")
+        for checkpoint in sorted(args.checkpoints):
+            while len(records) < checkpoint:
+                batch = [make_record(rng, len(records) + n) for n in range(min(args.batch, checkpoint - len(records)))]
+                start = time.perf_counter()
+                store.add(batch, "goldencard")
+                add_seconds += time.perf_counter() - start
+                records.extend(batch)
+
+            samples = []
+            for record in rng.sample(records, min(args.queries, len(records))):
+                start = time.perf_counter()
+                store.similar(record, "goldencard")
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            size = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / 1e6
+            print(f"{len(records):>8} {len(records) / add_seconds:>12,.0f} {statistics.median(samples):>9.2f} "
+                  f"{samples[max(0, int(round(len(samples) * 0.95)) - 1)]:>9.2f} {size:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
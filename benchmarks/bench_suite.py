@@ -0,0 +1,267 @@
+"""效能基準套件：查詢延遲隨資料庫規模的變化，以及 OCR 後處理（解析、DataFrame、Excel）隨筆數的變化。
+
+查詢階段使用 synth_data.py 產生的放大資料庫（--scales，相對於目前 mydb.sqlite 的倍數）；
+OCR 階段使用替身模型（--fake-latency 模擬 API 延遲、--field-chars 模擬回傳內容大小），筆數由 --sizes 指定。
+每個 (階段, 規模) 在獨立的子程序中執行，回報 p50 / p95 延遲、吞吐量與峰值 RSS。
+
+執行：
+  python benchmarks/bench_suite.py [--scales 10 100 1000] [--sizes 10 100 1000] [--save baseline.json]
+  python benchmarks/bench_suite.py --compare baseline.json   # 與基準比較，p50/p95 變慢超過 --threshold 時回傳 1
+  python benchmarks/bench_suite.py --only search.rd_company ocr.parse   # 只跑指定階段
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource 模組，不回報 RSS
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import search_db  # noqa: E402
+import synth_data  # noqa: E402
+
+RECORDS_PER_FILE = 10
+
+
+# --- 查詢階段：每個函式回傳「執行一次查詢」的函式，參數由 rng 隨機挑選，回傳讀取列數 ---
+def _page(conn, table, sql, params):
+    conn.execute(*search_db.count_query(sql, params)).fetchone()
+    return len(conn.execute(*search_db.page_query(table, sql, params)).fetchall())
+
+
+def _search_stages():
+    return {
+        "search.rd_company": lambda conn, ctx, rng: lambda: _page(
+            conn, "rd", *search_db.rd_query(company_id=str(rng.choice(ctx["ids"])))),
+        "search.smart_year_group": lambda conn, ctx, rng: lambda: _page(
+            conn, "smart", *search_db.smart_query(year=rng.choice(ctx["years"]), group=rng.choice(search_db.GROUP_OPTIONS))),
+        "search.ipo_group": lambda conn, ctx, rng: lambda: _page(
+            conn, "ipo", *search_db.ipo_query(group=rng.choice(search_db.GROUP_OPTIONS))),
+        "search.name": lambda conn, ctx, rng: lambda: len(
+            search_db.resolve_company_ids(conn, rng.choice(ctx["names"]))),
+        "search.overview": lambda conn, ctx, rng: lambda: len(
+            search_db.company_overview(conn, company_id=str(rng.choice(ctx["ids"])))),
+        "search.summary": lambda conn, ctx, rng: lambda: search_db.summary_metrics(
+            conn, "rd_summary", year=rng.choice(ctx["years"]), group=rng.choice(search_db.GROUP_OPTIONS))["total_cases"],
+        "search.batch_100": lambda conn, ctx, rng: lambda: len(conn.execute(
+            *search_db.batch_query(rng.sample(ctx["ids"], min(100, len(ctx["ids"]))))).fetchall()),
+        "search.export_year": _export_stage,
+    }
+
+
+# 匯出一個年度的研發、設備、上市櫃三張工作表（xlsx 串流寫入）
+def _export_stage(conn, ctx, rng):
+    import search_export
+
+    def run():
+        year = rng.choice(ctx["years"])
+        sheets = [
+            ("研發資料", "rd", *search_db.rd_query(year=year)),
+            ("設備資料", "smart", *search_db.smart_query(year=year)),
+            ("上市櫃資料", "ipo", *search_db.ipo_query()),
+        ]
+        path = search_export.export(conn, sheets, "xlsx")
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    return run
+
+
+def _search_context(conn):
+    ids = [row[0] for row in conn.execute("SELECT company_id FROM company_360")]
+    names = [row[0] for row in conn.execute("SELECT company_name FROM company_360 WHERE company_name IS NOT NULL")]
+    years = search_db.load_year_options(conn)
+    # 名稱查詢以公司名稱中間的 4 個字為關鍵字（走 trigram 索引）
+    return {"ids": ids, "years": years, "names": [n[2:6] for n in names if len(n) >= 6]}
+
+
+# --- OCR 後處理階段：size 為紀錄筆數 ---
+class _BenchFile(io.BytesIO):
+    def __init__(self, name):
+        super().__init__(b"%PDF-1.4 bench " + name.encode())
+        self.name = name
+        self.type = "application/pdf"
+
+
+def _ocr_stage(stage, size, args):
+    from excel_style import write_styled_sheets
+    from json_stream import normalize_record, parse_records
+    from ocr_engine import FakeModelClient, clean_ocr_text, records_to_frame, run_ocr_batch
+    from ocr_profiles import load_profile
+
+    profile = load_profile("goldencard")
+    client = FakeModelClient(profile.columns, size, field_chars=args["field_chars"])
+    text = client.generate(profile.prompt, None)
+
+    def parse():
+        records, _ = parse_records(clean_ocr_text(text))
+        return [normalize_record(r, profile.columns)[0] for r in records]
+
+    records = parse()
+    for r in records:
+        r["來源檔案"] = "bench.pdf"
+    df = records_to_frame(records, profile.columns)
+
+    if stage == "ocr.parse":
+        return lambda: len(parse())
+    if stage == "ocr.frame":
+        return lambda: len(records_to_frame(records, profile.columns))
+    if stage == "ocr.excel":
+        return lambda: len(write_styled_sheets([(profile.title, df, profile.widths)]).getvalue())
+
+    # 整批流程：每個檔案回傳 RECORDS_PER_FILE 筆，經上傳、產生內容、解析（含替身 API 延遲）
+    batch_client = FakeModelClient(
+        profile.columns, RECORDS_PER_FILE, latency=args["fake_latency"], field_chars=args["field_chars"]
+    )
+    files = [_BenchFile(f"bench_{i}.pdf") for i in range(max(1, size // RECORDS_PER_FILE))]
+
+    def pipeline():
+        return sum(len(r["records"]) for _, r in run_ocr_batch(
+            files, batch_client, profile, max_workers=args["workers"], segment_pages=0))
+    return pipeline
+
+
+OCR_STAGES = ["ocr.parse", "ocr.frame", "ocr.excel", "ocr.pipeline"]
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+# --- 子程序：執行單一 (階段, 規模)，回傳統計 ---
+# 吞吐量為每秒處理的項目數：查詢為次/秒，OCR 為筆/秒
+def measure(stage, size, args):
+    rng = random.Random(args["seed"])
+    conn = None
+    if stage.startswith("search."):
+        conn = search_db.connect(args["db_paths"][str(size)])
+        ctx = _search_context(conn)
+        run = _search_stages()[stage](conn, ctx, rng)
+        repeat = args["export_repeat"] if stage == "search.export_year" else args["queries"]
+        per_call = 1
+    else:
+        run = _ocr_stage(stage, size, args)
+        repeat = args["repeat"]
+        per_call = size
+
+    run()  # 暖機：載入模組與 SQLite 頁面快取
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    if conn is not None:
+        conn.close()
+
+    samples.sort()
+    return {
+        "p50_ms": statistics.median(samples) * 1000,
+        "p95_ms": samples[max(0, int(round(len(samples) * 0.95)) - 1)] * 1000,
+        "throughput": per_call * len(samples) / sum(samples),
+        "unit": "次/秒" if per_call == 1 else "筆/秒",
+        "rss_mb": _peak_rss_mb(),
+        "samples": len(samples),
+    }
+
+
+def run_isolated(stage, size, args):
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(measure, stage, size, args).result()
+
+
+def _fmt(value, spec):
+    return "-" if value is None else format(value, spec)
+
+
+def report(results, baseline=None, threshold=0.2):
+    regressions = []
+    header = f"{'階段':<24} {'規模':>6} {'p50(ms)':>10} {'p95(ms)':>10} {'吞吐量':>14} {'峰值RSS(MB)':>12}"
+    if baseline:
+        header += f" {'Δp50':>8} {'Δp95':>8}"
+    print(header)
+    for key, r in results.items():
+        stage, size = key.split("@")
+        line = (f"{stage:<24} {size:>6} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} "
+                f"{r['throughput']:>10,.1f}{r['unit']:>4} {_fmt(r['rss_mb'], '>12.1f')}")
+        base = (baseline or {}).get(key)
+        if base:
+            deltas = [r[m] / base[m] - 1 if base[m] else 0.0 for m in ("p50_ms", "p95_ms")]
+            flag = " ❌" if max(deltas) > threshold else ""
+            line += f" {deltas[0]:>+8.0%} {deltas[1]:>+8.0%}{flag}"
+            if flag:
+                regressions.append(key)
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000], help="資料庫規模（目前資料量的倍數）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="OCR 紀錄筆數")
+    parser.add_argument("--only", nargs="+", help="只執行指定階段")
+    parser.add_argument("--queries", type=int, default=50, help="每個查詢階段的查詢次數")
+    parser.add_argument("--export-repeat", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5, help="每個 OCR 階段的重複次數")
+    parser.add_argument("--fake-latency", type=float, default=0.05, help="替身模型每次呼叫的延遲秒數")
+    parser.add_argument("--field-chars", type=int, default=40, help="替身模型每個欄位回傳的字數")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="將結果存為基準 JSON")
+    parser.add_argument("--compare", help="與基準 JSON 比較")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50/p95 變慢超過此比例視為退化")
+    args = parser.parse_args(argv)
+
+    stages = [s for s in list(_search_stages()) + OCR_STAGES if not args.only or s in args.only]
+    db_paths = {}
+    if any(s.startswith("search.") for s in stages):
+        for scale in args.scales:
+            start = time.perf_counter()
+            db_paths[str(scale)] = synth_data.cached_database(scale, args.seed)
+            print(f"資料庫 x{scale}：{db_paths[str(scale)]}（{time.perf_counter() - start:.1f} 秒）")
+    params = {**vars(args), "db_paths": db_paths}
+
+    results = {}
+    for stage in stages:
+        for size in (args.scales if stage.startswith("search.") else args.sizes):
+            results[f"{stage}@{size}"] = run_isolated(stage, size, params)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save:
+        meta = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("save", "compare")},
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"✅ 已儲存基準：{args.save}")
+    if regressions:
+        print(f"❌ {len(regressions)} 項較基準變慢超過 {args.threshold:.0%}：{', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+"""合成資料產生器：以 mydb.sqlite 的資料表結構與欄位值分布，產生放大 N 倍的企業履歷查詢資料庫。
+
+每家合成公司有新的統編與名稱，各表的非鍵欄位由真實資料列隨機抽樣（保留金額、審查結果、組別與產業的分布），
+研發項目與研發計畫、設備項目與設備計畫的 join 鍵一致，每個設備計畫的項目數也依真實分布抽樣。
+
+執行：python benchmarks/synth_data.py --scale 10 [--out synth_x10.sqlite] [--seed 0]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import search_db  # noqa: E402
+
+BASE_TABLES = ["company", "rd_project", "rd_item", "smart_project", "smart_item", "ipo_info", "trading_list"]
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "search_bench")
+BATCH_ROWS = 10000
+
+
+def _rows(conn, table):
+    cursor = conn.execute(f"SELECT * FROM {table}")
+    columns = [d[0] for d in cursor.description]
+    return columns, [dict(zip(columns, row)) for row in cursor]
+
+
+class _Writer:
+    def __init__(self, conn, table, columns):
+        self.conn = conn
+        self.sql = f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})"
+        self.columns = columns
+        self.pending = []
+        self.count = 0
+
+    def add(self, row):
+        self.pending.append(tuple(row.get(col) for col in self.columns))
+        if len(self.pending) >= BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        self.conn.executemany(self.sql, self.pending)
+        self.count += len(self.pending)
+        self.pending = []
+
+
+# --- 產生放大 scale 倍的資料庫，回傳各表列數 ---
+def build_database(path, scale, source=search_db.DB_PATH, seed=0):
+    rng = random.Random(seed)
+    # 來源唯讀開啟；產生後再對合成資料庫執行 migrate（型別正規化、索引與衍生表）
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    real = {table: _rows(src, table) for table in BASE_TABLES}
+    schema = {
+        table: src.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        for table in BASE_TABLES
+    }
+    user_version = src.execute("PRAGMA user_version").fetchone()[0]
+    items_by_plan = {}
+    for item in real["smart_item"][1]:
+        key = (item["apply_year"], item["company_id"], item["plan_name"])
+        items_by_plan.setdefault(key, []).append(item)
+    plan_sizes = [len(items) for items in items_by_plan.values()] or [1]
+    src.close()
+
+    for p in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    for table in BASE_TABLES:
+        conn.execute(schema[table])
+    conn.execute(f"PRAGMA user_version = {user_version}")
+    writers = {table: _Writer(conn, table, real[table][0]) for table in BASE_TABLES}
+
+    # 公司：新統編（不重複）與名稱（真實名稱加編號），其餘欄位由真實資料抽樣
+    company_rows = real["company"][1] or [{"company_name": "範例股份有限公司"}]
+    n_companies = max(len(company_rows), len({r["company_id"] for r in real["trading_list"][1]})) * scale
+    company_ids = rng.sample(range(10_000_000, 99_999_999), n_companies)
+    names = {}
+    for i, company_id in enumerate(company_ids):
+        base = rng.choice(company_rows)["company_name"] or "範例股份有限公司"
+        names[company_id] = f"{base.strip()}{i:06d}"
+        writers["company"].add({"company_id": company_id, "company_name": names[company_id]})
+
+    def pick_company():
+        company_id = rng.choice(company_ids)
+        return {"company_id": company_id, "company_name": names[company_id]}
+
+    for i in range(len(real["rd_project"][1]) * scale):
+        project = {**rng.choice(real["rd_project"][1]), **pick_company(), "project_name": f"研發計畫{i:07d}"}
+        writers["rd_project"].add(project)
+        item = {**rng.choice(real["rd_item"][1]), **{k: project[k] for k in ("apply_year", "company_id", "project_name")}}
+        writers["rd_item"].add(item)
+
+    for i in range(len(real["smart_project"][1]) * scale):
+        plan = {**rng.choice(real["smart_project"][1]), **pick_company(), "plan_name": f"設備計畫{i:07d}"}
+        writers["smart_project"].add(plan)
+        for n in range(rng.choice(plan_sizes)):
+            item = {**rng.choice(real["smart_item"][1]), "item_no": str(n + 1)}
+            item.update({k: plan[k] for k in ("apply_year", "company_id", "plan_name")})
+            writers["smart_item"].add(item)
+
+    for table in ("ipo_info", "trading_list"):
+        for _ in range(len(real[table][1]) * scale):
+            writers[table].add({**rng.choice(real[table][1]), **pick_company()})
+
+    for writer in writers.values():
+        writer.flush()
+    conn.commit()
+    search_db.migrate(conn)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return {table: writer.count for table, writer in writers.items()}
+
+
+# --- 取得（必要時產生）放大 scale 倍的資料庫；相同 scale 與 seed 重複使用暫存檔 ---
+def cached_database(scale, seed=0, source=search_db.DB_PATH):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"synth_x{scale}_seed{seed}.sqlite")
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source):
+        build_database(path, scale, source, seed)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--out")
+    parser.add_argument("--source", default=search_db.DB_PATH)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    out = args.out or f"synth_x{args.scale}.sqlite"
+    start = time.perf_counter()
+    counts = build_database(out, args.scale, args.source, args.seed)
+    print(f"✅ {out}（{time.perf_counter() - start:.1f} 秒）")
+    for table, count in counts.items():
+        print(f"  {table}: {count:,} 列")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import csv
+import datetime
+import itertools
+import os
+import time
+
+from search_db import (
+    COLUMN_LABELS, DB_PATH, INDEXES, connect, migrate, rebuild_name_index, refresh_company_360, refresh_summaries,
+    COLUMN_TYPES, typed_value_sql,
+)
+
+# ✅ 可匯入的資料表；有主鍵者以主鍵 upsert，沒有主鍵者以下列鍵整組取代（同鍵的舊列先刪除再寫入）
+# 取代鍵以 IS 比對，鍵值為空的列也照常匯入（ipo_info 多數列沒有送件日期，因此只以公司統編為鍵）
+IMPORT_TABLES = ["company", "rd_project", "rd_item", "smart_project", "smart_item", "ipo_info", "trading_list"]
+REPLACE_KEYS = {
+    "smart_project": ["company_id", "apply_year", "plan_name"],
+    "ipo_info": ["company_id"],
+    "trading_list": ["company_id"],
+}
+# 會影響統計摘要（依申請年度重算）的資料表
+SUMMARY_TABLES = {"rd_project", "rd_item", "smart_project", "smart_item"}
+
+# 每次 executemany 寫入暫存表的列數
+CHUNK_SIZE = 5000
+
+
+# --- 讀取來源檔：逐列產生 tuple，第一列為標題（CSV 以 csv 模組、xlsx 以 openpyxl 唯讀模式串流）---
+def iter_rows(path, sheet=None):
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet] if sheet else wb.worksheets[0]
+            yield from ws.iter_rows(values_only=True)
+        finally:
+            wb.close()
+        return
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        yield from csv.reader(f)
+
+
+def clean_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    # 空白儲存格視為 NULL；其餘字串原樣保留（前後空白也是鍵值的一部分）
+    if isinstance(value, str) and not value.strip():
+        return None
+    return value
+
+
+# --- 來源標題 → 資料表欄位：接受欄位名稱本身或查詢頁的中文欄名 ---
+def column_aliases(columns):
+    aliases = {col: col for col in columns}
+    for labels in COLUMN_LABELS.values():
+        for col, label in labels.items():
+            if col in columns:
+                aliases.setdefault(label, col)
+    return aliases
+
+
+def map_header(header, columns):
+    aliases = column_aliases(columns)
+    positions = {}
+    for i, name in enumerate(header):
+        col = aliases.get(str(name or "").strip())
+        if col and col not in positions:
+            positions[col] = i
+    return [positions.get(col) for col in columns]
+
+
+def table_columns(conn, table):
+    info = conn.execute(f"PRAGMA main.table_info({table})").fetchall()
+    columns = [row[1] for row in info]
+    pk = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+    return columns, pk
+
+
+def quote(columns):
+    return ", ".join(f'"{col}"' for col in columns)
+
+
+# --- 單一來源檔分批寫入暫存表，回傳寫入列數 ---
+def stage_file(conn, table, path, sheet=None, chunk_size=CHUNK_SIZE):
+    columns, pk = table_columns(conn, table)
+    rows = iter_rows(path, sheet)
+    header = next(rows, None)
+    if header is None:
+        return 0
+    positions = map_header(header, columns)
+    missing = [k for k in pk or REPLACE_KEYS[table] if positions[columns.index(k)] is None]
+    if missing:
+        raise ValueError(f"{os.path.basename(path)} 缺少 {table} 的鍵值欄位：{', '.join(missing)}")
+
+    insert = f"INSERT INTO temp.stage_{table} ({quote(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    total = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return total
+        values = [
+            tuple(clean_value(row[p]) if p is not None and p < len(row) else None for p in positions)
+            for row in chunk
+        ]
+        # 略過整列空白（試算表尾端常見）
+        values = [row for row in values if any(v is not None for v in row)]
+        conn.executemany(insert, values)
+        total += len(values)
+
+
+# --- 暫存列型別正規化（金額轉數值、日期轉 ISO 等），之後比對鍵值與寫入都用正規化後的值 ---
+def normalize_staged(conn, table):
+    sets = []
+    for col, kind in COLUMN_TYPES.get(table, {}).items():
+        quoted = f'"{col}"'
+        sets.append(f"{quoted} = {typed_value_sql(kind, quoted)}")
+    if sets:
+        conn.execute(f"UPDATE temp.stage_{table} SET {', '.join(sets)}")
+
+
+# --- 暫存表 → 正式表，第一步：去除主鍵不完整的列，刪除將被取代的舊列（replace 時清空整張表）---
+# 有主鍵者之後以 upsert 寫入，不需先刪除；沒有主鍵者不略過任何列；回傳略過的列數
+def delete_replaced(conn, table, replace=False):
+    _, pk = table_columns(conn, table)
+    stage = f"temp.stage_{table}"
+    skipped = 0
+    if pk:
+        skipped = conn.execute(f"DELETE FROM {stage} WHERE " + " OR ".join(f'"{k}" IS NULL' for k in pk)).rowcount
+    if replace:
+        conn.execute(f"DELETE FROM main.{table}")
+    elif not pk:
+        match = " AND ".join(f't."{k}" IS s."{k}"' for k in REPLACE_KEYS[table])
+        conn.execute(f"""
+            DELETE FROM main.{table} WHERE rowid IN (
+                SELECT t.rowid FROM {stage} AS s JOIN main.{table} AS t ON {match}
+            )
+        """)
+    return skipped
+
+
+# --- 第二步：寫入暫存列；有主鍵者同鍵更新（upsert），後出現的列為準 ---
+def insert_staged(conn, table):
+    columns, pk = table_columns(conn, table)
+    select = f"SELECT {quote(columns)} FROM temp.stage_{table}"
+    if not pk:
+        conn.execute(f"INSERT INTO main.{table} ({quote(columns)}) {select}")
+        return
+    updates = ", ".join(f'"{col}" = excluded."{col}"' for col in columns if col not in pk)
+    conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    conn.execute(f"INSERT INTO main.{table} ({quote(columns)}) {select} WHERE true ON CONFLICT ({quote(pk)}) {conflict}")
+
+
+def table_indexes(tables):
+    return {name: target for name, target in INDEXES.items() if target.split("(")[0] in tables}
+
+
+# --- 整批匯入：暫存、合併、重建索引與衍生表都在同一個交易內，commit 時一次發布 ---
+# sources：[(資料表, 檔案路徑, 工作表名稱或 None)]；replace：要整張取代的資料表
+# WAL 模式下，查詢中的使用者在 commit 前看到舊資料、之後看到新資料，不會讀到一半的結果
+def import_sources(conn, sources, replace=(), chunk_size=CHUNK_SIZE, clock=time.perf_counter):
+    tables = list(dict.fromkeys(table for table, _, _ in sources))
+    for table in tables:
+        if table not in IMPORT_TABLES:
+            raise ValueError(f"不支援匯入資料表 {table}")
+    replace = set(replace) & set(tables)
+    migrate(conn)
+
+    stats = {"rows": {}, "skipped": {}, "files": len(sources)}
+    start = clock()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table in tables:
+            conn.execute(f"DROP TABLE IF EXISTS temp.stage_{table}")
+            conn.execute(f"CREATE TEMP TABLE stage_{table} AS SELECT * FROM main.{table} WHERE 0")
+        for table, path, sheet in sources:
+            stats["rows"][table] = stats["rows"].get(table, 0) + stage_file(conn, table, path, sheet, chunk_size)
+        for table in tables:
+            normalize_staged(conn, table)
+        stats["stage_seconds"] = clock() - start
+
+        # 受影響的年度與公司（整張取代時全部重算）
+        years, company_ids = set(), set()
+        for table in tables:
+            columns, _ = table_columns(conn, table)
+            if table in SUMMARY_TABLES and "apply_year" in columns:
+                years.update(y for (y,) in conn.execute(
+                    f"SELECT DISTINCT CAST(apply_year AS INTEGER) FROM temp.stage_{table} WHERE apply_year IS NOT NULL"
+                ))
+            company_ids.update(c for (c,) in conn.execute(
+                f"SELECT DISTINCT CAST(company_id AS INTEGER) FROM temp.stage_{table} WHERE company_id IS NOT NULL"
+            ))
+
+        # 先利用現有索引刪除同鍵舊列，再拿掉次要索引、大量寫入後重建
+        for table in tables:
+            stats["skipped"][table] = delete_replaced(conn, table, table in replace)
+            stats["rows"][table] -= stats["skipped"][table]
+        indexes = table_indexes(tables)
+        for name in indexes:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        for table in tables:
+            insert_staged(conn, table)
+        for name, target in indexes.items():
+            conn.execute(f"CREATE INDEX {name} ON {target}")
+        stats["merge_seconds"] = clock() - start - stats["stage_seconds"]
+
+        rebuild_name_index(conn)
+        if replace & SUMMARY_TABLES:
+            refresh_summaries(conn)
+        elif years:
+            refresh_summaries(conn, sorted(years))
+        refresh_company_360(conn, None if replace else sorted(company_ids))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        for table in tables:
+            conn.execute(f"DROP TABLE IF EXISTS temp.stage_{table}")
+
+    stats["seconds"] = clock() - start
+    stats["years"] = sorted(years)
+    stats["companies"] = len(company_ids)
+    return stats
+
+
+# --- 來源參數格式：資料表=檔案路徑[#工作表] ---
+def parse_source(spec):
+    table, sep, path = spec.partition("=")
+    if not sep or not path:
+        raise argparse.ArgumentTypeError(f"格式應為 資料表=檔案路徑[#工作表]：{spec}")
+    path, _, sheet = path.partition("#")
+    return table.strip(), path, sheet or None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="將年度試算表 / CSV 匯入企業履歷查詢資料庫")
+    parser.add_argument("sources", nargs="+", type=parse_source, help="資料表=檔案路徑[#工作表]，例如 rd_project=112研發.xlsx")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--replace", action="append", default=[], choices=IMPORT_TABLES,
+                        help="整張取代指定資料表（預設依主鍵 / 取代鍵更新），可重複指定")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    try:
+        stats = import_sources(conn, args.sources, args.replace, args.chunk_size)
+    except (ValueError, OSError) as e:
+        print(f"❌ 匯入失敗，資料庫未變更：{e}")
+        return 1
+    finally:
+        conn.close()
+
+    total = sum(stats["rows"].values())
+    for table, rows in stats["rows"].items():
+        skipped = stats["skipped"].get(table)
+        print(f"  {table}: {rows} 列" + (f"（另有 {skipped} 列主鍵不完整未匯入）" if skipped else ""))
+    print(
+        f"✅ 匯入完成：{stats['files']} 個檔案、{total} 列，"
+        f"讀取 {total / max(stats['stage_seconds'], 1e-9):,.0f} 列/秒，"
+        f"整體 {total / max(stats['seconds'], 1e-9):,.0f} 列/秒（{stats['seconds']:.2f} 秒）"
+    )
+    print(f"   已重算年度 {stats['years'] or '無'} 的統計摘要、{stats['companies']} 家公司的企業概覽")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
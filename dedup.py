@@ -0,0 +1,193 @@
+import re
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+
+from json_stream import MISSING_VALUE
+from record_store import PASSPORT_FIELD, normalize_passport
+
+# ✅ 判斷是否為同一申請人所用的欄位（各設定檔有的才用）
+ENGLISH_NAME_FIELD = "英文名字＋英文姓氏"
+CHINESE_NAME_FIELD = "中文姓名"
+BIRTH_FIELD = "出生日期"
+
+# 同一區塊內英文姓名相似度達此值視為同一人（OCR 常見的單一字母差異約 0.9）
+NAME_SIMILARITY = 0.85
+# 區塊超過此筆數時不做兩兩比對，改為依姓名排序後只比對前後 NAME_WINDOW 筆（sorted neighbourhood）
+MAX_PAIRWISE_BLOCK = 50
+NAME_WINDOW = 8
+
+MERGE_SOURCE_FIELD = "合併來源"
+
+_MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1
+)}
+
+
+def _present(value):
+    return value is not None and str(value).strip() not in ("", MISSING_VALUE)
+
+
+# --- 正規化：英文姓名拆成小寫單字後排序（姓、名順序不同視為相同），中文姓名去空白 ---
+def english_name_key(value):
+    if not _present(value):
+        return None
+    words = re.findall(r"[a-z]+", unicodedata.normalize("NFKD", str(value)).lower())
+    return " ".join(sorted(words)) or None
+
+
+def chinese_name_key(value):
+    if not _present(value):
+        return None
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", str(value))) or None
+
+
+# 出生日期轉為 YYYY-MM-DD：支援 1990-01-02、1990/1/2、1990年1月2日、02 JAN 1990 / JAN 02 1990
+def normalize_birth_date(value):
+    if not _present(value):
+        return None
+    text = unicodedata.normalize("NFKC", str(value)).lower()
+    m = re.search(r"(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})", text)
+    if m:
+        year, month, day = (int(g) for g in m.groups())
+    else:
+        m = (re.search(r"(\d{1,2})\s*([a-z]{3})[a-z]*\.?\s*,?\s*(\d{4})", text)
+             or re.search(r"([a-z]{3})[a-z]*\.?\s*(\d{1,2}),?\s*(\d{4})", text))
+        if not m:
+            return None
+        a, b, year = m.groups()
+        day, month = (a, b) if a.isdigit() else (b, a)
+        year, month, day = int(year), _MONTHS.get(month[:3]), int(day)
+        if month is None:
+            return None
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+NORMALIZERS = {PASSPORT_FIELD: normalize_passport, BIRTH_FIELD: normalize_birth_date}
+
+
+def identity(record):
+    return {
+        "passport": normalize_passport(record.get(PASSPORT_FIELD)),
+        "birth": normalize_birth_date(record.get(BIRTH_FIELD)),
+        "english": english_name_key(record.get(ENGLISH_NAME_FIELD)),
+        "chinese": chinese_name_key(record.get(CHINESE_NAME_FIELD)),
+    }
+
+
+def names_match(a, b):
+    if a["chinese"] and a["chinese"] == b["chinese"]:
+        return True
+    if not (a["english"] and b["english"]):
+        return False
+    if a["english"] == b["english"]:
+        return True
+    matcher = SequenceMatcher(None, a["english"], b["english"], autojunk=False)
+    return matcher.quick_ratio() >= NAME_SIMILARITY and matcher.ratio() >= NAME_SIMILARITY
+
+
+# --- union-find：每個群組記錄已知的護照號碼與出生日期，兩群組各有不同值時不合併 ---
+class _Clusters:
+    def __init__(self, ids):
+        self.parent = list(range(len(ids)))
+        self.passports = [{i["passport"]} - {None} for i in ids]
+        self.births = [{i["birth"]} - {None} for i in ids]
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return True
+        for values in (self.passports, self.births):
+            if values[a] and values[b] and values[a].isdisjoint(values[b]):
+                return False
+        if b < a:
+            a, b = b, a
+        self.parent[b] = a
+        self.passports[a] |= self.passports[b]
+        self.births[a] |= self.births[b]
+        return True
+
+
+# --- 找出同一申請人的紀錄：回傳群組清單（每組為紀錄索引，依原始順序）---
+# 區塊：相同護照號碼直接合併；相同出生日期的區塊內以姓名（中文相同或英文模糊相似）比對；
+# 姓名完全相同（正規化後）的區塊也合併，只要雙方護照號碼 / 出生日期沒有衝突（例如履歷沒有護照號碼）
+# 每筆紀錄只落在少數幾個區塊，大區塊改用排序鄰近比對，整體接近線性
+def find_duplicates(records):
+    ids = [identity(r) for r in records]
+    clusters = _Clusters(ids)
+    blocks = {}
+    for n, i in enumerate(ids):
+        for kind in ("passport", "birth", "english", "chinese"):
+            if i[kind]:
+                blocks.setdefault((kind, i[kind]), []).append(n)
+
+    for (kind, _), members in blocks.items():
+        if len(members) < 2:
+            continue
+        if kind != "birth":
+            for n in members[1:]:
+                clusters.union(members[0], n)
+            continue
+        if len(members) <= MAX_PAIRWISE_BLOCK:
+            pairs = ((a, b) for x, a in enumerate(members) for b in members[x + 1:])
+        else:
+            ordered = sorted(members, key=lambda n: ids[n]["english"] or ids[n]["chinese"] or "")
+            pairs = ((a, b) for x, a in enumerate(ordered) for b in ordered[x + 1:x + 1 + NAME_WINDOW])
+        for a, b in pairs:
+            if clusters.find(a) != clusters.find(b) and names_match(ids[a], ids[b]):
+                clusters.union(a, b)
+
+    groups = {}
+    for n in range(len(records)):
+        groups.setdefault(clusters.find(n), []).append(n)
+    return list(groups.values())
+
+
+def _join_unique(values):
+    return "、".join(dict.fromkeys(str(v) for v in values if _present(v)))
+
+
+# --- 逐欄合併：各檔案的值相同時直接採用；不同時取出現最多次者（同票取較長、較完整的值）---
+# 來源檔案、頁碼範圍合併列出，檢核提示依合併後的紀錄重新檢查；合併來源註明各欄位採用哪個檔案的值
+def merge_group(records, profile):
+    if len(records) == 1:
+        return dict(records[0])
+    merged, picked_from = {}, {}
+    for col in profile.columns:
+        values = [(r.get(col), r.get("來源檔案")) for r in records if _present(r.get(col))]
+        if not values:
+            merged[col] = MISSING_VALUE
+            continue
+        # 護照號碼與出生日期以正規化後的值比較與輸出（「02 JAN 1990」與「1990-01-02」視為相同）
+        normalize = NORMALIZERS.get(col)
+        if normalize:
+            values = [(normalize(v) or v, s) for v, s in values]
+        counts = Counter(str(v).strip() for v, _ in values)
+        best = max(counts, key=lambda v: (counts[v], len(v)))
+        value, source = next((v, s) for v, s in values if str(v).strip() == best)
+        merged[col] = value
+        picked_from.setdefault(source, []).append(col + ("（值不一致）" if len(counts) > 1 else ""))
+    for col in ("來源檔案", "頁碼範圍"):
+        joined = _join_unique(r.get(col) for r in records)
+        if joined:
+            merged[col] = joined
+    issues = profile.check(merged)
+    if issues:
+        merged["檢核提示"] = "；".join(issues)
+    merged[MERGE_SOURCE_FIELD] = "；".join(f"{source}：{'、'.join(cols)}" for source, cols in picked_from.items())
+    return merged
+
+
+# --- 合併重複申請人：回傳 (合併後紀錄, 被合併掉的筆數)，每組放在第一筆出現的位置 ---
+def merge_duplicates(records, profile):
+    groups = find_duplicates(records)
+    merged = [merge_group([records[n] for n in group], profile) for group in sorted(groups, key=lambda g: g[0])]
+    return merged, len(records) - len(merged)
@@ -0,0 +1,68 @@
+import io
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+
+# ✅ 樣式設定：標題藍底白字加粗、內文 14pt 換行靠上、內文列高固定 180
+HEADER_STYLE = "ocr_header"
+BODY_STYLE = "ocr_body"
+BODY_ROW_HEIGHT = 180
+
+
+def _add_named_styles(wb):
+    header = NamedStyle(name=HEADER_STYLE)
+    header.font = Font(bold=True, color="FFFFFF", size=14)
+    header.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+    header.alignment = Alignment(horizontal="center", vertical="center")
+    wb.add_named_style(header)
+
+    body = NamedStyle(name=BODY_STYLE)
+    body.font = Font(size=14)
+    body.alignment = Alignment(wrap_text=True, vertical="top")
+    wb.add_named_style(body)
+
+
+def _write_sheet(wb, df, width_map, title=None):
+    ws = wb.create_sheet(title=title[:31] if title else None)
+
+    # 欄位寬度須在寫入第一列前設定
+    for idx, col_name in enumerate(df.columns, start=1):
+        if col_name in width_map:
+            ws.column_dimensions[get_column_letter(idx)].width = width_map[col_name]
+
+    def styled(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    # 模型偶爾回傳巢狀清單/物件（包含空的 [] 與 {}），與 pandas 相同轉為字串
+    def scalar(value):
+        return value if value is None or isinstance(value, (str, int, float)) else str(value)
+
+    ws.append([styled(col, HEADER_STYLE) for col in df.columns])
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    for row_idx, row in enumerate(rows, start=2):
+        # 與原本相同：只有資料列設定固定列高，只有非空儲存格套用內文樣式
+        ws.row_dimensions[row_idx].height = BODY_ROW_HEIGHT
+        values = [scalar(v) for v in row]
+        ws.append([styled(v, BODY_STYLE) if v else v for v in values])
+
+
+# --- 一次寫出美化後的 Excel：樣式只建立一次（named style），寫入時直接套用，不需重新載入 ---
+# sheets 為 [(工作表名稱, DataFrame, 欄寬對照)]，每個擷取設定檔一張工作表
+def write_styled_sheets(sheets, output=None):
+    output = output or io.BytesIO()
+    wb = Workbook(write_only=True)
+    _add_named_styles(wb)
+    for title, df, width_map in sheets:
+        _write_sheet(wb, df, width_map, title)
+    wb.save(output)
+    if isinstance(output, io.BytesIO):
+        output.seek(0)
+    return output
+
+
+def write_styled_workbook(df, width_map, output=None):
+    return write_styled_sheets([(None, df, width_map)], output)
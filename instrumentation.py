@@ -0,0 +1,212 @@
+import argparse
+import contextvars
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# ✅ 各階段計時紀錄（JSON lines），可跨 session 彙整；環境變數 INSTRUMENTATION_LOG 可改路徑，設為空字串則不寫檔
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "instrumentation.jsonl")
+LOG_PATH = os.getenv("INSTRUMENTATION_LOG", DEFAULT_LOG_PATH)
+
+# 目前執行中的紀錄器（每次 Streamlit rerun / 每次批次執行各一個）；工作執行緒需以 in_context 帶入
+_current = contextvars.ContextVar("instrumentation_recorder", default=None)
+
+
+# --- 紀錄器：保留本次執行的計時區段與快取命中，並逐筆附加到 JSON lines 記錄檔 ---
+class Recorder:
+    def __init__(self, app, session=None, log_path=LOG_PATH):
+        self.app = app
+        self.session = session or uuid.uuid4().hex[:12]
+        self.run = uuid.uuid4().hex[:12]
+        self.log_path = log_path
+        self.spans = []
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, **fields):
+        entry = {"type": "span", "stage": stage, "ms": round(seconds * 1000, 3), **fields}
+        with self._lock:
+            self.spans.append(entry)
+            self._write(entry)
+
+    def cache(self, name, hit):
+        with self._lock:
+            counts = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+            self._write({"type": "cache", "name": name, "hit": bool(hit)})
+
+    def _write(self, entry):
+        if not self.log_path:
+            return
+        line = {"ts": datetime.now().isoformat(timespec="milliseconds"), "app": self.app,
+                "session": self.session, "run": self.run, **entry}
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        except OSError:
+            pass  # 記錄檔寫入失敗不影響主要流程
+
+    # 依階段彙總本次執行：次數、總耗時、最長耗時、列數與位元組數
+    def summary(self):
+        with self._lock:
+            return summarize_spans(self.spans)
+
+    def cache_rates(self):
+        with self._lock:
+            return [
+                {"name": name, **counts, "hit_rate": counts["hits"] / max(1, counts["hits"] + counts["misses"])}
+                for name, counts in self.caches.items()
+            ]
+
+
+def summarize_spans(spans):
+    stages = {}
+    for s in spans:
+        stages.setdefault(s["stage"], []).append(s)
+    rows = []
+    for stage, items in stages.items():
+        ms = sorted(s["ms"] for s in items)
+        rows.append({
+            "stage": stage,
+            "count": len(ms),
+            "total_ms": round(sum(ms), 1),
+            "p50_ms": round(statistics.median(ms), 1),
+            "p95_ms": round(ms[max(0, int(round(len(ms) * 0.95)) - 1)], 1),
+            "max_ms": round(ms[-1], 1),
+            "rows": sum(s.get("rows", 0) for s in items),
+            "bytes": sum(s.get("bytes", 0) for s in items),
+            "errors": sum(1 for s in items if s.get("error")),
+        })
+    return sorted(rows, key=lambda r: -r["total_ms"])
+
+
+# --- 啟用紀錄器：之後本執行緒（及以 in_context 包裝的工作）的 span 都記在此紀錄器 ---
+def activate(recorder):
+    _current.set(recorder)
+    return recorder
+
+
+# --- 計時區段：未啟用紀錄器時不做任何事；可在區塊內填入 rows / bytes 等欄位 ---
+@contextmanager
+def span(stage, **fields):
+    recorder = _current.get()
+    if recorder is None:
+        yield fields
+        return
+    start = time.perf_counter()
+    try:
+        yield fields
+    except BaseException:
+        fields["error"] = True
+        raise
+    finally:
+        recorder.add(stage, time.perf_counter() - start, **fields)
+
+
+# 已自行量測的耗時（例如串流時分散在各段的解析時間）
+def record(stage, seconds, **fields):
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add(stage, seconds, **fields)
+
+
+def count_cache(name, hit):
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.cache(name, hit)
+
+
+# --- 讓執行緒池中的工作沿用呼叫當下的紀錄器（每次呼叫各自複製一份 context）---
+def in_context(fn):
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+
+# --- Streamlit 除錯面板：本次執行各階段耗時、列數 / 位元組與快取命中率 ---
+def render_panel(recorder):
+    import pandas as pd
+    import streamlit as st
+
+    with st.expander("🛠️ 效能除錯面板（本次執行）", expanded=True):
+        summary = recorder.summary()
+        if summary:
+            st.dataframe(pd.DataFrame(summary), use_container_width=True, hide_index=True)
+        else:
+            st.caption("本次執行沒有計時紀錄")
+        for c in recorder.cache_rates():
+            st.caption(f"快取 {c['name']}：命中 {c['hits']}/{c['hits'] + c['misses']}（{c['hit_rate']:.0%}）")
+        st.caption(f"session {recorder.session}｜記錄檔：{recorder.log_path or '（未寫檔）'}")
+
+
+# --- 彙整記錄檔：依 (app, 階段) 統計，並計算各快取命中率 ---
+def load_log(path=LOG_PATH, app=None, since=None):
+    entries = []
+    if not path or not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 寫到一半的最後一行
+            if app and entry.get("app") != app:
+                continue
+            if since and entry.get("ts", "") < since:
+                continue
+            entries.append(entry)
+    return entries
+
+
+def summarize_log(entries):
+    by_app = {}
+    for e in entries:
+        if e.get("type") == "span":
+            by_app.setdefault(e["app"], {"spans": [], "caches": {}})["spans"].append(e)
+        elif e.get("type") == "cache":
+            caches = by_app.setdefault(e["app"], {"spans": [], "caches": {}})["caches"]
+            counts = caches.setdefault(e["name"], {"hits": 0, "misses": 0})
+            counts["hits" if e["hit"] else "misses"] += 1
+    return {
+        app: {
+            "stages": summarize_spans(data["spans"]),
+            "sessions": len({s["session"] for s in data["spans"]}),
+            "caches": data["caches"],
+        }
+        for app, data in by_app.items()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="彙整各階段計時記錄檔")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summarize = sub.add_parser("summarize", help="依應用程式與階段統計耗時與快取命中率")
+    summarize.add_argument("--log", default=LOG_PATH or DEFAULT_LOG_PATH)
+    summarize.add_argument("--app", help="只統計指定應用程式（ocr、ocr_batch、search）")
+    summarize.add_argument("--days", type=float, help="只統計最近幾天")
+    args = parser.parse_args(argv)
+
+    since = (datetime.now() - timedelta(days=args.days)).isoformat() if args.days else None
+    report = summarize_log(load_log(args.log, args.app, since))
+    if not report:
+        print(f"ℹ️ {args.log} 沒有符合條件的紀錄")
+        return 0
+    for app, data in report.items():
+        print(f"\n📊 {app}（{data['sessions']} 個 session）")
+        print(f"{'階段':<28} {'次數':>6} {'總耗時(s)':>10} {'p50(ms)':>10} {'p95(ms)':>10} {'列數':>10} {'MB':>8} {'錯誤':>5}")
+        for r in data["stages"]:
+            print(f"{r['stage']:<28} {r['count']:>6} {r['total_ms'] / 1000:>10.2f} {r['p50_ms']:>10.1f} "
+                  f"{r['p95_ms']:>10.1f} {r['rows']:>10} {r['bytes'] / 1e6:>8.2f} {r['errors']:>5}")
+        for name, counts in data["caches"].items():
+            total = counts["hits"] + counts["misses"]
+            print(f"  快取 {name}：命中 {counts['hits']}/{total}（{counts['hits'] / max(1, total):.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,501 @@
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# ✅ 背景 OCR 工作佇列：工作與各檔案的處理狀態存於 SQLite，上傳檔與產出的 Excel 存於 jobs/<工作編號>/
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUEUE_PATH = os.path.join(BASE_DIR, "ocr_jobs.sqlite")
+DEFAULT_JOB_DIR = os.path.join(BASE_DIR, "jobs")
+DEFAULT_PROCESSES = int(os.getenv("OCR_WORKERS", 2))
+DEFAULT_RETENTION_DAYS = 30
+
+# 工作程序沒有工作時的輪詢間隔；處理中每隔 HEARTBEAT_SECONDS 回報一次，超過 STALE_SECONDS 沒回報視為程序已中止
+IDLE_SECONDS = 1.0
+HEARTBEAT_SECONDS = 10
+STALE_SECONDS = 120
+# 同一檔案因程序中止而重新排入佇列的次數上限
+MAX_TASK_ATTEMPTS = 3
+
+ACTIVE_STATUSES = ("queued", "running")
+# 存入佇列的結果不保留模型原始回傳內容（頁面只顯示訊息與紀錄）
+RESULT_FIELDS = ("name", "records", "level", "message", "cached", "attempts")
+
+
+def _safe_name(name):
+    return re.sub(r"[^\w.\-]+", "_", os.path.basename(name)) or "file"
+
+
+# --- 工作佇列：一個工作 = 一次上傳（多個檔案 × 多個設定檔），每個檔案為一個可獨立領取的任務 ---
+# 各工作程序以單一 UPDATE 領取任務（SQLite 寫入鎖保證同一任務只會被一個程序領走）
+# 公平分配：先給目前處理中任務最少的審查人員，同數時給最久沒領到任務的人，因此多人同時送件時輪流處理
+class JobQueue:
+    def __init__(self, path=DEFAULT_QUEUE_PATH, job_dir=DEFAULT_JOB_DIR, clock=time.time):
+        self.path = path
+        self.job_dir = job_dir
+        self.clock = clock
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job (
+                    id TEXT PRIMARY KEY,
+                    owner TEXT,
+                    profiles TEXT,
+                    options TEXT,
+                    status TEXT,
+                    total INTEGER,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    output_path TEXT,
+                    message TEXT,
+                    finalizer TEXT,
+                    heartbeat REAL
+                )
+            """)
+            # 舊版佇列檔沒有彙整程序與心跳欄位
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(job)")}
+            for col, kind in (("finalizer", "TEXT"), ("heartbeat", "REAL")):
+                if col not in columns:
+                    conn.execute(f"ALTER TABLE job ADD COLUMN {col} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_job_status ON job(status, created_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_task (
+                    job_id TEXT,
+                    idx INTEGER,
+                    file_name TEXT,
+                    file_path TEXT,
+                    status TEXT,
+                    worker TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    claimed_at REAL,
+                    heartbeat REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    PRIMARY KEY (job_id, idx)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_job_task_status ON job_task(status)")
+            conn.execute("CREATE TABLE IF NOT EXISTS job_worker (id TEXT PRIMARY KEY, pid INTEGER, heartbeat REAL)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- 送出工作：檔案先寫入 jobs/<工作編號>/input/，回傳工作編號 ---
+    # files 需有 name 與 getvalue()（Streamlit UploadedFile 或 LocalFile）；options 為處理參數（分段頁數、是否合併重複等）
+    def submit(self, owner, files, profile_names, options=None):
+        job_id = uuid.uuid4().hex[:12]
+        input_dir = os.path.join(self.job_dir, job_id, "input")
+        os.makedirs(input_dir, exist_ok=True)
+        tasks = []
+        for idx, f in enumerate(files):
+            path = os.path.join(input_dir, f"{idx:04d}_{_safe_name(f.name)}")
+            with open(path, "wb") as out:
+                out.write(f.getvalue())
+            tasks.append((job_id, idx, f.name, path, "queued"))
+        now = self.clock()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job (id, owner, profiles, options, status, total, created_at) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, owner, json.dumps(profile_names), json.dumps(options or {}), len(tasks), now),
+            )
+            conn.executemany(
+                "INSERT INTO job_task (job_id, idx, file_name, file_path, status) VALUES (?, ?, ?, ?, ?)", tasks
+            )
+        return job_id
+
+    # --- 領取下一個任務（公平排序），沒有可處理的任務時回傳 None ---
+    def claim(self, worker):
+        now = self.clock()
+        with self._connect() as conn:
+            self._requeue_stale(conn, now)
+            row = conn.execute(
+                """
+                UPDATE job_task
+                SET status = 'running', worker = ?, attempts = attempts + 1, claimed_at = ?, heartbeat = ?
+                WHERE (job_id, idx) = (
+                    WITH owners AS (
+                        SELECT j.owner,
+                               SUM(t.status = 'running') AS running,
+                               MAX(t.claimed_at) AS last_claimed
+                        FROM job AS j JOIN job_task AS t ON t.job_id = j.id
+                        WHERE j.status IN ('queued', 'running')
+                        GROUP BY j.owner
+                    )
+                    SELECT t.job_id, t.idx
+                    FROM job_task AS t
+                    JOIN job AS j ON j.id = t.job_id
+                    JOIN owners AS o ON o.owner = j.owner
+                    WHERE t.status = 'queued' AND j.status IN ('queued', 'running')
+                    ORDER BY o.running, o.last_claimed IS NOT NULL, o.last_claimed, j.created_at, t.idx
+                    LIMIT 1
+                )
+                RETURNING job_id, idx, file_name, file_path
+                """,
+                (worker, now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE job SET status = 'running', started_at = COALESCE(started_at, ?) WHERE id = ? AND status = 'queued'",
+                (now, row["job_id"]),
+            )
+            job = conn.execute("SELECT profiles, options FROM job WHERE id = ?", (row["job_id"],)).fetchone()
+        return {**dict(row), "profiles": json.loads(job["profiles"]), "options": json.loads(job["options"])}
+
+    # 逾時未回報的任務：重新排入佇列，超過嘗試次數者標為失敗；彙整中途中止的工作改回處理中，由其他程序重新彙整
+    def _requeue_stale(self, conn, now):
+        conn.execute(
+            "UPDATE job SET status = 'running', finalizer = NULL WHERE status = 'finalizing' AND heartbeat < ?",
+            (now - STALE_SECONDS,),
+        )
+        conn.execute(
+            "UPDATE job_task SET status = 'queued', worker = NULL "
+            "WHERE status = 'running' AND heartbeat < ? AND attempts < ?",
+            (now - STALE_SECONDS, MAX_TASK_ATTEMPTS),
+        )
+        conn.execute(
+            "UPDATE job_task SET status = 'failed', finished_at = ?, result = ? "
+            "WHERE status = 'running' AND heartbeat < ?",
+            (now, json.dumps({"message": "❌ 處理程序多次中止，已放棄此檔案"}, ensure_ascii=False), now - STALE_SECONDS),
+        )
+
+    # 工作程序心跳：同時更新程序、處理中任務與彙整中工作的最後回報時間
+    def beat(self, worker, task=None):
+        now = self.clock()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO job_worker VALUES (?, ?, ?)", (worker, os.getpid(), now))
+            conn.execute("UPDATE job SET heartbeat = ? WHERE finalizer = ? AND status = 'finalizing'", (now, worker))
+            if task:
+                conn.execute(
+                    "UPDATE job_task SET heartbeat = ? WHERE job_id = ? AND idx = ? AND worker = ?",
+                    (now, task["job_id"], task["idx"], worker),
+                )
+
+    # --- 任務完成：results 為 {設定檔名稱: 結果}；任務已被取消或改派時不覆寫 ---
+    def complete(self, task, worker, results=None, error=None):
+        if error is not None:
+            status, payload = "failed", {"message": f"❌ {task['file_name']} 處理失敗：{error}"}
+        else:
+            status = "done"
+            payload = {name: {k: r.get(k) for k in RESULT_FIELDS} for name, r in results.items()}
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE job_task SET status = ?, finished_at = ?, result = ? "
+                "WHERE job_id = ? AND idx = ? AND worker = ? AND status = 'running'",
+                (status, self.clock(), json.dumps(payload, ensure_ascii=False), task["job_id"], task["idx"], worker),
+            )
+
+    # --- 所有任務都結束的工作改為「彙整中」並回傳其編號，由呼叫的程序負責產生 Excel ---
+    # 記下彙整的程序並以心跳更新；程序在彙整途中中止時，逾時後由 _requeue_stale 交給其他程序
+    def take_finished(self, worker):
+        with self._connect() as conn:
+            return [row["id"] for row in conn.execute("""
+                UPDATE job SET status = 'finalizing', finalizer = ?, heartbeat = ?
+                WHERE status = 'running' AND NOT EXISTS (
+                    SELECT 1 FROM job_task AS t WHERE t.job_id = job.id AND t.status IN ('queued', 'running')
+                )
+                RETURNING id
+            """, (worker, self.clock())).fetchall()]
+
+    def finish(self, job_id, status, output_path=None, message=""):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE job SET status = ?, finished_at = ?, output_path = ?, message = ? WHERE id = ?",
+                (status, self.clock(), output_path, message, job_id),
+            )
+
+    def cancel(self, job_id):
+        with self._connect() as conn:
+            cancelled = conn.execute(
+                "UPDATE job SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (self.clock(), job_id),
+            ).rowcount
+            conn.execute("UPDATE job_task SET status = 'cancelled' WHERE job_id = ? AND status = 'queued'", (job_id,))
+        return bool(cancelled)
+
+    # --- 查詢工作：回傳工作資訊與各檔案狀態（含已完成檔案的結果，可作為部分結果顯示）；找不到時回傳 None ---
+    def job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM job WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            tasks = conn.execute(
+                "SELECT idx, file_name, status, attempts, result FROM job_task WHERE job_id = ? ORDER BY idx", (job_id,)
+            ).fetchall()
+            # 排在此工作之前、尚未處理的檔案數（其他審查人員的工作會與此工作輪流處理，僅供參考）
+            waiting = conn.execute(
+                "SELECT COUNT(*) FROM job_task AS t JOIN job AS j ON j.id = t.job_id "
+                "WHERE t.status = 'queued' AND j.status IN ('queued', 'running') AND j.created_at < ?",
+                (row["created_at"],),
+            ).fetchone()[0]
+        job = dict(row)
+        job["profiles"] = json.loads(job["profiles"])
+        job["options"] = json.loads(job["options"])
+        job["waiting"] = waiting
+        job["tasks"] = [{**dict(t), "result": json.loads(t["result"]) if t["result"] else None} for t in tasks]
+        job["done"] = sum(1 for t in tasks if t["status"] not in ACTIVE_STATUSES)
+        return job
+
+    def is_active(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM job WHERE id = ?", (job_id,)).fetchone()
+        return row is not None and row["status"] in ACTIVE_STATUSES + ("finalizing",)
+
+    # 已完成檔案的結果整理為 {設定檔名稱: {原始索引: 結果}}（與頁面同步處理時的結構相同）
+    @staticmethod
+    def job_results(job):
+        results = {name: {} for name in job["profiles"]}
+        for t in job["tasks"]:
+            if t["status"] == "done":
+                for name, result in t["result"].items():
+                    results.setdefault(name, {})[t["idx"]] = result
+        return results
+
+    def retire(self, worker):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM job_worker WHERE id = ?", (worker,))
+
+    def live_workers(self):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM job_worker WHERE heartbeat > ?", (self.clock() - STALE_SECONDS,)
+            ).fetchone()[0]
+
+    def pending_count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM job_task WHERE status = 'queued'").fetchone()[0]
+
+    # --- 清理：刪除結束超過 days 天的工作（含上傳檔與 Excel），回傳刪除的工作數 ---
+    def cleanup(self, days=DEFAULT_RETENTION_DAYS):
+        cutoff = self.clock() - days * 86400
+        with self._connect() as conn:
+            ids = [row["id"] for row in conn.execute(
+                "SELECT id FROM job WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ?", (cutoff,)
+            )]
+            conn.executemany("DELETE FROM job_task WHERE job_id = ?", [(i,) for i in ids])
+            conn.executemany("DELETE FROM job WHERE id = ?", [(i,) for i in ids])
+            conn.execute("DELETE FROM job_worker WHERE heartbeat < ?", (cutoff,))
+        for job_id in ids:
+            shutil.rmtree(os.path.join(self.job_dir, job_id), ignore_errors=True)
+        return len(ids)
+
+
+# --- 工作程序：領取任務 → OCR（沿用快取、上傳登錄與限速）→ 存回結果；工作全部完成時產生 Excel ---
+class Worker:
+    def __init__(self, queue, client, scheduler, cache=None, registry=None, store=None):
+        from ocr_profiles import load_profiles
+
+        self.queue = queue
+        self.client = client
+        self.scheduler = scheduler
+        self.cache = cache
+        self.registry = registry
+        self.store = store
+        self.profiles = load_profiles()
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.current = None
+
+    # 背景執行緒定期回報心跳，處理耗時很久的檔案時任務也不會被視為中止
+    def _heartbeat(self, stop):
+        while not stop.wait(HEARTBEAT_SECONDS):
+            self.queue.beat(self.id, self.current)
+
+    def run(self, idle_exit=False):
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(stop,), daemon=True).start()
+        try:
+            while True:
+                self.queue.beat(self.id)
+                if not self.run_once() and idle_exit and not self.queue.pending_count():
+                    return
+        finally:
+            stop.set()
+            self.queue.retire(self.id)
+
+    # 處理一個任務並彙整已完成的工作；沒有任務時稍候再回傳 False
+    def run_once(self):
+        task = self.queue.claim(self.id)
+        if task is not None:
+            self.current = task
+            try:
+                results = self.process(task)
+            except Exception as e:
+                self.queue.complete(task, self.id, error=e)
+            else:
+                self.queue.complete(task, self.id, results)
+            finally:
+                self.current = None
+        for job_id in self.queue.take_finished(self.id):
+            self.finalize(job_id)
+        if task is None:
+            time.sleep(IDLE_SECONDS)
+        return task is not None
+
+    def process(self, task):
+        import instrumentation
+        from ocr_engine import LocalFile, iter_ocr_events
+
+        instrumentation.activate(instrumentation.Recorder("ocr_worker", session=task["job_id"]))
+        options = task["options"]
+        profiles = [self.profiles[name] for name in task["profiles"]]
+        file = LocalFile(task["file_path"], name=task["file_name"])
+        results = {}
+        for kind, (_, name), value in iter_ocr_events(
+            [file], self.client, profiles, max_workers=options.get("max_workers", 4), cache=self.cache,
+            refresh=options.get("refresh", False), scheduler=self.scheduler,
+            segment_pages=options.get("segment_pages", 0), registry=self.registry,
+        ):
+            if kind != "done":
+                continue
+            results[name] = value
+            if self.store is not None and options.get("keep_records") and value["records"]:
+                self.store.add(value["records"], name)
+        return results
+
+    # --- 彙整：各設定檔一張工作表（可先合併重複申請人），存為 jobs/<工作編號>/OCR結果_<工作編號>.xlsx ---
+    def finalize(self, job_id):
+        from excel_style import write_styled_sheets
+        from ocr_engine import results_to_frames
+
+        job = self.queue.job(job_id)
+        try:
+            profiles = [self.profiles[name] for name in job["profiles"]]
+            frames, merged = results_to_frames(profiles, JobQueue.job_results(job), job["options"].get("merge"))
+            failed = sum(
+                1 for t in job["tasks"]
+                if t["status"] != "done" or any(r["level"] != "success" for r in t["result"].values())
+            )
+            output = None
+            if frames:
+                output = os.path.join(self.queue.job_dir, job_id, f"OCR結果_{job_id}.xlsx")
+                buffer = write_styled_sheets([(profile.title, df, profile.widths) for profile, df in frames])
+                with open(output, "wb") as f:
+                    f.write(buffer.getvalue())
+            message = f"共 {job['total']} 個檔案，解析 {sum(len(df) for _, df in frames)} 筆資料"
+            if merged:
+                message += f"（已合併 {merged} 筆重複申請人）"
+            if failed:
+                message += f"，{failed} 個檔案有錯誤"
+            self.queue.finish(job_id, "done" if frames or not failed else "failed", output, message)
+        except Exception as e:
+            self.queue.finish(job_id, "failed", None, f"產生 Excel 失敗：{e}")
+
+
+def _run_worker(args):
+    from dotenv import load_dotenv
+
+    from ocr_batch import make_client
+    from ocr_cache import OcrCache
+    from ocr_scheduler import RequestScheduler, SharedTokenBucket
+    from record_store import RecordStore
+    from upload_registry import UploadRegistry
+
+    load_dotenv()
+    queue = JobQueue(args.queue, args.job_dir)
+    # 所有程序（含網頁的「本頁立即處理」）共用佇列檔中的同一個令牌桶，合計不超過 --rpm
+    scheduler = RequestScheduler(bucket=SharedTokenBucket(args.queue, args.rpm))
+    # 替身模型的上傳與紀錄都是假的，不寫入正式的上傳登錄表與過往申請人紀錄庫（OCR 快取依模型名稱區分，不受影響）
+    if args.fake:
+        worker = Worker(queue, make_client(args), scheduler, OcrCache())
+    else:
+        worker = Worker(queue, make_client(args), scheduler, OcrCache(), UploadRegistry(), RecordStore())
+    worker.run(idle_exit=args.idle_exit)
+
+
+# --- 工作程序池：啟動 processes 個程序，程序意外結束時補上新的（--idle-exit 時全部結束即返回）---
+def run_pool(args):
+    ctx = multiprocessing.get_context("spawn")
+
+    def start():
+        p = ctx.Process(target=_run_worker, args=(args,), daemon=True)
+        p.start()
+        return p
+
+    from pdf_split import PYPDF_MISSING_MESSAGE, SEGMENTING_AVAILABLE
+
+    print(f"🧵 啟動 {args.processes} 個背景 OCR 工作程序（佇列：{args.queue}）", flush=True)
+    if not SEGMENTING_AVAILABLE:
+        print(PYPDF_MISSING_MESSAGE, flush=True)
+    procs = [start() for _ in range(args.processes)]
+    try:
+        while procs:
+            time.sleep(1)
+            procs = [p for p in procs if p.is_alive()]
+            if not args.idle_exit:
+                procs += [start() for _ in range(args.processes - len(procs))]
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+    return 0
+
+
+# 沒有存活的工作程序時，另開一個獨立的工作程序池（不隨網頁 rerun 結束）；running 為先前啟動、尚未登記心跳的程序池
+# 子程序已取得記錄檔的副本，父程序開啟的檔案在啟動後即關閉
+def start_background_pool(queue, processes=DEFAULT_PROCESSES, running=None):
+    if queue.live_workers() or (running is not None and running.poll() is None):
+        return running
+    with open(os.path.join(os.path.dirname(queue.path), "ocr_jobs.log"), "a") as log:
+        return subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--queue", queue.path, "--job-dir", queue.job_dir,
+             "worker", "--processes", str(processes)],
+            stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+
+
+def main(argv=None):
+    from ocr_engine import DEFAULT_MODEL_NAME
+    from ocr_scheduler import DEFAULT_RPM
+
+    parser = argparse.ArgumentParser(description="背景 OCR 工作佇列")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH)
+    parser.add_argument("--job-dir", default=DEFAULT_JOB_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="啟動工作程序池，處理佇列中的工作")
+    worker.add_argument("--processes", type=int, default=DEFAULT_PROCESSES)
+    worker.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    worker.add_argument("--rpm", type=int, default=int(os.getenv("GEMINI_RPM", DEFAULT_RPM)), help="所有程序合計的每分鐘請求上限")
+    worker.add_argument("--idle-exit", action="store_true", help="佇列清空後結束（測試用）")
+    worker.add_argument("--fake", action="store_true", help="使用離線替身模型（測試用，不呼叫 Gemini）")
+    worker.add_argument("--fake-latency", type=float, default=0.0)
+    worker.add_argument("--fake-records", type=int, default=1)
+    status = sub.add_parser("status", help="列出最近的工作")
+    status.add_argument("--limit", type=int, default=20)
+    cleanup = sub.add_parser("cleanup", help="刪除結束超過指定天數的工作與檔案")
+    cleanup.add_argument("--days", type=float, default=DEFAULT_RETENTION_DAYS)
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        return run_pool(args)
+    queue = JobQueue(args.queue, args.job_dir)
+    if args.command == "cleanup":
+        print(f"🧹 已刪除 {queue.cleanup(args.days)} 個工作")
+        return 0
+    with queue._connect() as conn:
+        ids = [row["id"] for row in conn.execute("SELECT id FROM job ORDER BY created_at DESC LIMIT ?", (args.limit,))]
+    print(f"🧵 存活的工作程序：{queue.live_workers()}，佇列中的檔案：{queue.pending_count()}")
+    for job_id in ids:
+        job = queue.job(job_id)
+        print(f"{job_id}  {job['owner']:<16} {job['status']:<10} {job['done']}/{job['total']}  {job['message'] or ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+import json
+
+# ✅ 模型漏掉的欄位以此值補上（與提示詞要求一致）
+MISSING_VALUE = "N/A"
+
+
+# --- 逐段解析模型回傳的 JSON 陣列：每讀完一個物件就交出，壞掉的物件略過、不影響前後紀錄 ---
+# 忽略陣列前後的 ```json 區塊標記、BOM 與說明文字；若模型只回傳單一物件，視為只有一筆的陣列
+class JsonArrayStreamParser:
+    def __init__(self):
+        self.started = False
+        self.depth = 0          # 0 = 陣列外；1 = 陣列內；2 以上 = 物件內
+        self.in_string = False
+        self.escape = False
+        self.last = ""          # 上一個非空白、非字串內的字元
+        self.buf = []           # 目前物件的原始文字
+        self.stray = []         # 陣列層級中非物件的元素
+        self.errors = []        # 無法解析的片段
+
+    # 回傳此段文字中完成的物件清單
+    def feed(self, chunk):
+        done = []
+        for ch in chunk:
+            if not self.started:
+                if ch == "[":
+                    self.started, self.depth = True, 1
+                elif ch == "{":
+                    self.started, self.depth = True, 1
+                    self._open(ch)
+                continue
+            if self.depth == 0:
+                continue
+
+            if self.depth >= 2:
+                if self.in_string:
+                    self.buf.append(ch)
+                    if self.escape:
+                        self.escape = False
+                    elif ch == "\\":
+                        self.escape = True
+                    elif ch == '"':
+                        self.in_string = False
+                        self.last = ch
+                    continue
+                # 紀錄層級出現「, {」：上一個物件少了結尾括號，丟棄並從新物件重新開始
+                if ch == "{" and self.depth == 2 and self.last == ",":
+                    self._fail()
+                    self._open(ch)
+                    continue
+                self.buf.append(ch)
+                if ch == '"':
+                    self.in_string = True
+                elif ch in "{[":
+                    self.depth += 1
+                elif ch in "}]":
+                    self.depth -= 1
+                    if self.depth == 1:
+                        done.extend(self._finish())
+                if not ch.isspace():
+                    self.last = ch
+                continue
+
+            # 陣列層級：物件開頭、分隔逗號與陣列結尾；其餘字元屬於非物件元素
+            if ch in "{],":
+                self._flush_stray()
+                if ch == "{":
+                    self._open(ch)
+                elif ch == "]":
+                    self.depth = 0
+            else:
+                self.stray.append(ch)
+        return done
+
+    # 串流結束：未完成的物件視為截斷
+    def close(self):
+        if self.buf:
+            self._fail()
+        self._flush_stray()
+        return []
+
+    def _flush_stray(self):
+        text = "".join(self.stray).strip()
+        self.stray = []
+        if text:
+            self.errors.append(text)
+
+    def _open(self, ch):
+        self.buf = [ch]
+        self.depth = 2
+        self.in_string = self.escape = False
+        self.last = ch
+
+    def _finish(self):
+        text = "".join(self.buf)
+        self.buf = []
+        try:
+            obj = json.loads(text, strict=False)
+        except json.JSONDecodeError:
+            self.errors.append(text)
+            return []
+        return [obj]
+
+    def _fail(self):
+        self.errors.append("".join(self.buf))
+        self.buf = []
+        self.depth = 1
+        self.in_string = self.escape = False
+
+
+# --- 依欄位清單檢查紀錄：非物件者回傳 None；缺少的欄位補 N/A，並回傳缺少的欄位名稱 ---
+def normalize_record(obj, columns):
+    if not isinstance(obj, dict):
+        return None, []
+    missing = [col for col in columns or [] if col not in obj]
+    for col in missing:
+        obj[col] = MISSING_VALUE
+    return obj, missing
+
+
+# --- 一次解析完整文字（非串流模式也走相同的容錯邏輯）---
+def parse_records(text):
+    parser = JsonArrayStreamParser()
+    records = parser.feed(text)
+    parser.close()
+    return records, parser
@@ -0,0 +1,398 @@
+import os
+import uuid
+from datetime import datetime
+
+import google.generativeai as genai
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+import instrumentation
+from excel_style import write_styled_sheets
+from job_queue import DEFAULT_QUEUE_PATH, JobQueue, start_background_pool
+from ocr_cache import OcrCache
+from ocr_engine import (
+    DEFAULT_MAX_WORKERS, DEFAULT_MODEL_NAME, GeminiClient, collect_records, iter_ocr_events, records_to_frame,
+    results_to_frames,
+)
+from ocr_profiles import load_profiles
+from ocr_scheduler import DEFAULT_RPM, RequestScheduler, SharedTokenBucket
+from pdf_split import DEFAULT_SEGMENT_PAGES, PYPDF_MISSING_MESSAGE, SEGMENTING_AVAILABLE
+from record_store import RecordStore
+from upload_registry import UploadRegistry
+
+# ✅ 讀取環境變數
+load_dotenv()
+API_KEY = os.getenv("GENIMI_API_KEY")
+
+
+# ✅ 共用資源：模型用戶端、OCR 快取、限速器與設定檔只建立一次，所有 rerun 與使用者共用
+@st.cache_resource
+def get_client(api_key, model_name=DEFAULT_MODEL_NAME):
+    if api_key:
+        genai.configure(api_key=api_key)
+    return GeminiClient(model_name)
+
+
+@st.cache_resource
+def get_ocr_cache():
+    return OcrCache()
+
+
+# 已上傳檔案登錄表：rerun 或換設定檔時沿用 48 小時內的上傳
+@st.cache_resource
+def get_upload_registry():
+    return UploadRegistry()
+
+
+# 同一把 API 金鑰的配額由所有使用者共用：令牌桶存於工作佇列檔，與背景工作程序合計不超過 GEMINI_RPM
+@st.cache_resource
+def get_scheduler():
+    rpm = int(os.getenv("GEMINI_RPM", DEFAULT_RPM))
+    return RequestScheduler(bucket=SharedTokenBucket(DEFAULT_QUEUE_PATH, rpm))
+
+
+# 過往申請人紀錄庫：辨識結果長期保存並建立檢索索引，供「相似的過往申請人」查詢
+@st.cache_resource
+def get_record_store():
+    return RecordStore()
+
+
+# 背景工作佇列：工作程序預設需另外執行 `python job_queue.py worker`
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+
+# 設定 OCR_AUTOSTART_WORKERS=1 時，送出工作而沒有存活的工作程序時由網頁啟動一組（程序池結束後下次送出會再啟動）
+@st.cache_resource
+def get_pool_launcher():
+    return {"process": None}
+
+
+def ensure_workers(queue):
+    if os.getenv("OCR_AUTOSTART_WORKERS", "0") != "1":
+        return
+    launcher = get_pool_launcher()
+    launcher["process"] = start_background_pool(queue, running=launcher["process"])
+
+
+@st.cache_resource
+def get_profiles():
+    return load_profiles()
+
+
+def record_label(record):
+    name = record.get("中文姓名") or record.get("英文名字＋英文姓氏") or "（未辨識姓名）"
+    return f"{name}｜{record.get('現職公司') or '-'}｜{record.get('來源檔案')}"
+
+
+# --- 相似的過往申請人：選一筆本次紀錄（或輸入關鍵字），列出紀錄庫中最相似的紀錄；護照號碼相同者排最前 ---
+def show_similar(store, frames, results):
+    st.subheader("🔎 相似的過往申請人")
+    options = [
+        (profile, record) for profile, _ in frames for record in collect_records(results[profile.name])
+    ]
+    col1, col2 = st.columns([3, 2])
+    picked = col1.selectbox(
+        "本次紀錄", range(len(options)), format_func=lambda i: record_label(options[i][1]), key="similar_record"
+    )
+    keywords = col2.text_input("或輸入關鍵字（姓名、公司、經歷…）", key="similar_text")
+    with instrumentation.span("records.search") as info:
+        if keywords.strip():
+            hits = store.search(keywords)
+        else:
+            profile, record = options[picked]
+            hits = store.similar(record, profile.name)
+        info["rows"] = len(hits)
+    if not hits:
+        st.info(f"ℹ️ 紀錄庫（共 {store.count()} 筆）中沒有相似的紀錄")
+        return
+    st.dataframe(pd.DataFrame([
+        {
+            "相似度": hit["score"],
+            "護照相符": "🛂" if hit["same_passport"] else "",
+            "中文姓名": hit["record"].get("中文姓名"),
+            "英文姓名": hit["record"].get("英文名字＋英文姓氏"),
+            "現職公司": hit["record"].get("現職公司"),
+            "現職職稱": hit["record"].get("現職職稱"),
+            "工作經歷": hit["record"].get("工作經歷"),
+            "來源檔案": hit["file_name"],
+            "辨識日期": datetime.fromtimestamp(hit["created_at"]).strftime("%Y-%m-%d"),
+        }
+        for hit in hits
+    ]), use_container_width=True, hide_index=True)
+
+
+def show_result(result, profile):
+    if result["text"]:
+        st.subheader(f"📜 Gemini 回傳內容 ({result['name']}｜{profile.title})")
+        st.code(result["text"], language="json")
+    getattr(st, result["level"])(result["message"])
+
+
+# --- OCR → Excel 頁面：default_profiles 為預設勾選的擷取設定檔 ---
+JOB_POLL_SECONDS = 2
+JOB_STATUS_LABELS = {
+    "queued": "⏳ 排隊中", "running": "🚀 處理中", "finalizing": "📦 產生 Excel 中",
+    "done": "✅ 完成", "failed": "❌ 失敗", "cancelled": "🚫 已取消",
+}
+
+
+# --- 單一背景工作：進度、各檔案訊息、已完成檔案的部分結果；完成後可下載 Excel ---
+def show_job(queue, job_id, all_profiles):
+    job = queue.job(job_id)
+    if job is None:
+        st.warning(f"⚠️ 找不到工作 {job_id}")
+        return False
+    active = job["status"] in ("queued", "running", "finalizing")
+    with st.container(border=True):
+        created = datetime.fromtimestamp(job["created_at"]).strftime("%m/%d %H:%M")
+        st.markdown(f"**🧾 工作 `{job_id}`**｜{job['owner']}｜{created}｜{JOB_STATUS_LABELS.get(job['status'], job['status'])}")
+        text = f"{job['done']}/{job['total']} 個檔案"
+        if job["status"] == "queued" and job["waiting"]:
+            text += f"（前面還有 {job['waiting']} 個檔案排隊）"
+        st.progress(job["done"] / max(1, job["total"]), text=text)
+        finished = [t for t in job["tasks"] if t["result"]]
+        if finished:
+            with st.expander(f"處理紀錄（{len(finished)}）"):
+                for t in finished:
+                    for result in (t["result"].values() if t["status"] == "done" else [t["result"]]):
+                        st.caption(result["message"])
+
+        if job["status"] == "done" and job["output_path"] and os.path.exists(job["output_path"]):
+            st.success(f"🎉 {job['message']}")
+            with open(job["output_path"], "rb") as f:
+                st.download_button(
+                    label="⬇️ 下載匯總 Excel", data=f.read(), file_name=os.path.basename(job["output_path"]),
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", key=f"download_{job_id}",
+                )
+        elif job["status"] in ("done", "failed"):
+            st.error(f"❌ {job['message']}")
+        elif active:
+            profiles = [all_profiles[name] for name in job["profiles"] if name in all_profiles]
+            frames, _ = results_to_frames(profiles, JobQueue.job_results(job))
+            for profile, df in frames:
+                st.caption(f"部分結果｜{profile.title}（{len(df)} 筆）")
+                st.dataframe(df, use_container_width=True)
+            if st.button("🚫 取消此工作", key=f"cancel_{job_id}"):
+                queue.cancel(job_id)
+                st.rerun()
+    return active
+
+
+# --- 背景佇列模式：送出後取得工作編號，頁面定期更新進度；重新整理或關閉頁面不影響處理 ---
+# 工作編號記在網址（?job=...），之後可在側邊欄輸入工作編號取回結果
+def queue_page(uploaded_files, profiles, all_profiles, options):
+    queue = get_job_queue()
+    owner = st.sidebar.text_input("審查人員（背景佇列依此輪流分配）", key="job_owner").strip()
+    owner = owner or st.session_state['instrumentation_session']
+    jobs = st.session_state.setdefault('ocr_jobs', [])
+    for job_id in (st.query_params.get("job"), st.sidebar.text_input("🔎 以工作編號查詢").strip()):
+        if job_id and job_id not in jobs:
+            jobs.insert(0, job_id)
+
+    if uploaded_files and not profiles:
+        st.warning("⚠️ 請至少選擇一個擷取設定檔")
+    elif uploaded_files and st.button(f"📤 送出背景處理（{len(uploaded_files)} 個檔案 × {len(profiles)} 個設定檔）"):
+        job_id = queue.submit(owner, uploaded_files, [p.name for p in profiles], options)
+        ensure_workers(queue)
+        jobs.insert(0, job_id)
+        st.query_params["job"] = job_id
+        st.success(f"✅ 已送出，工作編號 `{job_id}`：可關閉或重新整理頁面，之後以工作編號查詢結果")
+    if not queue.live_workers():
+        st.warning("⚠️ 目前沒有執行中的背景工作程序，請在伺服器執行 `python job_queue.py worker`（或設定 `OCR_AUTOSTART_WORKERS=1` 由網頁啟動）")
+    if not jobs:
+        return
+
+    # 有未完成的工作時定期更新（只重跑此區塊）；全部結束後整頁重跑一次，停止更新
+    @st.fragment(run_every=JOB_POLL_SECONDS)
+    def poll():
+        if not any([show_job(queue, job_id, all_profiles) for job_id in jobs]):
+            st.rerun()
+
+    if any(queue.is_active(job_id) for job_id in jobs):
+        poll()
+    else:
+        for job_id in jobs:
+            show_job(queue, job_id, all_profiles)
+
+
+# 每次 rerun 使用新的計時紀錄器（session 編號跨 rerun 沿用），側邊欄可開啟效能除錯面板
+def run_app(default_profiles):
+    session = st.session_state.setdefault('instrumentation_session', uuid.uuid4().hex[:12])
+    recorder = instrumentation.activate(instrumentation.Recorder("ocr", session))
+    ocr_page(default_profiles)
+    if st.sidebar.checkbox("🛠️ 顯示效能除錯面板", value=False):
+        instrumentation.render_panel(recorder)
+
+
+def ocr_page(default_profiles):
+    if not API_KEY:
+        st.error("❌ 找不到環境變數 GENIMI_API_KEY，請先設定後重新執行")
+    model = get_client(API_KEY)
+
+    # ✅ Streamlit UI
+    st.title("📂 金卡檔案 OCR → Excel 轉換工具 ")
+
+    uploaded_files = st.file_uploader(
+        "請上傳多個 PDF 或影像檔 (PDF, PNG, JPG)",
+        type=["pdf", "png", "jpg", "jpeg"],
+        accept_multiple_files=True
+    )
+
+    all_profiles = get_profiles()
+    selected = st.sidebar.multiselect(
+        "擷取設定檔（可多選，同一次上傳套用全部）", list(all_profiles), default=default_profiles,
+        format_func=lambda name: all_profiles[name].title,
+    )
+    profiles = [all_profiles[name] for name in selected]
+    max_workers = st.sidebar.number_input(
+        "同時處理檔案數", min_value=1, max_value=16, value=DEFAULT_MAX_WORKERS, step=1
+    )
+    segment_pages = st.sidebar.number_input(
+        "PDF 分段頁數上限（0 = 不分段）", min_value=0, max_value=200, value=DEFAULT_SEGMENT_PAGES, step=1,
+        help="超過此頁數的 PDF 會先在本機依申請人封面頁（護照、申請表）或固定頁數切段，各段並行辨識",
+    )
+    if segment_pages and not SEGMENTING_AVAILABLE:
+        st.sidebar.warning(PYPDF_MISSING_MESSAGE)
+    stream_preview = st.sidebar.checkbox("即時預覽（串流接收 Gemini 回傳）", value=True)
+    bypass_cache = st.sidebar.checkbox("略過 OCR 快取（強制重新辨識）", value=False)
+    keep_records = st.sidebar.checkbox(
+        "📚 保存辨識結果至過往申請人紀錄庫", value=True, help="保存後可查詢相似的過往申請人（雇主、經歷相近或護照號碼相同）",
+    )
+    merge_dupes = st.sidebar.checkbox(
+        "🧬 合併重複申請人", value=True,
+        help="同一申請人分散在多個檔案（例如履歷與護照分開上傳）時，依護照號碼、出生日期與姓名合併為一列，逐欄保留來源",
+    )
+    record_store = get_record_store()
+
+    ocr_cache = get_ocr_cache()
+    if st.sidebar.button("🗑️ 清除 OCR 快取"):
+        ocr_cache.clear()
+        st.sidebar.success("已清除快取")
+
+    registry = get_upload_registry()
+    if st.sidebar.button("🧹 清理過期上傳"):
+        try:
+            forgotten, deleted = registry.cleanup(model)
+            st.sidebar.success(f"已移除 {forgotten} 筆過期紀錄、刪除 {deleted} 個孤立的上傳檔")
+        except Exception as e:
+            st.sidebar.error(f"❌ 清理失敗：{e}")
+
+    scheduler = get_scheduler()
+    st.sidebar.caption(f"API 限速：每分鐘 {int(scheduler.bucket.rate * 60)} 次請求，失敗自動重試最多 {scheduler.max_attempts} 次")
+
+    mode = st.sidebar.radio(
+        "處理方式", ["背景佇列", "本頁立即處理"],
+        help="背景佇列：送出後取得工作編號，可關閉或重新整理頁面，多位審查人員共用工作程序；本頁立即處理：在此頁面同步處理",
+    )
+    if mode == "背景佇列":
+        options = {
+            "max_workers": int(max_workers), "segment_pages": int(segment_pages), "refresh": bypass_cache,
+            "merge": merge_dupes, "keep_records": keep_records,
+        }
+        queue_page(uploaded_files, profiles, all_profiles, options)
+        return
+
+    # 已處理過的 (檔案, 設定檔) 結果保留在 session 中，rerun 時不重送；失敗的需按「只重試失敗檔案」
+    if 'ocr_results' not in st.session_state:
+        st.session_state['ocr_results'] = {}
+
+    if not uploaded_files:
+        return
+    if not profiles:
+        st.warning("⚠️ 請至少選擇一個擷取設定檔")
+        return
+
+    done_results = st.session_state['ocr_results']
+    results = {profile.name: {} for profile in profiles}
+    pending_profiles = {}
+    for idx, file in enumerate(uploaded_files):
+        todo = []
+        for profile in profiles:
+            if (file.file_id, profile.name) in done_results:
+                results[profile.name][idx] = done_results[file.file_id, profile.name]
+                show_result(results[profile.name][idx], profile)
+            else:
+                todo.append(profile)
+        if todo:
+            pending_profiles.setdefault(tuple(p.name for p in todo), []).append(idx)
+
+    # 依「待處理設定檔組合」分組送出，同一檔案只上傳一次
+    total = sum(len(names) * len(idxs) for names, idxs in pending_profiles.items())
+    if total:
+        progress = st.progress(0.0, text="🚀 正在處理所有檔案，請稍候...")
+        # 串流模式：每解析完一筆就更新即時預覽（檔案完成後由下方完整結果取代）
+        preview, live_records, done = st.empty(), {}, 0
+        for names, idxs in pending_profiles.items():
+            group = [all_profiles[name] for name in names]
+            for kind, (i, name), value in iter_ocr_events(
+                [uploaded_files[idx] for idx in idxs], model, group, max_workers=max_workers,
+                cache=ocr_cache, refresh=bypass_cache, scheduler=scheduler, segment_pages=segment_pages,
+                stream=stream_preview, registry=registry,
+            ):
+                if kind == "record":
+                    live_records.setdefault(name, []).append(value)
+                    with preview.container():
+                        for live_name, records in live_records.items():
+                            profile = all_profiles[live_name]
+                            st.dataframe(records_to_frame(records, profile.columns), use_container_width=True)
+                    continue
+                done += 1
+                idx = idxs[i]
+                results[name][idx] = done_results[uploaded_files[idx].file_id, name] = value
+                # 新批次逐檔加入紀錄庫（已存在的紀錄自動略過）
+                if keep_records and value["records"]:
+                    with instrumentation.span("records.index", rows=len(value["records"])):
+                        record_store.add(value["records"], name)
+                progress.progress(done / total, text=f"🔍 已完成 {done}/{total}：**{value['name']}**")
+                show_result(value, all_profiles[name])
+        progress.empty()
+        preview.empty()
+
+    failed = [
+        (uploaded_files[idx].file_id, name)
+        for name, by_file in results.items() for idx, r in by_file.items() if r["level"] != "success"
+    ]
+    if failed and st.button(f"🔁 只重試失敗的 {len(failed)} 項（檔案 × 設定檔）"):
+        for key in failed:
+            done_results.pop(key, None)
+        st.rerun()
+
+    # 快取命中統計
+    finished = [r for by_file in results.values() for r in by_file.values()]
+    cache_hits = sum(1 for r in finished if r["cached"])
+    col1, col2 = st.sidebar.columns(2)
+    col1.metric("快取命中", cache_hits)
+    col2.metric("快取未命中", len(finished) - cache_hits)
+
+    # 匯總結果轉 Excel：每個設定檔一張工作表
+    frames, merged_count = results_to_frames(profiles, results, merge_dupes)
+    if frames:
+        st.success(f"🎉 所有檔案完成，共解析 {sum(len(df) for _, df in frames)} 筆資料")
+        if merged_count:
+            st.info(f"🧬 已合併 {merged_count} 筆重複申請人紀錄（合併來源欄註明各欄位採用的檔案）")
+
+        # 🔧 產生美化後的 Excel：固定欄位寬度、標題顏色、字型與換行（寫入時一次套用）
+        with instrumentation.span("ocr.excel", rows=sum(len(df) for _, df in frames)) as info:
+            buffer = write_styled_sheets([(profile.title, df, profile.widths) for profile, df in frames])
+            info["bytes"] = buffer.getbuffer().nbytes
+
+        # 提供下載
+        now = datetime.now().strftime("%Y%m%d_%H%M%S")
+        st.download_button(
+            label="⬇️ 下載匯總 Excel",
+            data=buffer,
+            file_name=f"OCR結果_{now}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+
+        # ✅ Excel 預覽
+        st.subheader("📊 Excel 預覽")
+        for profile, df in frames:
+            if len(frames) > 1:
+                st.caption(profile.title)
+            st.dataframe(df, use_container_width=True)
+
+        show_similar(record_store, frames, results)
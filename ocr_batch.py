@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+import instrumentation
+from excel_style import write_styled_workbook
+from ocr_cache import sha256_hex
+from ocr_profiles import DEFAULT_PROFILE, PROFILE_DIR, load_profile
+from pdf_split import DEFAULT_SEGMENT_PAGES, PYPDF_MISSING_MESSAGE, SEGMENTING_AVAILABLE
+from record_store import RecordStore
+from upload_registry import UploadRegistry
+from ocr_scheduler import DEFAULT_MAX_ATTEMPTS, DEFAULT_RPM, RequestScheduler
+from ocr_engine import (
+    DEFAULT_MAX_WORKERS, DEFAULT_MODEL_NAME, FakeModelClient, GeminiClient, LocalFile,
+    results_to_frames, run_ocr_batch,
+)
+
+SUPPORTED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg"}
+
+
+# --- 遞迴找出目錄下所有申請檔案（依路徑排序，確保輸出順序固定）---
+def find_files(root):
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in SUPPORTED_EXTENSIONS:
+                paths.append(os.path.join(dirpath, filename))
+    return sorted(paths)
+
+
+# --- 進度檔（JSON lines）：每完成一個檔案寫入一行，中斷後重跑時略過已成功的檔案（依設定檔區分）---
+def load_state(path):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 中斷時寫到一半的最後一行
+            done[(entry["name"], entry["sha256"], entry.get("profile", DEFAULT_PROFILE))] = entry["result"]
+    return done
+
+
+def make_client(args):
+    if args.fake:
+        return FakeModelClient(records_per_file=args.fake_records, latency=args.fake_latency)
+    import google.generativeai as genai
+
+    load_dotenv()
+    api_key = os.getenv("GENIMI_API_KEY")
+    if not api_key:
+        sys.exit("❌ 找不到環境變數 GENIMI_API_KEY，請先設定後重新執行")
+    genai.configure(api_key=api_key)
+    return GeminiClient(args.model)
+
+
+def run_batch(args):
+    paths = find_files(args.directory)
+    if not paths:
+        print(f"⚠️ {args.directory} 內沒有 PDF 或影像檔")
+        return 1
+
+    recorder = instrumentation.activate(instrumentation.Recorder("ocr_batch"))
+    profile = load_profile(args.profile)
+    state_path = args.state or args.out + ".state.jsonl"
+    done = load_state(state_path)
+    files = [LocalFile(p, name=os.path.relpath(p, args.directory)) for p in paths]
+    hashes = [sha256_hex(f.getvalue()) for f in files]
+
+    results, pending = {}, []
+    for idx, (f, digest) in enumerate(zip(files, hashes)):
+        if (f.name, digest, profile.name) in done:
+            results[idx] = done[(f.name, digest, profile.name)]
+        else:
+            pending.append(idx)
+    print(f"🔍 共 {len(files)} 個檔案，已完成 {len(results)} 個，待處理 {len(pending)} 個")
+
+    if args.segment_pages and not SEGMENTING_AVAILABLE:
+        print(PYPDF_MISSING_MESSAGE)
+    client = make_client(args) if pending else None
+    scheduler = RequestScheduler(rate_per_minute=args.rpm, max_attempts=args.max_attempts)
+    # 替身模型的上傳與紀錄都是假的，不寫入正式的上傳登錄表與過往申請人紀錄庫
+    registry = None if args.no_upload_registry or args.fake else UploadRegistry()
+    store = None if args.no_record_store or args.fake else RecordStore()
+    failed = 0
+    with open(state_path, "a", encoding="utf-8") as state:
+        batch = [files[idx] for idx in pending]
+        for done_count, (i, result) in enumerate(
+            run_ocr_batch(batch, client, profile, max_workers=args.workers, scheduler=scheduler,
+                          segment_pages=args.segment_pages, registry=registry), start=1
+        ):
+            idx = pending[i]
+            results[idx] = result
+            print(f"[{done_count}/{len(batch)}] {result['message']}")
+            if result["level"] != "success":
+                failed += 1
+                continue
+            if store is not None:
+                with instrumentation.span("records.index", rows=len(result["records"])):
+                    store.add(result["records"], profile.name)
+            entry = {"name": files[idx].name, "sha256": hashes[idx], "profile": profile.name, "result": result}
+            state.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            state.flush()
+
+    frames, merged = results_to_frames([profile], {profile.name: results}, merge=not args.no_dedup)
+    if merged:
+        print(f"🧬 已合併 {merged} 筆重複申請人紀錄")
+    for _, df in frames:
+        with instrumentation.span("ocr.excel", rows=len(df)) as fields:
+            write_styled_workbook(df, profile.widths, args.out)
+            fields["bytes"] = os.path.getsize(args.out)
+        print(f"🎉 共解析 {len(df)} 筆資料，已輸出 {args.out}")
+    if args.timings:
+        for r in recorder.summary():
+            print(f"⏱️ {r['stage']:<16} {r['count']:>5} 次  總計 {r['total_ms'] / 1000:.2f} 秒  p95 {r['p95_ms']:.1f} ms")
+    if failed:
+        print(f"❌ {failed} 個檔案失敗，重新執行相同指令即可只處理失敗的檔案")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="金卡申請檔案批次 OCR → Excel")
+    sub = parser.add_subparsers(dest="command", required=True)
+    batch = sub.add_parser("batch", help="處理目錄下所有 PDF / 影像檔")
+    batch.add_argument("directory")
+    batch.add_argument("--out", default="results.xlsx", help="輸出 Excel 路徑")
+    batch.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="同時處理檔案數")
+    batch.add_argument("--state", help="進度檔路徑（預設為 <out>.state.jsonl）")
+    batch.add_argument("--segment-pages", type=int, default=DEFAULT_SEGMENT_PAGES,
+                       help="超過此頁數的 PDF 先切段再辨識（0 = 不分段）")
+    batch.add_argument("--profile", default=DEFAULT_PROFILE,
+                       choices=sorted(f[:-len(".json")] for f in os.listdir(PROFILE_DIR) if f.endswith(".json")),
+                       help="擷取設定檔（profiles/<名稱>.json）")
+    batch.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    batch.add_argument("--rpm", type=int, default=int(os.getenv("GEMINI_RPM", DEFAULT_RPM)), help="每分鐘請求上限")
+    batch.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="可重試錯誤的最多嘗試次數")
+    batch.add_argument("--no-upload-registry", action="store_true", help="不沿用先前的上傳，每次重新上傳")
+    batch.add_argument("--no-dedup", action="store_true", help="不合併跨檔案的重複申請人紀錄")
+    batch.add_argument("--no-record-store", action="store_true", help="不將辨識結果保存至過往申請人紀錄庫")
+    batch.add_argument("--timings", action="store_true", help="結束時列出各階段耗時")
+    batch.add_argument("--fake", action="store_true", help="使用離線替身模型（測試用，不呼叫 Gemini）")
+    batch.add_argument("--fake-latency", type=float, default=0.0, help="替身模型每次呼叫的延遲秒數")
+    batch.add_argument("--fake-records", type=int, default=1, help="替身模型每個檔案回傳的筆數")
+    cleanup = sub.add_parser("cleanup-uploads", help="清理過期的上傳紀錄與孤立的 Gemini 上傳檔")
+    cleanup.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    cleanup.set_defaults(fake=False)
+    args = parser.parse_args(argv)
+    if args.command == "cleanup-uploads":
+        forgotten, deleted = UploadRegistry().cleanup(make_client(args))
+        print(f"🧹 已移除 {forgotten} 筆過期紀錄、刪除 {deleted} 個孤立的上傳檔")
+        return 0
+    return run_batch(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
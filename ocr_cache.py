@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# ✅ 快取檔放在 mydb.sqlite 旁邊
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ocr_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+def sha256_hex(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+# --- Gemini OCR 結果快取：以 (檔案內容雜湊, 模型名稱, 提示詞雜湊) 為鍵 ---
+class OcrCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_result (
+                    file_hash TEXT,
+                    model_name TEXT,
+                    prompt_hash TEXT,
+                    file_name TEXT,
+                    records TEXT,
+                    created_at REAL,
+                    last_used REAL,
+                    PRIMARY KEY (file_hash, model_name, prompt_hash)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_result_last_used ON ocr_result(last_used)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(data, model_name, prompt):
+        return (sha256_hex(data), model_name, sha256_hex(prompt))
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT records, created_at FROM ocr_result WHERE file_hash = ? AND model_name = ? AND prompt_hash = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.max_age:
+                conn.execute(
+                    "DELETE FROM ocr_result WHERE file_hash = ? AND model_name = ? AND prompt_hash = ?", key
+                )
+                return None
+            conn.execute(
+                "UPDATE ocr_result SET last_used = ? WHERE file_hash = ? AND model_name = ? AND prompt_hash = ?",
+                (now, *key),
+            )
+        return json.loads(row[0])
+
+    def put(self, key, file_name, records):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_result VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, file_name, json.dumps(records, ensure_ascii=False), now, now),
+            )
+            self._evict(conn, now)
+
+    # --- 淘汰：超過保存天數，或超過筆數上限時移除最久未使用者 ---
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM ocr_result WHERE created_at < ?", (now - self.max_age,))
+        conn.execute(
+            """
+            DELETE FROM ocr_result WHERE rowid IN (
+                SELECT rowid FROM ocr_result ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM ocr_result")
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM ocr_result").fetchone()[0]
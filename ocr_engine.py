@@ -0,0 +1,456 @@
+import io
+import json
+import mimetypes
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+import pandas as pd
+
+import instrumentation
+from dedup import merge_duplicates
+from ocr_cache import sha256_hex
+from json_stream import JsonArrayStreamParser, normalize_record
+from pdf_split import DEFAULT_SEGMENT_PAGES, split_file
+
+# ✅ 同時送出的檔案數上限（避免一次打爆 API 配額）
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MODEL_NAME = "gemini-2.5-pro"
+# Gemini 上傳的檔案保留 48 小時
+FILE_TTL = 48 * 3600
+
+
+# --- Gemini 模型用戶端：上傳檔案、產生內容、管理已上傳檔案 ---
+class GeminiClient:
+    def __init__(self, model_name=DEFAULT_MODEL_NAME):
+        self.model = genai.GenerativeModel(model_name)
+        self.model_name = self.model.model_name
+
+    def upload(self, file, display_name=None):
+        return genai.upload_file(file, mime_type=file.type, display_name=display_name)
+
+    def get_file(self, name):
+        return genai.get_file(name)
+
+    # 回傳 [(遠端名稱, 顯示名稱, 建立時間, 到期時間)]，時間皆為 epoch 秒
+    def list_files(self):
+        for f in genai.list_files():
+            yield f.name, f.display_name, f.create_time.timestamp(), f.expiration_time.timestamp()
+
+    def delete_file(self, name):
+        genai.delete_file(name)
+
+    # 已上傳檔案的 (遠端名稱, 到期時間)
+    @staticmethod
+    def remote_file(handle):
+        return handle.name, handle.expiration_time.timestamp()
+
+    def generate(self, prompt, handle):
+        return self.model.generate_content([prompt, handle]).text
+
+    # 串流模式：逐段交出模型產生的文字
+    def generate_stream(self, prompt, handle):
+        for chunk in self.model.generate_content([prompt, handle], stream=True):
+            yield chunk.text
+
+
+# --- 替身檔案服務的已上傳檔案 ---
+class FakeFile:
+    def __init__(self, name, display_name, created_at, expires_at):
+        self.name = name
+        self.display_name = display_name
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+
+# --- 離線測試用的替身用戶端：不連網，每個檔案回傳固定筆數的 "N/A" 紀錄 ---
+# 未指定 columns 時回傳空物件，由設定檔的欄位檢核補上 N/A
+# 內建記憶體中的檔案服務（上傳、查詢、列出、刪除、到期），uploads 記錄實際上傳次數
+# field_chars > 0 時每個欄位改填該長度的範例文字（模擬較大的回傳內容，供效能測試）
+class FakeModelClient:
+    def __init__(self, columns=None, records_per_file=1, latency=0.0, upload_latency=0.0, clock=time.time,
+                 field_chars=0):
+        self.columns = columns
+        self.records_per_file = records_per_file
+        self.field_chars = field_chars
+        self.latency = latency
+        self.upload_latency = upload_latency
+        self.clock = clock
+        self.model_name = "fake-model"
+        self.files = {}
+        self.uploads = 0
+        self._lock = threading.Lock()
+
+    def upload(self, file, display_name=None):
+        time.sleep(self.upload_latency)
+        now = self.clock()
+        handle = FakeFile(f"files/fake-{uuid.uuid4().hex[:12]}", display_name, now, now + FILE_TTL)
+        with self._lock:
+            self.files[handle.name] = handle
+            self.uploads += 1
+        return handle
+
+    def get_file(self, name):
+        handle = self.files.get(name)
+        if handle is None or handle.expires_at <= self.clock():
+            raise FileNotFoundError(name)
+        return handle
+
+    def list_files(self):
+        return [(f.name, f.display_name, f.created_at, f.expires_at) for f in list(self.files.values())]
+
+    def delete_file(self, name):
+        with self._lock:
+            del self.files[name]
+
+    @staticmethod
+    def remote_file(handle):
+        return handle.name, handle.expires_at
+
+    def generate(self, prompt, handle):
+        time.sleep(self.latency)
+        records = [
+            {col: self._value(col, i) for col in self.columns or []} for i in range(self.records_per_file)
+        ]
+        return "```json\n" + json.dumps(records, ensure_ascii=False) + "\n```"
+
+    def _value(self, col, i):
+        if not self.field_chars:
+            return "N/A"
+        text = f"{col}-{i}：範例內容，含 \"引號\" 與換行\n"
+        return (text * (self.field_chars // len(text) + 1))[:self.field_chars]
+
+    def generate_stream(self, prompt, handle):
+        text = self.generate(prompt, handle)
+        for i in range(0, len(text), 64):
+            yield text[i:i + 64]
+
+
+# --- 本機檔案（批次模式）：與 Streamlit UploadedFile 相同的 name / type / getvalue 介面 ---
+class LocalFile(io.BytesIO):
+    def __init__(self, path, name=None):
+        with open(path, "rb") as f:
+            super().__init__(f.read())
+        self.name = name or os.path.basename(path)
+        self.type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+# --- 清理 Gemini 回傳文字（去除 ```json 區塊標記與 BOM）---
+def clean_ocr_text(text):
+    text = (text or "").strip()
+    text = re.sub(r"^```json\s*", "", text)
+    text = re.sub(r"```$", "", text)
+    return text.replace("\ufeff", "").strip()
+
+
+# --- 經由排程器呼叫 API（限速與重試）；未指定排程器時直接呼叫 ---
+def _scheduled(scheduler, fn, *args, rate_limited=True):
+    if scheduler is None:
+        return fn(*args), 1
+    return scheduler.call(fn, *args, rate_limited=rate_limited)
+
+
+def _upload(client, file, display_name=None):
+    file.seek(0)  # 重試時從頭上傳
+    return client.upload(file, display_name=display_name)
+
+
+# --- 產生內容並逐段解析；已解析出紀錄後才中斷的串流不重試，保留已完成的紀錄 ---
+# 解析（含逐筆檢核）耗時另外累計，與等待模型的時間分開記錄
+def _generate_records(client, prompt, handle, stream, on_record):
+    parser = JsonArrayStreamParser()
+    chunks, records = [], []
+    parse_seconds, start = 0.0, time.perf_counter()
+
+    def take(objs):
+        nonlocal parse_seconds
+        begin = time.perf_counter()
+        for obj in objs:
+            records.append(obj)
+            on_record(obj)
+        parse_seconds += time.perf_counter() - begin
+
+    def feed(chunk):
+        nonlocal parse_seconds
+        chunks.append(chunk)
+        begin = time.perf_counter()
+        objs = parser.feed(chunk)
+        parse_seconds += time.perf_counter() - begin
+        take(objs)
+
+    failed = True
+    try:
+        if stream and hasattr(client, "generate_stream"):
+            try:
+                for chunk in client.generate_stream(prompt, handle):
+                    feed(chunk)
+            except Exception as e:
+                if not records:
+                    raise
+                parser.errors.append(f"串流中斷：{e}")
+        else:
+            feed(client.generate(prompt, handle))
+        take(parser.close())
+        failed = False
+    finally:
+        text = "".join(chunks)
+        fields = {"bytes": len(text.encode("utf-8")), "stream": bool(stream)}
+        if failed:
+            fields["error"] = True
+        instrumentation.record("ocr.generate", time.perf_counter() - start - parse_seconds, **fields)
+        instrumentation.record("ocr.parse", parse_seconds, rows=len(records))
+    return text, records, parser
+
+
+def _new_result(name):
+    return {"name": name, "text": "", "records": [], "level": "success", "message": "", "cached": False,
+            "attempts": 0}
+
+
+def _fail(result, e):
+    result["attempts"] += getattr(e, "attempts", 1)
+    result["level"] = "error"
+    result["message"] = f"❌ {result['name']} 處理失敗（共嘗試 {getattr(e, 'attempts', 1)} 次）：{e}"
+    return result
+
+
+# --- 上傳檔案（配額限制在產生內容的請求上，上傳只做重試）；回傳 (檔案代號, 嘗試次數) ---
+# 有登錄表時，相同內容且仍有效的上傳直接沿用（只查詢一次檔案狀態），不重新上傳
+def upload_file(file, client, scheduler=None, registry=None):
+    size = len(file.getvalue())
+    if registry is None:
+        with instrumentation.span("ocr.upload", bytes=size):
+            return _scheduled(scheduler, _upload, client, file, rate_limited=False)
+    file_hash = sha256_hex(file.getvalue())
+    name = registry.get(file_hash)
+    if name:
+        try:
+            with instrumentation.span("ocr.get_file"):
+                uploaded = _scheduled(scheduler, client.get_file, name, rate_limited=False)
+            instrumentation.count_cache("upload_registry", True)
+            return uploaded
+        except Exception:
+            registry.forget(file_hash)  # 遠端已刪除或到期，重新上傳
+    instrumentation.count_cache("upload_registry", False)
+    with instrumentation.span("ocr.upload", bytes=size):
+        handle, attempts = _scheduled(
+            scheduler, _upload, client, file, registry.display_name(file_hash), rate_limited=False
+        )
+    registry.put(file_hash, *client.remote_file(handle))
+    return handle, attempts
+
+
+# --- 單一檔案、單一設定檔：（上傳 →）產生內容 → 逐筆解析 JSON ---
+# uploaded 為 upload_file 的回傳值；多個設定檔共用同一次上傳，未指定時才自行上傳
+# attempts 記錄此檔案實際送出的 API 呼叫次數（含重試）；重試次數另外計算（共用的上傳只有第一個設定檔計入次數）
+# 缺少的欄位補 N/A、不符設定檔規則的紀錄加上「檢核提示」；格式錯誤的紀錄略過，不影響其他紀錄
+# stream=True 時每解析完一筆就呼叫 on_record(紀錄)，可即時預覽
+def ocr_file(file, client, profile, scheduler=None, stream=False, on_record=None, uploaded=None):
+    result = _new_result(file.name)
+    records, invalid, incomplete, flagged = [], 0, 0, 0
+
+    def prepare(obj):
+        nonlocal invalid, incomplete, flagged
+        record, missing = normalize_record(obj, profile.columns)
+        if record is None:
+            invalid += 1
+            return
+        incomplete += bool(missing)
+        issues = profile.check(record)
+        if issues:
+            flagged += 1
+            record["檢核提示"] = "；".join(issues)
+        record["來源檔案"] = getattr(file, "source_name", file.name)
+        if hasattr(file, "page_range"):
+            record["頁碼範圍"] = file.page_range
+        records.append(record)
+        if on_record:
+            on_record(record)
+
+    try:
+        handle, upload_attempts = uploaded or upload_file(file, client, scheduler)
+        (ocr_text, _, parser), generate_attempts = _scheduled(
+            scheduler, _generate_records, client, profile.prompt, handle, stream, prepare
+        )
+        result["attempts"] += upload_attempts + generate_attempts
+        retries = max(0, upload_attempts - 1) + generate_attempts - 1
+        result["text"] = clean_ocr_text(ocr_text)
+        result["records"] = records
+        errors = len(parser.errors) + invalid
+
+        if not result["text"]:
+            result["level"] = "error"
+            result["message"] = f"❌ {file.name} OCR 失敗：Gemini API 沒有回傳內容"
+            return result
+
+        if not records and (errors or not parser.started):
+            result["level"] = "error"
+            result["message"] = f"❌ {file.name} OCR 回傳不是有效的 JSON，請檢查上方內容"
+            return result
+
+        if errors:
+            result["level"] = "warning"
+            result["message"] = f"⚠️ {file.name} 解析 {len(records)} 筆資料，另有 {errors} 段內容格式錯誤已略過"
+        else:
+            result["message"] = f"✅ {file.name} 解析完成，共 {len(records)} 筆資料"
+        if incomplete:
+            result["message"] += f"（{incomplete} 筆缺少欄位已補 N/A）"
+        if flagged:
+            result["message"] += f"（{flagged} 筆未通過欄位檢核）"
+        if retries:
+            result["message"] += f"（API 重試 {retries} 次）"
+    except Exception as e:
+        _fail(result, e)
+    return result
+
+
+# --- 合併同一檔案各分段的結果：成功分段的紀錄一律保留，失敗分段只影響自己的頁碼範圍 ---
+def merge_segment_results(name, segment_results):
+    if len(segment_results) == 1:
+        return segment_results[0]
+    records = [r for seg in segment_results for r in seg["records"]]
+    failed = [seg for seg in segment_results if seg["level"] != "success"]
+    result = {
+        "name": name,
+        "text": "\n\n".join(f"// {seg['name']}\n{seg['text']}" for seg in segment_results if seg["text"]),
+        "records": records,
+        "level": "success",
+        "message": f"✅ {name} 解析完成（分 {len(segment_results)} 段），共 {len(records)} 筆資料",
+        "cached": False,
+        "attempts": sum(seg["attempts"] for seg in segment_results),
+    }
+    if failed:
+        result["level"] = "warning" if records else "error"
+        icon = "⚠️" if records else "❌"
+        result["message"] = (
+            f"{icon} {name} 共 {len(segment_results)} 段中 {len(failed)} 段失敗，已保留其餘 {len(records)} 筆資料：\n"
+            + "\n".join(seg["message"] for seg in failed)
+        )
+    return result
+
+
+# --- 多檔案 × 多設定檔並行處理，依發生順序回傳事件；key 為 (原始索引, 設定檔名稱) ---
+# ("record", key, 紀錄)：stream=True 時每解析完一筆即回傳，可即時預覽
+# ("done", key, 結果)：該檔案（含所有分段）在該設定檔下處理完成
+# 同一檔案（分段）只上傳一次，各設定檔共用；有上傳登錄表時跨 rerun 沿用仍有效的上傳；單一檔案失敗只會反映在該檔結果，不影響其他檔案
+# 有快取時，已處理過的 (檔案, 設定檔) 直接回傳快取結果，不再呼叫 Gemini；refresh=True 則略過讀取、重新辨識並更新快取
+# 頁數超過 segment_pages 的 PDF 先在本機切段（依申請人封面頁或固定頁數），各段並行送出後再合併
+def iter_ocr_events(files, client, profiles, max_workers=DEFAULT_MAX_WORKERS, cache=None, refresh=False,
+                    scheduler=None, segment_pages=DEFAULT_SEGMENT_PAGES, stream=False, registry=None):
+    pending = {}
+    for idx, f in enumerate(files):
+        for profile in profiles:
+            key = cache.make_key(f.getvalue(), client.model_name, profile.prompt) if cache else None
+            records = cache.get(key) if cache and not refresh else None
+            if cache and not refresh:
+                instrumentation.count_cache("ocr_result", records is not None)
+            if records is None:
+                pending.setdefault(idx, {})[profile.name] = (profile, key)
+                continue
+            for r in records:
+                r["來源檔案"] = f.name
+            yield "done", (idx, profile.name), {
+                "name": f.name,
+                "text": json.dumps(records, ensure_ascii=False, indent=2),
+                "records": records,
+                "level": "success",
+                "message": f"⚡ {f.name} 使用快取結果，共 {len(records)} 筆資料",
+                "cached": True,
+                "attempts": 0,
+            }
+
+    if not pending:
+        return
+    with instrumentation.span("ocr.split") as info:
+        segments = {idx: split_file(files[idx], segment_pages) for idx in pending}
+        info["rows"] = sum(len(segs) for segs in segments.values())
+    done = {(idx, name): [None] * len(segments[idx]) for idx, profs in pending.items() for name in profs}
+    total = sum(len(segments[idx]) * len(profs) for idx, profs in pending.items())
+    max_workers = max(1, min(int(max_workers), sum(len(segs) for segs in segments.values())))
+
+    # 工作執行緒把紀錄與完成結果放進佇列，由呼叫端所在的執行緒依序取出
+    events = queue.Queue()
+
+    def work(idx, n, seg):
+        profs = [profile for profile, _ in pending[idx].values()]
+        try:
+            uploaded = upload_file(seg, client, scheduler, registry)
+        except Exception as e:
+            for profile in profs:
+                events.put(("segment", (idx, profile.name, n), _fail(_new_result(seg.name), e)))
+            return
+        for profile in profs:
+            key = (idx, profile.name)
+            on_record = (lambda record, key=key: events.put(("record", key, record))) if stream else None
+            result = ocr_file(seg, client, profile, scheduler, stream, on_record, uploaded)
+            events.put(("segment", (idx, profile.name, n), result))
+            # 上傳次數只計入第一個設定檔
+            uploaded = (uploaded[0], 0)
+
+    # 工作執行緒沿用呼叫端的計時紀錄器
+    run_work = instrumentation.in_context(work)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for idx, segs in segments.items():
+            for n, seg in enumerate(segs):
+                pool.submit(run_work, idx, n, seg)
+        while total:
+            kind, key, value = events.get()
+            if kind == "record":
+                yield kind, key, value
+                continue
+            total -= 1
+            idx, name, n = key
+            done[idx, name][n] = value
+            if any(r is None for r in done[idx, name]):
+                continue
+            result = merge_segment_results(files[idx].name, done[idx, name])
+            # 只快取成功解析的結果
+            if cache and result["level"] == "success":
+                cache.put(pending[idx][name][1], result["name"], result["records"])
+            yield "done", (idx, name), result
+
+
+# --- 單一設定檔，只取完成結果：依完成順序回傳 (原始索引, 結果) ---
+def run_ocr_batch(files, client, profile, max_workers=DEFAULT_MAX_WORKERS, cache=None, refresh=False,
+                  scheduler=None, segment_pages=DEFAULT_SEGMENT_PAGES, registry=None):
+    for kind, (idx, _), value in iter_ocr_events(files, client, [profile], max_workers, cache, refresh, scheduler,
+                                                 segment_pages, registry=registry):
+        if kind == "done":
+            yield idx, value
+
+
+# --- 依原始上傳順序彙整所有紀錄 ---
+def collect_records(results):
+    all_records = []
+    for idx in sorted(results):
+        all_records.extend(results[idx]["records"])
+    return all_records
+
+
+# --- 紀錄轉為 DataFrame：依指定欄位順序，最後附上來源檔案（有分段時再附頁碼範圍、有檢核問題時附檢核提示、
+# 合併過重複申請人時附合併來源）---
+def records_to_frame(records, column_order):
+    df = pd.DataFrame(records)
+    provenance = [col for col in ["來源檔案", "頁碼範圍", "檢核提示", "合併來源"] if col in df.columns]
+    return df[[col for col in column_order if col in df.columns] + provenance]
+
+
+# --- 多個設定檔的結果轉為工作表：results 為 {設定檔名稱: {原始索引: 結果}}，merge=True 時先合併重複申請人 ---
+# 回傳 ([(設定檔, DataFrame)], 合併掉的筆數)；沒有紀錄的設定檔略過
+def results_to_frames(profiles, results, merge=False):
+    frames, merged_count = [], 0
+    for profile in profiles:
+        all_records = collect_records(results.get(profile.name, {}))
+        if merge and all_records:
+            with instrumentation.span("ocr.dedup", rows=len(all_records)):
+                all_records, merged = merge_duplicates(all_records, profile)
+            merged_count += merged
+        if all_records:
+            with instrumentation.span("ocr.frame", rows=len(all_records)):
+                frames.append((profile, records_to_frame(all_records, profile.columns)))
+    return frames, merged_count
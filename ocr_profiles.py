@@ -0,0 +1,63 @@
+import json
+import os
+import re
+
+from json_stream import MISSING_VALUE
+
+# ✅ 擷取設定檔放在 profiles/：<名稱>.json 描述欄位、欄寬與檢核規則，提示詞另存為文字檔
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+DEFAULT_PROFILE = "goldencard"
+
+# 每個設定檔共用的附加欄位（來源、頁碼、檢核結果、重複申請人合併來源）欄寬
+EXTRA_WIDTHS = {"來源檔案": 30, "頁碼範圍": 14, "檢核提示": 40, "合併來源": 50}
+
+
+# --- 擷取設定：欄位順序、提示詞、Excel 欄寬與欄位檢核規則 ---
+# rules 支援：
+#   required：不可為空或 N/A 的欄位
+#   patterns：欄位值須符合的正規表示式（N/A 不檢查）
+#   choices：欄位值須為清單中其中之一（N/A 不檢查）
+class Profile:
+    def __init__(self, name, title, columns, prompt, widths=None, rules=None):
+        self.name = name
+        self.title = title
+        self.columns = columns
+        self.prompt = prompt
+        self.widths = {**EXTRA_WIDTHS, **(widths or {})}
+        rules = rules or {}
+        self.required = rules.get("required", [])
+        self.patterns = {col: re.compile(p) for col, p in rules.get("patterns", {}).items()}
+        self.choices = rules.get("choices", {})
+
+    # 回傳不符合規則的說明清單（空清單 = 通過）
+    def check(self, record):
+        issues = []
+        for col in self.required:
+            if str(record.get(col, "")).strip() in ("", MISSING_VALUE):
+                issues.append(f"{col} 未填")
+        for col, pattern in self.patterns.items():
+            value = str(record.get(col, MISSING_VALUE)).strip()
+            if value != MISSING_VALUE and not pattern.search(value):
+                issues.append(f"{col} 格式不符：{value}")
+        for col, options in self.choices.items():
+            value = str(record.get(col, MISSING_VALUE)).strip()
+            if value != MISSING_VALUE and value not in options:
+                issues.append(f"{col} 不在選項內：{value}")
+        return issues
+
+
+def load_profile(name, profile_dir=PROFILE_DIR):
+    with open(os.path.join(profile_dir, f"{name}.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    with open(os.path.join(profile_dir, config["prompt_file"]), encoding="utf-8") as f:
+        prompt = f.read()
+    return Profile(
+        name, config.get("title", name), config["columns"], prompt,
+        widths=config.get("widths"), rules=config.get("rules"),
+    )
+
+
+# --- 載入目錄下所有設定檔，依檔名排序 ---
+def load_profiles(profile_dir=PROFILE_DIR):
+    names = sorted(f[:-len(".json")] for f in os.listdir(profile_dir) if f.endswith(".json"))
+    return {name: load_profile(name, profile_dir) for name in names}
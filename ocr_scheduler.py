@@ -0,0 +1,128 @@
+import random
+import sqlite3
+import threading
+import time
+
+# ✅ 預設配額：每分鐘請求數（依 API 金鑰等級調整，可用環境變數 GEMINI_RPM 覆寫）
+DEFAULT_RPM = 60
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 2.0
+DEFAULT_MAX_DELAY = 60.0
+
+# 可重試的錯誤：配額不足 (429)、伺服器暫時錯誤 (500/503/504)、逾時與連線中斷
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway",
+}
+
+
+def is_retryable(exc):
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if type(exc).__name__ in RETRYABLE_NAMES:
+        return True
+    code = getattr(exc, "code", None)
+    code = getattr(code, "value", code)  # grpc StatusCode 等列舉
+    if isinstance(code, tuple):
+        code = code[0]
+    return code in RETRYABLE_CODES
+
+
+# --- token bucket：平均速率 rate_per_minute，最多累積 burst 個令牌 ---
+class TokenBucket:
+    def __init__(self, rate_per_minute=DEFAULT_RPM, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, rate_per_minute // 10)
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+# --- 跨程序共用的 token bucket：令牌數存於 SQLite，網頁與各背景工作程序合計不超過同一個速率 ---
+# 每次取得令牌是一個短暫的寫入交易（每分鐘數十次，負擔可忽略）；時間以牆上時鐘計算，各程序一致
+class SharedTokenBucket:
+    def __init__(self, path, rate_per_minute=DEFAULT_RPM, burst=None, name="gemini", clock=time.time, sleep=time.sleep):
+        self.path = path
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, rate_per_minute // 10)
+        self.clock = clock
+        self.sleep = sleep
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS rate_bucket (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+        finally:
+            conn.close()
+
+    def _take(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM rate_bucket WHERE name = ?", (self.name,)).fetchone()
+            now = self.clock()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+            if tokens >= 1:
+                tokens, wait = tokens - 1, 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute("INSERT OR REPLACE INTO rate_bucket VALUES (?, ?, ?)", (self.name, tokens, now))
+            conn.execute("COMMIT")
+            return wait
+        finally:
+            conn.close()
+
+    def acquire(self):
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            self.sleep(wait)
+
+
+# --- 請求排程：先取得令牌再呼叫，遇可重試錯誤以指數退避＋隨機抖動重試 ---
+class RequestScheduler:
+    def __init__(self, rate_per_minute=DEFAULT_RPM, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY, sleep=time.sleep, bucket=None):
+        self.bucket = bucket or TokenBucket(rate_per_minute, sleep=sleep)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+    # full jitter：在 [0, min(上限, 基數 × 2^n)] 之間隨機等待，避免多個執行緒同時重試
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    # 回傳 (結果, 嘗試次數)；失敗時拋出最後一次的例外，並附上 attempts 屬性
+    def call(self, fn, *args, rate_limited=True):
+        attempt = 0
+        while True:
+            attempt += 1
+            if rate_limited:
+                self.bucket.acquire()
+            try:
+                return fn(*args), attempt
+            except Exception as e:
+                if attempt >= self.max_attempts or not is_retryable(e):
+                    e.attempts = attempt
+                    raise
+                self.sleep(self.backoff(attempt))
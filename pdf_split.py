@@ -0,0 +1,73 @@
+import io
+import re
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # 未安裝 pypdf 時不分段，整份 PDF 送出（網頁與命令列在要求分段時顯示警告）
+    PdfReader = None
+
+SEGMENTING_AVAILABLE = PdfReader is not None
+PYPDF_MISSING_MESSAGE = "⚠️ 未安裝 pypdf，PDF 不會分段而是整份送出；請執行 pip install pypdf"
+
+# ✅ 超過此頁數的 PDF 才分段；每段最多頁數相同（0 = 不分段）
+DEFAULT_SEGMENT_PAGES = 10
+
+# 申請人封面頁的關鍵字（只比對頁面開頭文字，避免內文提到護照也被當成封面）
+COVER_KEYWORDS = ["護照", "PASSPORT", "申請書", "申請表", "APPLICATION FORM"]
+COVER_HEAD_CHARS = 200
+
+
+# --- 分段後的 PDF：與 UploadedFile 相同介面，另帶來源檔名與頁碼範圍 ---
+class PdfSegment(io.BytesIO):
+    def __init__(self, data, source_name, first_page, last_page):
+        super().__init__(data)
+        self.source_name = source_name
+        self.page_range = f"{first_page}-{last_page}"
+        self.name = f"{source_name}（第 {self.page_range} 頁）"
+        self.type = "application/pdf"
+
+
+def _is_pdf(file):
+    return file.type == "application/pdf" or file.name.lower().endswith(".pdf")
+
+
+def _is_cover(page):
+    try:
+        head = re.sub(r"\s+", " ", page.extract_text() or "")[:COVER_HEAD_CHARS].upper()
+    except Exception:  # 掃描檔或損壞的文字層，視為一般頁面
+        return False
+    return any(k in head for k in COVER_KEYWORDS)
+
+
+# --- 計算分段起始頁：先依封面頁切成每位申請人一段，過長的段落再依固定頁數切開 ---
+def segment_starts(pages, max_pages):
+    covers = [i for i, page in enumerate(pages) if _is_cover(page)]
+    bounds = sorted({0, *covers}) + [len(pages)]
+    starts = []
+    for start, end in zip(bounds, bounds[1:]):
+        starts.extend(range(start, end, max_pages))
+    return starts
+
+
+# --- 將 PDF 切成多段；非 PDF、頁數不多或無法解析時回傳原檔（單一元素清單）---
+def split_file(file, max_pages=DEFAULT_SEGMENT_PAGES):
+    if PdfReader is None or not max_pages or not _is_pdf(file):
+        return [file]
+    try:
+        reader = PdfReader(io.BytesIO(file.getvalue()))
+        pages = reader.pages
+        if len(pages) <= max_pages:
+            return [file]
+        starts = segment_starts(pages, max_pages)
+    except Exception:
+        return [file]
+
+    segments = []
+    for start, end in zip(starts, starts[1:] + [len(pages)]):
+        writer = PdfWriter()
+        for i in range(start, end):
+            writer.add_page(pages[i])
+        out = io.BytesIO()
+        writer.write(out)
+        segments.append(PdfSegment(out.getvalue(), file.name, start + 1, end))
+    return segments
@@ -0,0 +1,280 @@
+import argparse
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+from json_stream import MISSING_VALUE
+from ocr_cache import sha256_hex
+from ocr_profiles import DEFAULT_PROFILE, load_profiles
+
+# ✅ 辨識結果長期保存於此（與 OCR 快取分開，不會被淘汰）
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "applicant_records.sqlite")
+
+# 建立檢索索引的欄位（各設定檔有的才用）；其餘欄位只保存、不檢索
+INDEX_FIELDS = [
+    "英文名字＋英文姓氏", "中文姓名", "國籍", "現職公司", "現職職稱", "其他工作經歷", "學歷＋學校＋科系",
+    "教育背景(學校)", "教育背景(系所)", "工作經歷", "產業實績專長", "子領域", "專業技術/證照", "專長領域",
+]
+PASSPORT_FIELD = "護照號碼"
+# 來源與檢核欄位不算紀錄內容（同一筆資料換檔名重傳視為同一筆）
+PROVENANCE_FIELDS = {"來源檔案", "頁碼範圍", "檢核提示"}
+
+POSTING_DTYPE = np.dtype([("id", "<i4"), ("tf", "<i4"), ("length", "<i4")])
+
+# BM25 參數；查詢只取鑑別度（idf）最高的前幾個詞，常見詞（如「公司」）的長倒排串列不必讀取
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_QUERY_TERMS = 48
+DEFAULT_TOP_K = 10
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[㐀-鿿豈-﫿]+")
+
+
+# --- 斷詞：中文取相鄰兩字（bigram），英數取整個詞；先做全形 / 半形與大小寫正規化 ---
+def tokenize(text):
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    terms = []
+    for run in _TOKEN_RE.findall(text):
+        if run.isascii():
+            if len(run) > 1:
+                terms.append(run)
+        elif len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def normalize_passport(value):
+    if value is None or value == MISSING_VALUE:
+        return None
+    value = re.sub(r"[^0-9A-Z]", "", unicodedata.normalize("NFKC", str(value)).upper())
+    return value or None
+
+
+def record_text(record):
+    return "\n".join(
+        str(record[field]) for field in INDEX_FIELDS if record.get(field) not in (None, "", MISSING_VALUE)
+    )
+
+
+def record_key(record, profile_name):
+    content = {k: v for k, v in record.items() if k not in PROVENANCE_FIELDS}
+    return sha256_hex(profile_name + "\n" + json.dumps(content, ensure_ascii=False, sort_keys=True))
+
+
+# --- 過往申請人紀錄庫：紀錄本身 + BM25 倒排索引（SQLite），新批次逐筆增量加入 ---
+# 查詢時讀到的倒排陣列保留在記憶體（依目前的平均長度先算好各紀錄的詞頻分數），紀錄庫有新增時整批作廢
+class RecordStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._postings = {}
+        self._postings_state = None
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS applicant_record (
+                    id INTEGER PRIMARY KEY,
+                    record_key TEXT UNIQUE,
+                    profile TEXT,
+                    file_name TEXT,
+                    passport TEXT,
+                    data TEXT,
+                    length INTEGER,
+                    created_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_applicant_record_passport ON applicant_record(passport)")
+            # 倒排串列：每個詞一列，(紀錄編號, 詞頻, 紀錄長度) 打包成二進位陣列，新批次直接接在尾端
+            conn.execute("CREATE TABLE IF NOT EXISTS term_posting (term TEXT PRIMARY KEY, postings BLOB) WITHOUT ROWID")
+            conn.execute("CREATE TABLE IF NOT EXISTS term_df (term TEXT PRIMARY KEY, df INTEGER) WITHOUT ROWID")
+            conn.execute("CREATE TABLE IF NOT EXISTS store_stat (name TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO store_stat VALUES ('docs', 0), ('total_length', 0)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- 加入一批紀錄（同一交易），已存在的紀錄略過；回傳新增筆數 ---
+    def add(self, records, profile_name):
+        now = self.clock()
+        added, total_length = 0, 0
+        postings = {}
+        with self._connect() as conn:
+            for record in records:
+                terms = Counter(tokenize(record_text(record)))
+                length = sum(terms.values())
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO applicant_record "
+                    "(record_key, profile, file_name, passport, data, length, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (record_key(record, profile_name), profile_name, record.get("來源檔案"),
+                     normalize_passport(record.get(PASSPORT_FIELD)), json.dumps(record, ensure_ascii=False),
+                     length, now),
+                )
+                if not cursor.rowcount:
+                    continue
+                added += 1
+                total_length += length
+                for term, tf in terms.items():
+                    postings.setdefault(term, []).append((cursor.lastrowid, tf, length))
+            if not added:
+                return 0
+            conn.executemany(
+                "INSERT INTO term_posting VALUES (?, ?) "
+                "ON CONFLICT (term) DO UPDATE SET postings = CAST(postings || excluded.postings AS BLOB)",
+                ((term, np.array(items, dtype=POSTING_DTYPE).tobytes()) for term, items in postings.items()),
+            )
+            conn.executemany(
+                "INSERT INTO term_df VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+                ((term, len(items)) for term, items in postings.items()),
+            )
+            conn.execute("UPDATE store_stat SET value = value + ? WHERE name = 'docs'", (added,))
+            conn.execute("UPDATE store_stat SET value = value + ? WHERE name = 'total_length'", (total_length,))
+        return added
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM store_stat WHERE name = 'docs'").fetchone()[0]
+
+    # 取得各詞的 (紀錄編號, 詞頻分數)；不在記憶體的詞由 SQLite 讀出後保留
+    # 紀錄數或總長度改變（本程序或其他程序新增了紀錄）時，先前保留的陣列全部作廢
+    def _term_postings(self, conn, terms, state):
+        with self._lock:
+            if self._postings_state != state:
+                self._postings, self._postings_state = {}, state
+            cached = dict(self._postings)
+        missing = [t for t in terms if t not in cached]
+        if missing:
+            avg_length = state[1] / state[0] or 1.0
+            for term, blob in conn.execute(
+                "SELECT term, postings FROM term_posting WHERE term IN (SELECT value FROM json_each(?))",
+                (json.dumps(missing, ensure_ascii=False),),
+            ):
+                block = np.frombuffer(blob, dtype=POSTING_DTYPE)
+                tf = block["tf"].astype(float)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * block["length"] / avg_length)
+                cached[term] = (block["id"], tf * (BM25_K1 + 1) / (tf + norm))
+            with self._lock:
+                if self._postings_state == state:
+                    self._postings.update((t, cached[t]) for t in missing if t in cached)
+        return [(t, *cached[t]) for t in terms if t in cached]
+
+    # --- BM25 top-k：回傳 [{"id", "score", "profile", "file_name", "created_at", "same_passport", "record"}] ---
+    # passport 有值時，護照號碼相同的紀錄一律排在最前面；exclude 為要排除的 record_key（例如查詢的紀錄本身）
+    def search(self, text, k=DEFAULT_TOP_K, passport=None, exclude=()):
+        query = Counter(tokenize(text))
+        exclude = set(exclude)
+        passport = normalize_passport(passport)
+        with self._connect() as conn:
+            stat = dict(conn.execute("SELECT name, value FROM store_stat"))
+            docs = stat["docs"]
+            if not docs:
+                return []
+            idf = {
+                term: math.log(1 + (docs - df + 0.5) / (df + 0.5))
+                for term, df in conn.execute(
+                    "SELECT term, df FROM term_df WHERE term IN (SELECT value FROM json_each(?))",
+                    (json.dumps(list(query), ensure_ascii=False),),
+                )
+            }
+            terms = heapq.nlargest(MAX_QUERY_TERMS, idf, key=lambda t: idf[t] * query[t])
+            postings = self._term_postings(conn, terms, (docs, stat["total_length"]))
+
+            # 各詞的分數以 numpy 一次加總到各紀錄，只取前 k 名
+            scores = {}
+            if postings:
+                ids = np.concatenate([ids for _, ids, _ in postings])
+                weights = np.concatenate([part * (query[t] * idf[t]) for t, _, part in postings])
+                totals = np.bincount(ids, weights=weights)
+                n = min(k + len(exclude), len(totals))
+                top = np.argpartition(-totals, n - 1)[:n]
+                scores = {int(i): float(totals[i]) for i in top if totals[i] > 0}
+
+            same = set()
+            if passport:
+                same = {row[0] for row in conn.execute(
+                    "SELECT id FROM applicant_record WHERE passport = ?", (passport,)
+                )}
+            ranked = heapq.nlargest(
+                k + len(exclude), set(scores) | same, key=lambda i: (i in same, scores.get(i, 0.0))
+            )
+            rows = {
+                row[0]: row for row in conn.execute(
+                    "SELECT id, record_key, profile, file_name, created_at, data FROM applicant_record "
+                    "WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(ranked),),
+                )
+            }
+        hits = []
+        for record_id in ranked:
+            _, key, profile, file_name, created_at, data = rows[record_id]
+            if key in exclude:
+                continue
+            hits.append({
+                "id": record_id, "score": round(scores.get(record_id, 0.0), 3), "profile": profile,
+                "file_name": file_name, "created_at": created_at, "same_passport": record_id in same,
+                "record": json.loads(data),
+            })
+        return hits[:k]
+
+    # 以一筆紀錄查詢相似的過往申請人（排除紀錄本身）
+    def similar(self, record, profile_name, k=DEFAULT_TOP_K):
+        return self.search(record_text(record), k, record.get(PASSPORT_FIELD), exclude=[record_key(record, profile_name)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="過往申請人紀錄庫：匯入 OCR 結果 Excel、查詢相似申請人")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="匯入 OCR 結果 Excel（每張工作表依標題對應設定檔）")
+    add.add_argument("paths", nargs="+")
+    add.add_argument("--profile", default=DEFAULT_PROFILE, help="工作表標題不是設定檔標題時（例如批次模式的輸出）所用的設定檔")
+    query = sub.add_parser("query", help="以關鍵字（姓名、公司、經歷…）查詢最相似的紀錄")
+    query.add_argument("text")
+    query.add_argument("--passport")
+    query.add_argument("-k", type=int, default=DEFAULT_TOP_K)
+    args = parser.parse_args(argv)
+
+    store = RecordStore(args.store)
+    if args.command == "add":
+        import pandas as pd
+
+        by_title = {profile.title: name for name, profile in load_profiles().items()}
+        for path in args.paths:
+            for title, df in pd.read_excel(path, sheet_name=None, dtype=str).items():
+                records = df.where(df.notna(), None).to_dict("records")
+                added = store.add(records, by_title.get(title, args.profile))
+                print(f"✅ {os.path.basename(path)}｜{title}：新增 {added}/{len(records)} 筆")
+        print(f"📚 紀錄庫共 {store.count()} 筆")
+        return 0
+
+    start = time.perf_counter()
+    hits = store.search(args.text, args.k, args.passport)
+    print(f"🔎 {len(hits)} 筆（{(time.perf_counter() - start) * 1000:.1f} ms，紀錄庫共 {store.count()} 筆）")
+    for hit in hits:
+        r = hit["record"]
+        name = r.get("中文姓名") or r.get("英文名字＋英文姓氏")
+        flag = "🛂 " if hit["same_passport"] else ""
+        print(f"{flag}{hit['score']:>8.2f}  {name}｜{r.get('現職公司')}｜{hit['file_name']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,261 +1,278 @@
+import os
+import uuid
 import streamlit as st
 import pandas as pd
-import sqlite3
-import io
 from datetime import datetime
+import instrumentation
+import search_db
+import search_export
+from search_export import prepare_frame
 
-# === 資料庫連線 ===
-conn = sqlite3.connect('mydb.sqlite', check_same_thread=False)
+# === 資料庫連線池（跨 rerun 與使用者共用）===
+@st.cache_resource
+def get_pool():
+    conn = search_db.connect()
+    search_db.migrate(conn)
+    conn.close()
+    return search_db.ConnectionPool()
+
+
+# === 啟動資料：僅在資料庫檔案變動時重新讀取 ===
+@st.cache_data
+def load_year_options(db_version):
+    with get_pool().connection() as conn:
+        return search_db.load_year_options(conn)
+
+
+pool = get_pool()
+
+# === 計時紀錄：每次 rerun 一個紀錄器，session 編號跨 rerun 沿用 ===
+recorder = instrumentation.activate(instrumentation.Recorder(
+    "search", st.session_state.setdefault('instrumentation_session', uuid.uuid4().hex[:12])
+))
 
 st.title("🔎 企業履歷綜合查詢工具")
 
-# --- 查詢條件輸入 ---
-company_id_input = st.text_input("公司統編", "")
-company_name_input = st.text_input("公司名稱", "")
-
-years_sql = """
-    SELECT DISTINCT apply_year FROM rd_project
-    UNION
-    SELECT DISTINCT apply_year FROM smart_project
-"""
-years = pd.read_sql(years_sql, conn)
-year_options = sorted(years['apply_year'].dropna().unique(), reverse=True)
-selected_year = st.selectbox("申請年度", options=[None] + list(year_options))
-group_options = ['新興跨域組', '平台經濟組', '數位服務組', '通訊傳播組']
-selected_group = st.selectbox("組別篩選", options=[None] + group_options)
+# --- 查詢條件輸入：單一公司（統編或名稱）或批次統編清單 ---
+batch_mode = st.radio("查詢模式", options=["單一公司", "批次統編"], horizontal=True) == "批次統編"
+if batch_mode:
+    batch_text = st.text_area("貼上統編清單（以換行、逗號或空白分隔）", "")
+    batch_file = st.file_uploader("或上傳統編清單（CSV、TXT、Excel）", type=["csv", "txt", "xlsx"])
+    company_id_input = company_name_input = ""
+else:
+    company_id_input = st.text_input("公司統編", "")
+    company_name_input = st.text_input("公司名稱", "")
+
+year_options = load_year_options(search_db.db_version())
+selected_year = st.selectbox("申請年度", options=[None] + year_options)
+selected_group = st.selectbox("組別篩選", options=[None] + search_db.GROUP_OPTIONS)
 
 # --- session_state 初始化 ---
-if 'dfs' not in st.session_state:
-    st.session_state['dfs'] = []
+if 'exports' not in st.session_state:
+    st.session_state['exports'] = []  # 本次查詢 (工作表名稱, 表別, SQL, 參數)，匯出時重新執行
+if 'pages' not in st.session_state:
+    st.session_state['pages'] = {}  # 各表每一頁起點的 keyset 鍵值
+
+# --- 儀表板：由統計摘要表取得的指標 ---
+def render_metrics(title, m, case_label, approved_label, rate_label):
+    total_cases, total_amount = m["total_cases"], m["total_amount"]
+    approved_cases, approved_amount = m["approved_cases"], m["approved_amount"]
+    case_rate = f"{(approved_cases / total_cases * 100):.1f}%" if total_cases > 0 else "0%"
+    amount_rate = f"{(approved_amount / total_amount * 100):.1f}%" if total_amount > 0 else "0%"
+
+    st.markdown(f"### {title}")
+    # 第一排
+    col1, col2 = st.columns(2)
+    col1.metric(case_label, total_cases)
+    col2.metric("申請金額總額", f"{total_amount:,.0f}元")
+
+    # 第二排
+    col3, col4 = st.columns(2)
+    col3.metric(approved_label, approved_cases)
+    col4.metric("通過金額", f"{approved_amount:,.0f}元")
+
+    # 第三排
+    col5, col6 = st.columns(2)
+    col5.metric(rate_label, case_rate)
+    col6.metric("金額通過率", amount_rate)
+
+
+def clear_export():
+    path = st.session_state.pop('export_file', None)
+    if path and os.path.exists(path[0]):
+        os.remove(path[0])
+
+
+def reset_pages():
+    st.session_state['pages'] = {}
+
 
-# --- 開始查詢按鈕觸發 ---
+def go_page(table, after):
+    pages = st.session_state['pages'].setdefault(table, [None])
+    if after is None:
+        pages.pop()
+    else:
+        pages.append(after)
+
+
+# --- 分頁顯示：只取目前頁面的資料列 ---
+def render_table(table, sql, params):
+    pages = st.session_state['pages'].setdefault(table, [None])
+    with pool.connection() as conn:
+        with instrumentation.span("search.count", table=table) as info:
+            total = info["rows"] = conn.execute(*search_db.count_query(sql, params)).fetchone()[0]
+        page_sql, page_params = search_db.page_query(table, sql, params, after=pages[-1], page_size=page_size)
+        with instrumentation.span("search.page", table=table) as info:
+            df = pd.read_sql(page_sql, conn, params=page_params)
+            info["rows"] = len(df)
+    if total == 0:
+        return 0
+
+    key_cols = [c for c in df.columns if c.startswith("_page_key")]
+    has_next = len(pages) * page_size < total
+    # numpy 純量轉回 Python 型別，sqlite3 才能正確綁定
+    next_key = [getattr(v, "item", lambda: v)() for v in df.iloc[-1][key_cols]] if has_next and not df.empty else None
+
+    st.dataframe(prepare_frame(table, df))
+    col1, col2, col3 = st.columns([1, 3, 1])
+    col1.button("⬅️ 上一頁", key=f"prev_{table}", disabled=len(pages) == 1,
+                on_click=go_page, args=(table, None))
+    col2.caption(f"第 {len(pages)} / {-(-total // page_size)} 頁，共 {total:,} 筆")
+    col3.button("下一頁 ➡️", key=f"next_{table}", disabled=next_key is None,
+                on_click=go_page, args=(table, next_key))
+    return total
+
+
+page_size = st.selectbox("每頁筆數", options=search_db.PAGE_SIZE_OPTIONS, on_change=reset_pages)
+
+# --- 批次統編：合併貼上的文字與上傳檔案內容後取出統編 ---
+def read_batch_ids(text, file):
+    if file is not None:
+        if file.name.lower().endswith(".xlsx"):
+            sheets = pd.read_excel(file, sheet_name=None, header=None, dtype=str)
+            text += "\n" + "\n".join(df.fillna("").to_csv(index=False, header=False) for df in sheets.values())
+        else:
+            text += "\n" + file.getvalue().decode("utf-8-sig", errors="ignore")
+    return search_db.parse_company_ids(text)
+
+
+# --- 開始查詢按鈕觸發：保存查詢條件，切換明細、換頁等 rerun 沿用同一組條件 ---
 if st.button("開始查詢"):
-    st.session_state['dfs'] = []  # 清空舊結果
+    st.session_state['search'] = {
+        "company_id": company_id_input,
+        "company_name": company_name_input,
+        "company_ids": read_batch_ids(batch_text, batch_file) if batch_mode else None,
+        "year": selected_year,
+        "group": selected_group,
+    }
+    reset_pages()
+    clear_export()
+
+search = st.session_state.get('search')
+if search:
+    st.session_state['exports'] = []  # 清空舊結果
+
+    batch_ids = search.get('company_ids')
 
     # 顯示查詢條件
     st.write("🎯 查詢條件")
-    st.write(f"公司統編：{company_id_input or '（未填）'}")
-    st.write(f"公司名稱：{company_name_input or '（未填）'}")
-    st.write(f"申請年度：{selected_year or '（未選）'}")
-    st.write(f"收案組別：{selected_group or '（未填）'}")
-
-    # --- 篩選 helper 函式 ---
-    def make_filter(table_alias, field, use_group=False, name_field="project_name"):
-        clause = ""
-        if company_name_input:
-             clause += f" AND {table_alias}.company_name LIKE '%{company_name_input}%'"
-        elif company_id_input:
-            clause += f" AND {table_alias}.{field} = '{company_id_input}'"
-        if selected_year:
-            clause += f" AND {table_alias}.apply_year = {selected_year}"
-        if use_group and selected_group:
-            clause += f" AND trim({table_alias}.\"group\") = '{selected_group}'"
-        return clause
+    if batch_ids is not None:
+        st.write(f"批次統編：{len(batch_ids)} 家")
+    else:
+        st.write(f"公司統編：{search['company_id'] or '（未填）'}")
+        st.write(f"公司名稱：{search['company_name'] or '（未填）'}")
+    st.write(f"申請年度：{search['year'] or '（未選）'}")
+    st.write(f"收案組別：{search['group'] or '（未填）'}")
+
+    # --- 查詢條件（參數化；公司名稱先經全文索引解析為統編集合）---
+    # 有指定公司時由企業 360 概覽表以主鍵查找；未限定年度/組別時，儀表板指標也直接由概覽列加總
+    # 批次模式：整批統編以單次集合查詢取得每家公司一列的摘要，指標與明細也以同一組統編篩選
+    company_search = bool(search['company_id'] or search['company_name'])
+    with pool.connection() as conn:
+        if batch_ids is not None:
+            filters = {"company_ids": batch_ids}
+            batch_sql, batch_params = search_db.batch_query(batch_ids, search['year'], search['group'])
+            with instrumentation.span("search.batch") as info:
+                batch_df = pd.read_sql(batch_sql, conn, params=batch_params)
+                info["rows"] = len(batch_df)
+        else:
+            with instrumentation.span("search.company_filter") as info:
+                filters = search_db.company_filter(conn, search['company_id'], search['company_name'])
+                info["rows"] = len(filters.get("company_ids") or [])
+        with instrumentation.span("search.overview") as info:
+            overview = search_db.company_overview(conn, **filters) if company_search else []
+            info["rows"] = len(overview)
+        with instrumentation.span("search.metrics"):
+            if company_search and not search['year'] and not search['group']:
+                rd_metrics = search_db.overview_metrics(overview, "rd")
+                smart_metrics = search_db.overview_metrics(overview, "smart")
+            else:
+                rd_metrics = search_db.summary_metrics(conn, "rd_summary", **filters, year=search['year'], group=search['group'])
+                smart_metrics = search_db.summary_metrics(conn, "smart_summary", **filters, year=search['year'], group=search['group'])
+
+    # --- 批次摘要 ---
+    if batch_ids is not None:
+        st.subheader(f"📋 批次摘要（{len(batch_ids)} 家）")
+        if not batch_ids:
+            st.warning("⚠️ 未辨識到任何統編（7～8 位數字）")
+        st.session_state['exports'].append(('批次摘要', "batch", batch_sql, batch_params))
+        missing = batch_df.loc[batch_df["note"] != "", "company_id"].astype(str).tolist()
+        if missing:
+            st.warning(f"⚠️ 查無資料的統編（{len(missing)} 家）：{'、'.join(missing)}")
+        st.dataframe(prepare_frame("batch", batch_df))
+
+    # --- 企業概覽 ---
+    if company_search:
+        st.subheader("🏢 企業概覽")
+        if overview:
+            overview_df = pd.DataFrame(overview)
+            st.dataframe(overview_df.drop(columns=["refreshed_at"]).rename(columns=search_db.COLUMN_LABELS["company_360"]))
+            st.caption(f"資料更新時間：{overview_df['refreshed_at'].max()}")
+        else:
+            st.info("ℹ️ 查無符合條件的公司")
+
     # --- 研發資料 ---
-    rd_query = """
-        SELECT a.*, b.apply_amount, b.approved
-        FROM rd_project AS a
-        LEFT JOIN rd_item AS b
-        ON a.apply_year = b.apply_year
-           AND a.company_id = b.company_id
-           AND a.project_name = b.project_name
-        WHERE 1=1
-    """
-    rd_query += make_filter('a', 'company_id', use_group=True,name_field='project_name')
-
-    rd_df = pd.read_sql(rd_query, conn)
-
-    # 改中文欄位
-    rd_df = rd_df.rename(columns={
-        "company_id": "公司統編",
-        "company_name": "公司名稱",
-        "apply_year": "申請年度",
-        "project_name": "計畫名稱",
-        "group": "收案組別",
-        "type_innovation_sme": "產創/中小企",
-        "industry_category": "產業類別",
-        "apply_amount": "申請金額",
-        "approved": "是否通過"
-    })
     #儀表板功能
-    if not rd_df.empty and "申請金額" in rd_df.columns and "是否通過" in rd_df.columns:
-        rd_df["申請金額"] = pd.to_numeric(rd_df["申請金額"], errors="coerce")
-
-        total_cases_rd = len(rd_df)
-        total_amount_rd = rd_df["申請金額"].sum()
-
-        approved_df_rd = rd_df[rd_df["是否通過"] == "通過"]
-        approved_cases_rd = len(approved_df_rd)
-        approved_amount_rd = approved_df_rd["申請金額"].sum()
-
-        case_rate_rd = f"{(approved_cases_rd / total_cases_rd * 100):.1f}%" if total_cases_rd > 0 else "0%"
-        amount_rate_rd = f"{(approved_amount_rd / total_amount_rd * 100):.1f}%" if total_amount_rd > 0 else "0%"
-
-        st.markdown("### 研發投抵 統計摘要")
-        # 第一排
-        col1, col2 = st.columns(2)
-        col1.metric("總件數", total_cases_rd)
-        col2.metric("申請金額總額", f"{total_amount_rd:,.0f}元")
-
-        # 第二排
-        col3, col4 = st.columns(2)
-        col3.metric("通過件數", approved_cases_rd)
-        col4.metric("通過金額", f"{approved_amount_rd:,.0f}元")
-
-        # 第三排
-        col5, col6 = st.columns(2)
-        col5.metric("案件通過率", case_rate_rd)
-        col6.metric("金額通過率", amount_rate_rd)
+    if rd_metrics["total_cases"]:
+        render_metrics("研發投抵 統計摘要", rd_metrics, "總件數", "通過件數", "案件通過率")
+
     #展示研發資料
     st.subheader("🧪 研發資料")
-    st.dataframe(rd_df)
-    st.session_state['dfs'].append(('研發資料', rd_df))
+    rd_query, rd_params = search_db.rd_query(**filters, year=search['year'], group=search['group'])
+    st.session_state['exports'].append(('研發資料', "rd", rd_query, rd_params))
+    if st.toggle("顯示研發明細", value=False):
+        render_table("rd", rd_query, rd_params)
 
     # --- 設備資料 ---
-    smart_query = """
-        SELECT a.*, b.item_no, b.item_name, b.item_type, b.total_amount, b.subsidy, b.apply_amount, b.first_review, b.final_review
-        FROM smart_project AS a
-        LEFT JOIN smart_item AS b
-        ON a.apply_year = b.apply_year
-           AND a.company_id = b.company_id
-           AND a.plan_name = b.plan_name
-        WHERE 1=1
-    """
-    smart_query += make_filter('a', 'company_id',name_field='plan_name')
-
-    raw_smart = pd.read_sql(smart_query, conn)
-
-    mapping = {
-        '資安產業': '新興跨域組',
-        **dict.fromkeys([
-            '其他無店面零售業-電子購物','其他無店面零售業-第三方支付',
-            '軟體出版業-線上遊戲','資訊服務業-電簽服務','軟體出版業-數位內容'
-        ], '平台經濟組'),
-        **dict.fromkeys([
-            '軟體出版業-套裝軟體','電腦程式設計、諮詢相關服務業','資訊服務業','資訊服務產業'
-        ], '數位服務組'),
-        **dict.fromkeys(['電信產業','傳播事業'], '通訊傳播組')
-    }
-    raw_smart['mapped_group'] = raw_smart['industry_category'].map(mapping)
-
-    if selected_group:
-        smart_df = raw_smart[raw_smart['mapped_group'] == selected_group]
-    else:
-        smart_df = raw_smart.copy()
-    
-    smart_df = smart_df.rename(columns={
-        "company_id": "公司統編",
-        "company_name": "公司名稱",
-        "apply_year": "申請年度",
-        "plan_name": "計畫名稱",
-        "mapped_group": "收案組別",
-        "industry_category": "產業類別",
-        "item_no": "項目編號",
-        "item_name": "項目名稱",
-        "item_type": "項目類型",
-        "total_amount": "購買總金額",
-        "subsidy": "補助款",
-        "apply_amount": "申請金額",
-        "first_review": "初審結果",
-        "final_review": "複審結果"
-    })
-    if not smart_df.empty and "申請金額" in smart_df.columns and "複審結果" in smart_df.columns:
-        smart_df["申請金額"] = pd.to_numeric(smart_df["申請金額"], errors="coerce")
-
-        total_cases_s = len(smart_df)
-        total_amount_s = smart_df["申請金額"].sum()
-
-        approved_df_s = smart_df[smart_df["複審結果"] == "複審項目核定"]
-        approved_cases_s = len(approved_df_s)
-        approved_amount_s = approved_df_s["申請金額"].sum()
-
-        case_rate_s = f"{(approved_cases_s / total_cases_s * 100):.1f}%" if total_cases_s > 0 else "0%"
-        amount_rate_s = f"{(approved_amount_s / total_amount_s * 100):.1f}%" if total_amount_s > 0 else "0%"
-        
+    if smart_metrics["total_cases"]:
         with st.container():
             # 設備投抵 統計摘要
-            st.markdown("### 設備投抵 統計摘要")
-            col1, col2 = st.columns(2)
-            col1.metric("項目數", total_cases_s)
-            col2.metric("申請金額總額", f"{total_amount_s:,.0f}元")
-
-            col3, col4 = st.columns(2)
-            col3.metric("通過項目數", approved_cases_s)
-            col4.metric("通過金額", f"{approved_amount_s:,.0f}元")
-
-            col5, col6 = st.columns(2)
-            col5.metric("項目通過率", case_rate_s)
-            col6.metric("金額通過率", amount_rate_s)
-
+            render_metrics("設備投抵 統計摘要", smart_metrics, "項目數", "通過項目數", "項目通過率")
 
     st.subheader("🤖 設備投抵資料")
-    st.dataframe(smart_df)
-    st.session_state['dfs'].append(('設備資料', smart_df))
-
-    # --- 上市櫃資料 ---
-    ipo_query = "SELECT * FROM ipo_info WHERE 1=1"
-    if company_name_input:
-        ipo_query += f" AND company_name LIKE '%{company_name_input}%'"
-    elif company_id_input:
-        ipo_query += f" AND company_id = '{company_id_input}'"
-    if selected_group:
-        ipo_query += f" AND trim(\"group\") = '{selected_group}'"
-
-    ipo_df = pd.read_sql(ipo_query, conn)
-    # 日期轉民國年 #轉中文欄位
-    ipo_df = ipo_df.rename(columns={
-        "company_id": "公司統編",
-        "company_name": "公司名稱",
-        "capital": "實收資本額",
-        "apply_date": "申請日期",
-        "visit_date": "拜會日期",
-        "meeting_date": "評估會議日期",
-        "ipo_type": "上市櫃類型",
-        "group": "業務組別",
-        "country": "國內/國外",
-        "broker": "主辦券商",
-        "status": "拜會時狀態",
-        "result": "申請結果",
-        "remark": "結果備註"
-    })
-    # --- 日期轉民國年 ---
-    def to_roc_str(dt):
-        if pd.isnull(dt):
-            return ""
-        roc_year = dt.year - 1911
-        return f"{roc_year}/{dt.month}/{dt.day}"
-    if "申請日期" in ipo_df.columns:
-        ipo_df["申請日期"] = pd.to_datetime(ipo_df["申請日期"], errors='coerce').apply(to_roc_str)
-    if "拜會日期" in ipo_df.columns:
-        ipo_df["拜會日期"] = pd.to_datetime(ipo_df["拜會日期"], errors='coerce').apply(to_roc_str)
-    if "評估會議日期" in ipo_df.columns:
-        ipo_df["評估會議日期"] = pd.to_datetime(ipo_df["評估會議日期"], errors='coerce').apply(to_roc_str)
-
-    if not ipo_df.empty:
-        st.subheader("📈 上市櫃資料")
-        st.dataframe(ipo_df)
-        st.session_state['dfs'].append(('上市櫃資料', ipo_df))
-    else:
-        st.info("ℹ️ 無符合條件的上市櫃資料")
-
-# --- 下載按鈕 ---
-if st.session_state['dfs']:
-    company_label = company_id_input or (company_name_input or 'ALL')
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"查詢結果_{company_label}_{selected_year or 'ALL'}_{timestamp}.xlsx"
-
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-        for name, df in st.session_state['dfs']:
-            df.to_excel(writer, sheet_name=name[:31], index=False)
-    buffer.seek(0)
-
-    st.download_button(
-        label="📥 下載查詢結果 Excel",
-        data=buffer,
-        file_name=filename,
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
-# 關閉
-conn.close()
+    smart_query, smart_params = search_db.smart_query(**filters, year=search['year'], group=search['group'])
+    st.session_state['exports'].append(('設備資料', "smart", smart_query, smart_params))
+    if st.toggle("顯示設備投抵明細", value=False):
+        render_table("smart", smart_query, smart_params)
+
+    # --- 上市櫃資料（有指定公司時狀態已列於概覽，明細預設收合）---
+    ipo_query, ipo_params = search_db.ipo_query(**filters, group=search['group'])
+    st.subheader("📈 上市櫃資料")
+    st.session_state['exports'].append(('上市櫃資料', "ipo", ipo_query, ipo_params))
+    if st.toggle("顯示上市櫃明細", value=not company_search and batch_ids is None):
+        if not render_table("ipo", ipo_query, ipo_params):
+            st.info("ℹ️ 無符合條件的上市櫃資料")
+
+# --- 下載按鈕：按下「產生匯出檔」才重新執行查詢，逐批寫入暫存檔 ---
+if search and st.session_state['exports']:
+    formats = search_export.EXPORT_FORMATS
+    fmt = st.radio("匯出格式", options=list(formats), format_func=lambda f: formats[f][0],
+                   horizontal=True, on_change=clear_export)
+
+    if st.button("📦 產生匯出檔"):
+        clear_export()
+        if batch_ids is not None:
+            company_label = f"批次{len(batch_ids)}家"
+        else:
+            company_label = search['company_id'] or (search['company_name'] or 'ALL')
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"查詢結果_{company_label}_{search['year'] or 'ALL'}_{timestamp}{formats[fmt][1]}"
+        with st.spinner("正在產生匯出檔..."), pool.connection() as conn:
+            with instrumentation.span("search.export", format=fmt) as info:
+                path = search_export.export(conn, st.session_state['exports'], fmt)
+                info["bytes"] = os.path.getsize(path)
+        st.session_state['export_file'] = (path, filename, fmt)
+
+    if 'export_file' in st.session_state and os.path.exists(st.session_state['export_file'][0]):
+        path, filename, fmt = st.session_state['export_file']
+        with open(path, "rb") as f:
+            st.download_button(
+                label="📥 下載查詢結果",
+                data=f,
+                file_name=filename,
+                mime=formats[fmt][2]
+            )
+
+# --- 效能除錯面板（側邊欄開啟）---
+if st.sidebar.checkbox("🛠️ 顯示效能除錯面板", value=False):
+    instrumentation.render_panel(recorder)
@@ -0,0 +1,910 @@
+import argparse
+import datetime
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# ✅ 資料庫位置（與本檔同目錄）
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mydb.sqlite")
+
+# ✅ 索引定義：join 鍵 (apply_year, company_id, plan_name/project_name)、company_id 與 "group"
+# rd_item / smart_item 的主鍵已涵蓋 join 鍵，不另建索引
+# "group" 以 trim() 運算式索引，與查詢條件 trim("group") = ? 完全一致才能被使用
+INDEXES = {
+    "idx_rd_project_company": "rd_project(company_id, apply_year, project_name)",
+    "idx_rd_project_group": 'rd_project(trim("group"), apply_year)',
+    "idx_smart_project_year": "smart_project(apply_year, company_id, plan_name, industry_category)",
+    "idx_smart_project_company": "smart_project(company_id, apply_year, plan_name, industry_category)",
+    "idx_smart_project_industry": "smart_project(industry_category, apply_year)",
+    "idx_ipo_info_company": "ipo_info(company_id)",
+    "idx_ipo_info_group": 'ipo_info(trim("group"))',
+    "idx_trading_list_company": "trading_list(company_id)",
+    "idx_trading_list_group": 'trading_list(trim("group"))',
+}
+
+# ✅ 收案組別與設備投抵產業類別 → 組別對應
+# 對應表存於資料庫 industry_group（首次 migrate 時以下列內容建立，之後以資料庫為準）
+GROUP_OPTIONS = ['新興跨域組', '平台經濟組', '數位服務組', '通訊傳播組']
+INDUSTRY_GROUP_MAP = {
+    '資安產業': '新興跨域組',
+    **dict.fromkeys([
+        '其他無店面零售業-電子購物','其他無店面零售業-第三方支付',
+        '軟體出版業-線上遊戲','資訊服務業-電簽服務','軟體出版業-數位內容'
+    ], '平台經濟組'),
+    **dict.fromkeys([
+        '軟體出版業-套裝軟體','電腦程式設計、諮詢相關服務業','資訊服務業','資訊服務產業'
+    ], '數位服務組'),
+    **dict.fromkeys(['電信產業','傳播事業'], '通訊傳播組')
+}
+
+# ✅ 查詢結果的中文欄位名稱
+COLUMN_LABELS = {
+    "rd": {
+        "company_id": "公司統編",
+        "company_name": "公司名稱",
+        "apply_year": "申請年度",
+        "project_name": "計畫名稱",
+        "group": "收案組別",
+        "type_innovation_sme": "產創/中小企",
+        "industry_category": "產業類別",
+        "apply_amount": "申請金額",
+        "approved": "是否通過"
+    },
+    "smart": {
+        "company_id": "公司統編",
+        "company_name": "公司名稱",
+        "apply_year": "申請年度",
+        "plan_name": "計畫名稱",
+        "mapped_group": "收案組別",
+        "industry_category": "產業類別",
+        "item_no": "項目編號",
+        "item_name": "項目名稱",
+        "item_type": "項目類型",
+        "total_amount": "購買總金額",
+        "subsidy": "補助款",
+        "apply_amount": "申請金額",
+        "first_review": "初審結果",
+        "final_review": "複審結果"
+    },
+    "ipo": {
+        "company_id": "公司統編",
+        "company_name": "公司名稱",
+        "capital": "實收資本額",
+        "apply_date": "申請日期",
+        "visit_date": "拜會日期",
+        "meeting_date": "評估會議日期",
+        "ipo_type": "上市櫃類型",
+        "group": "業務組別",
+        "country": "國內/國外",
+        "broker": "主辦券商",
+        "status": "拜會時狀態",
+        "result": "申請結果",
+        "remark": "結果備註"
+    },
+    "company_360": {
+        "company_id": "公司統編",
+        "company_name": "公司名稱",
+        "rd_cases": "研發件數",
+        "rd_amount": "研發申請金額",
+        "rd_approved_cases": "研發通過件數",
+        "rd_approved_amount": "研發通過金額",
+        "rd_years": "研發申請年度",
+        "rd_groups": "研發收案組別",
+        "smart_plans": "設備計畫數",
+        "smart_cases": "設備項目數",
+        "smart_amount": "設備申請金額",
+        "smart_approved_cases": "設備通過項目數",
+        "smart_approved_amount": "設備通過金額",
+        "smart_years": "設備申請年度",
+        "smart_groups": "設備收案組別",
+        "ipo_type": "上市櫃類型",
+        "ipo_status": "拜會時狀態",
+        "ipo_result": "上市櫃申請結果",
+        "ipo_group": "上市櫃業務組別",
+        "ipo_broker": "主辦券商",
+        "trading_rank": "交易名單排名",
+        "trading_group": "交易名單組別",
+        "trading_ipo_type": "交易名單上市櫃別",
+        "trading_industry": "交易名單產業",
+    },
+    "batch": {
+        "company_id": "公司統編",
+        "company_name": "公司名稱",
+        "note": "備註",
+        "rd_cases": "研發件數",
+        "rd_amount": "研發申請金額",
+        "rd_approved_cases": "研發通過件數",
+        "rd_approved_amount": "研發通過金額",
+        "smart_cases": "設備項目數",
+        "smart_amount": "設備申請金額",
+        "smart_approved_cases": "設備通過項目數",
+        "smart_approved_amount": "設備通過金額",
+        "ipo_type": "上市櫃類型",
+        "ipo_status": "拜會時狀態",
+        "ipo_result": "上市櫃申請結果",
+        "trading_rank": "交易名單排名",
+        "trading_group": "交易名單組別",
+    },
+}
+
+# ✅ 分頁：各表的 keyset 排序鍵（主鍵；上市櫃無主鍵改用 rowid）
+# 設備計畫沒有主鍵，取代鍵可能為空值或整列重複：空值以空字串補位（NULL 參與列值比較會使後續頁面遺漏資料），
+# 再以 rowid 區分重複列；設備計畫無項目時項目編號同樣以空字串補位
+PAGE_KEYS = {
+    "rd": ["a.apply_year", "a.company_id", "a.project_name"],
+    "smart": [
+        "IFNULL(a.apply_year, '')", "IFNULL(a.company_id, '')", "IFNULL(a.plan_name, '')", "a.rowid",
+        "IFNULL(b.item_no, '')",
+    ],
+    "ipo": ["a.rowid"],
+}
+PAGE_SIZE_OPTIONS = [50, 100, 200, 500]
+
+# ✅ 公司名稱全文索引（trigram）：彙整各表的 (company_id, company_name)
+NAME_SOURCES = ["company", "rd_project", "smart_project", "ipo_info", "trading_list"]
+
+
+# ✅ 欄位型別：匯入時（與舊資料庫首次遷移時）正規化一次，查詢時不再轉換
+# amount：去除空白、千分位與「元」後轉數值（可有負號）；integer：同上再取整數
+# date：ISO 日期 YYYY-MM-DD（顯示時以 roc_date_sql 轉民國年）；text：字串（審查結果原本存在 REAL 欄位）
+# 非空白但無法解析的值保留原值，不寫成 NULL
+SCHEMA_VERSION = 1
+COLUMN_TYPES = {
+    "rd_item": {"apply_amount": "amount"},
+    "smart_item": {
+        "total_amount": "amount", "subsidy": "amount", "apply_amount": "amount",
+        "first_review": "text", "final_review": "text",
+    },
+    "ipo_info": {"capital": "integer", "visit_date": "date", "apply_date": "date", "meeting_date": "date"},
+    "trading_list": {"company_id": "integer", "rank": "integer"},
+}
+DECLARED_TYPES = {"amount": "REAL", "integer": "INTEGER", "date": "TEXT", "text": "TEXT"}
+AMOUNT_COLUMNS = {col for types in COLUMN_TYPES.values() for col, kind in types.items() if kind == "amount"}
+# 查詢結果中的數值欄（依欄位決定，不依資料內容推斷）：顯示與匯出時轉為數值，匯入時保留原文的值視為空白
+NUMERIC_COLUMNS = AMOUNT_COLUMNS | {
+    col for types in COLUMN_TYPES.values() for col, kind in types.items() if kind == "integer"
+} | {
+    "apply_year", "rd_cases", "rd_amount", "rd_approved_cases", "rd_approved_amount", "smart_plans", "smart_cases",
+    "smart_amount", "smart_approved_cases", "smart_approved_amount", "trading_rank",
+}
+
+
+# ✅ 連線池設定
+POOL_SIZE = 8
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+def connect(path=DB_PATH):
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+# --- 資料庫版本：主檔與 WAL 檔的修改時間/大小，檔案變動時用來讓快取失效 ---
+def db_version(path=DB_PATH):
+    version = []
+    for p in (path, path + "-wal"):
+        try:
+            stat = os.stat(p)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+# --- 唯讀連線池：WAL 模式下多位使用者可同時讀取 ---
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, timeout=30):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.timeout)
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._open()
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get(timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+# --- 交易：已在外層交易中（如整批匯入）時以 SAVEPOINT 巢狀，不提前 commit，由外層一次發布 ---
+@contextmanager
+def transaction(conn):
+    if not conn.in_transaction:
+        with conn:
+            yield conn
+        return
+    conn.execute("SAVEPOINT nested")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK TO nested")
+        conn.execute("RELEASE nested")
+        raise
+    conn.execute("RELEASE nested")
+
+
+# --- 型別正規化：各來源試算表的日期與金額寫法不一，以 Python 解析後註冊為 SQL 函式 typed_value(kind, 值) ---
+# 日期接受 2023-01-03、2023/1/3、2023.1.3、2023年1月3日、20230103，以及民國年 112/3/5、112年3月5日、1120305
+_DATE_RE = re.compile(r"(\d{2,4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*日?(?:[\sT]+[\d:.]+)?")
+_COMPACT_DATE_RE = re.compile(r"(\d{3,4})(\d{2})(\d{2})")
+_NUMBER_RE = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)")
+
+
+def parse_date(text):
+    m = _DATE_RE.fullmatch(text) or _COMPACT_DATE_RE.fullmatch(text)
+    if not m:
+        return None
+    year, month, day = (int(g) for g in m.groups())
+    # 三位數以下的年份為民國年
+    if year < 1000:
+        year += 1911
+    try:
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def parse_number(text):
+    text = re.sub(r"[\s,元]", "", text)
+    return float(text) if _NUMBER_RE.fullmatch(text) else None
+
+
+def typed_value(kind, value):
+    if value is None or kind == "text" or isinstance(value, bytes):
+        return value
+    if kind != "date" and isinstance(value, (int, float)):
+        return int(value) if kind == "integer" else value
+    text = str(value).strip()
+    if not text:
+        return None
+    parsed = parse_date(text) if kind == "date" else parse_number(text)
+    if parsed is None:
+        return value
+    return int(parsed) if kind == "integer" else parsed
+
+
+def register_functions(conn):
+    conn.create_function("typed_value", 2, typed_value, deterministic=True)
+
+
+def typed_value_sql(kind, col):
+    if kind == "text":
+        return f"CAST({col} AS TEXT)"
+    return f"typed_value('{kind}', {col})"
+
+
+def typed_select(table, columns):
+    types = COLUMN_TYPES.get(table, {})
+    exprs = []
+    for col in columns:
+        quoted = f'"{col}"'
+        exprs.append(f"{typed_value_sql(types[col], quoted)} AS {quoted}" if col in types else quoted)
+    return ", ".join(exprs)
+
+
+# --- 民國年日期字串（ISO 日期 → 112/3/5），無日期時為空字串，匯入時無法解析的值原樣顯示 ---
+def roc_date_sql(col):
+    return (
+        f"COALESCE((CAST(strftime('%Y', {col}) AS INTEGER) - 1911) || '/' || "
+        f"CAST(strftime('%m', {col}) AS INTEGER) || '/' || CAST(strftime('%d', {col}) AS INTEGER), {col}, '')"
+    )
+
+
+# --- 舊資料庫一次性改型：以正確的宣告型別重建表格並正規化既有資料，衍生表清空後重算 ---
+def normalize_types(conn):
+    for table, types in COLUMN_TYPES.items():
+        create = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        for col, kind in types.items():
+            create = re.sub(rf'((?<!\w)"?{col}"?\s+)\w+', rf"\g<1>{DECLARED_TYPES[kind]}", create, count=1)
+        create = re.sub(rf'^CREATE TABLE (IF NOT EXISTS )?"?{table}"?', f"CREATE TABLE {table}__typed", create)
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        conn.execute(create)
+        conn.execute(f"INSERT INTO {table}__typed SELECT {typed_select(table, columns)} FROM {table}")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}__typed RENAME TO {table}")
+    for table in ("rd_summary", "smart_summary", "company_360"):
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+# --- 結構遷移：切換 WAL、建立索引（可重複執行）---
+def migrate(conn):
+    conn.execute("PRAGMA journal_mode = WAL")
+    register_functions(conn)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 取得寫入鎖後再確認一次，避免多個程序重複改型
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                normalize_types(conn)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    with conn:
+        for name, target in INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS company_name_fts
+            USING fts5(company_name, company_id UNINDEXED, tokenize = 'trigram')
+        """)
+        for table in ("rd_summary", "smart_summary"):
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    apply_year INTEGER,
+                    "group" TEXT,
+                    company_id INTEGER,
+                    total_cases INTEGER,
+                    total_amount REAL,
+                    approved_cases INTEGER,
+                    approved_amount REAL,
+                    PRIMARY KEY (apply_year, "group", company_id)
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_company ON {table}(company_id, apply_year)")
+        conn.execute(f"CREATE TABLE IF NOT EXISTS company_360 ({COMPANY_360_COLUMNS})")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS industry_group (
+                industry_category TEXT PRIMARY KEY,
+                "group" TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_industry_group_group ON industry_group("group", industry_category)')
+        conn.executemany("INSERT OR IGNORE INTO industry_group VALUES (?, ?)", INDUSTRY_GROUP_MAP.items())
+    if conn.execute("SELECT COUNT(*) FROM company_name_fts").fetchone()[0] == 0:
+        rebuild_name_index(conn)
+    if conn.execute("SELECT COUNT(*) FROM rd_summary").fetchone()[0] == 0:
+        refresh_summaries(conn)
+    if conn.execute("SELECT COUNT(*) FROM company_360").fetchone()[0] == 0:
+        refresh_company_360(conn)
+
+
+# --- 重建公司名稱索引（匯入新資料後執行）---
+def rebuild_name_index(conn):
+    union = "\n            UNION\n".join(
+        f"SELECT CAST(company_id AS INTEGER), trim(company_name) FROM {table} "
+        f"WHERE company_id IS NOT NULL AND company_name IS NOT NULL"
+        for table in NAME_SOURCES
+    )
+    with transaction(conn):
+        conn.execute("DELETE FROM company_name_fts")
+        conn.execute(f"INSERT INTO company_name_fts (company_id, company_name) {union}")
+    return conn.execute("SELECT COUNT(*) FROM company_name_fts").fetchone()[0]
+
+
+# --- 統計摘要表：依 (申請年度, 組別, 統編) 預先彙總件數與金額 ---
+# 非數值的金額不列入加總（與 pd.to_numeric(errors="coerce") 相同）
+# 設備投抵的組別由 industry_group 對應表 join 取得，未對應者為空字串
+SUMMARY_SOURCES = {
+    "rd_summary": {
+        "group": 'trim(a."group")',
+        "approved": "b.approved = '通過'",
+        "from": """
+            rd_project AS a
+            LEFT JOIN rd_item AS b
+            ON a.apply_year = b.apply_year
+               AND a.company_id = b.company_id
+               AND a.project_name = b.project_name
+        """,
+    },
+    "smart_summary": {
+        "group": 'g."group"',
+        "approved": "b.final_review = '複審項目核定'",
+        "from": """
+            smart_project AS a
+            LEFT JOIN smart_item AS b
+            ON a.apply_year = b.apply_year
+               AND a.company_id = b.company_id
+               AND a.plan_name = b.plan_name
+            LEFT JOIN industry_group AS g
+            ON g.industry_category = a.industry_category
+        """,
+    },
+}
+
+
+# --- 修改產業類別 → 組別對應，並只重算受影響的年度摘要與公司概覽 ---
+def set_industry_group(conn, industry_category, group):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO industry_group VALUES (?, ?)", (industry_category, group))
+    rows = conn.execute(
+        "SELECT DISTINCT apply_year, company_id FROM smart_project WHERE industry_category = ?", (industry_category,)
+    ).fetchall()
+    years = sorted({y for y, _ in rows if y is not None})
+    if years:
+        refresh_summaries(conn, years)
+    refresh_company_360(conn, sorted({c for _, c in rows if c is not None}))
+    return len(rows)
+
+
+# --- 重算統計摘要；指定 years 時只重算這些年度（匯入資料後增量更新）---
+def refresh_summaries(conn, years=None):
+    years = [int(y) for y in years or []]
+    marks = ", ".join("?" * len(years))
+
+    with transaction(conn):
+        for table, source in SUMMARY_SOURCES.items():
+            conn.execute(f"DELETE FROM {table}" + (f" WHERE apply_year IN ({marks})" if years else ""), years)
+            conn.execute(f"""
+                INSERT INTO {table}
+                SELECT a.apply_year,
+                       IFNULL({source["group"]}, ''),
+                       a.company_id,
+                       COUNT(*),
+                       TOTAL(CASE WHEN typeof(b.apply_amount) IN ('integer', 'real') THEN b.apply_amount END),
+                       SUM(CASE WHEN {source["approved"]} THEN 1 ELSE 0 END),
+                       TOTAL(CASE WHEN {source["approved"]} AND typeof(b.apply_amount) IN ('integer', 'real')
+                                  THEN b.apply_amount END)
+                FROM {source["from"]}
+                {f"WHERE a.apply_year IN ({marks})" if years else ""}
+                GROUP BY 1, 2, 3
+            """, years)
+
+
+# --- 儀表板指標：直接由統計摘要表加總 ---
+def summary_metrics(conn, table, company_id=None, company_ids=None, year=None, group=None):
+    clause, params = make_filter("a", company_id, company_ids, year, group)
+    row = conn.execute(f"""
+        SELECT IFNULL(SUM(total_cases), 0), TOTAL(total_amount),
+               IFNULL(SUM(approved_cases), 0), TOTAL(approved_amount)
+        FROM {table} AS a WHERE 1=1 {clause}
+    """, params).fetchone()
+    return dict(zip(["total_cases", "total_amount", "approved_cases", "approved_amount"], row))
+
+
+# --- 企業 360 概覽表：每家公司一列，彙整研發、設備投抵、上市櫃狀態與交易名單排名 ---
+# 以統編為主鍵，搜尋頁以單次主鍵查找取得；匯入資料後以 refresh_company_360(company_ids) 增量更新
+COMPANY_360_COLUMNS = """
+    company_id INTEGER PRIMARY KEY,
+    company_name TEXT,
+    rd_cases INTEGER,
+    rd_amount REAL,
+    rd_approved_cases INTEGER,
+    rd_approved_amount REAL,
+    rd_years TEXT,
+    rd_groups TEXT,
+    smart_plans INTEGER,
+    smart_cases INTEGER,
+    smart_amount REAL,
+    smart_approved_cases INTEGER,
+    smart_approved_amount REAL,
+    smart_years TEXT,
+    smart_groups TEXT,
+    ipo_type TEXT,
+    ipo_status TEXT,
+    ipo_result TEXT,
+    ipo_group TEXT,
+    ipo_broker TEXT,
+    trading_rank INTEGER,
+    trading_group TEXT,
+    trading_ipo_type TEXT,
+    trading_industry TEXT,
+    refreshed_at TEXT
+"""
+
+
+# --- 重建企業 360 概覽；指定 company_ids 時只重建這些公司（匯入資料後增量更新）---
+# 統編清單以 JSON 陣列單一參數傳入（json_each），不受 SQL 參數個數上限影響
+def refresh_company_360(conn, company_ids=None):
+    ids = None if company_ids is None else json.dumps([int(i) for i in company_ids])
+    scope = "company_id IN (SELECT value FROM json_each(:ids))" if ids is not None else "company_id IS NOT NULL"
+    a_scope = "a." + scope
+    union = " UNION ".join(f"SELECT CAST(company_id AS INTEGER) AS company_id FROM {t} WHERE {scope}" for t in NAME_SOURCES)
+    names = " UNION ALL ".join(
+        f"SELECT {rank} AS source, CAST(company_id AS INTEGER) AS company_id, trim(company_name) AS company_name "
+        f"FROM {t} WHERE {scope} AND company_name IS NOT NULL"
+        for rank, t in enumerate(NAME_SOURCES)
+    )
+    with transaction(conn):
+        conn.execute(f"DELETE FROM company_360 WHERE {scope}", {"ids": ids})
+        conn.execute(f"""
+            INSERT INTO company_360
+            WITH ids AS ({union}),
+            names AS (
+                SELECT company_id, company_name,
+                       ROW_NUMBER() OVER (PARTITION BY company_id ORDER BY source) AS n
+                FROM ({names})
+            ),
+            rd AS (
+                SELECT a.company_id,
+                       COUNT(*) AS cases,
+                       TOTAL(CASE WHEN typeof(b.apply_amount) IN ('integer', 'real') THEN b.apply_amount END) AS amount,
+                       SUM(CASE WHEN b.approved = '通過' THEN 1 ELSE 0 END) AS approved_cases,
+                       TOTAL(CASE WHEN b.approved = '通過' AND typeof(b.apply_amount) IN ('integer', 'real')
+                                  THEN b.apply_amount END) AS approved_amount,
+                       group_concat(DISTINCT a.apply_year) AS years,
+                       group_concat(DISTINCT trim(a."group")) AS groups
+                FROM rd_project AS a
+                LEFT JOIN rd_item AS b
+                ON a.apply_year = b.apply_year
+                   AND a.company_id = b.company_id
+                   AND a.project_name = b.project_name
+                WHERE {a_scope}
+                GROUP BY a.company_id
+            ),
+            smart AS (
+                SELECT a.company_id,
+                       COUNT(DISTINCT a.apply_year || '|' || a.plan_name) AS plans,
+                       COUNT(*) AS cases,
+                       TOTAL(CASE WHEN typeof(b.apply_amount) IN ('integer', 'real') THEN b.apply_amount END) AS amount,
+                       SUM(CASE WHEN b.final_review = '複審項目核定' THEN 1 ELSE 0 END) AS approved_cases,
+                       TOTAL(CASE WHEN b.final_review = '複審項目核定' AND typeof(b.apply_amount) IN ('integer', 'real')
+                                  THEN b.apply_amount END) AS approved_amount,
+                       group_concat(DISTINCT a.apply_year) AS years,
+                       group_concat(DISTINCT g."group") AS groups
+                FROM smart_project AS a
+                LEFT JOIN smart_item AS b
+                ON a.apply_year = b.apply_year
+                   AND a.company_id = b.company_id
+                   AND a.plan_name = b.plan_name
+                LEFT JOIN industry_group AS g
+                ON g.industry_category = a.industry_category
+                WHERE {a_scope}
+                GROUP BY a.company_id
+            ),
+            ipo AS (
+                SELECT CAST(company_id AS INTEGER) AS company_id, ipo_type, status, result, trim("group") AS grp, broker,
+                       ROW_NUMBER() OVER (PARTITION BY company_id ORDER BY apply_date DESC, rowid DESC) AS n
+                FROM ipo_info WHERE {scope}
+            ),
+            trading AS (
+                SELECT CAST(company_id AS INTEGER) AS company_id, CAST(rank AS INTEGER) AS rank, trim("group") AS grp,
+                       ipo_type, ipo_industry,
+                       ROW_NUMBER() OVER (PARTITION BY company_id ORDER BY rank IS NULL, rank) AS n
+                FROM trading_list WHERE {scope}
+            )
+            SELECT ids.company_id, names.company_name,
+                   IFNULL(rd.cases, 0), IFNULL(rd.amount, 0), IFNULL(rd.approved_cases, 0), IFNULL(rd.approved_amount, 0),
+                   rd.years, rd.groups,
+                   IFNULL(smart.plans, 0), IFNULL(smart.cases, 0), IFNULL(smart.amount, 0),
+                   IFNULL(smart.approved_cases, 0), IFNULL(smart.approved_amount, 0), smart.years, smart.groups,
+                   ipo.ipo_type, ipo.status, ipo.result, ipo.grp, ipo.broker,
+                   trading.rank, trading.grp, trading.ipo_type, trading.ipo_industry,
+                   datetime('now', 'localtime')
+            FROM ids
+            LEFT JOIN names ON names.company_id = ids.company_id AND names.n = 1
+            LEFT JOIN rd ON rd.company_id = ids.company_id
+            LEFT JOIN smart ON smart.company_id = ids.company_id
+            LEFT JOIN ipo ON ipo.company_id = ids.company_id AND ipo.n = 1
+            LEFT JOIN trading ON trading.company_id = ids.company_id AND trading.n = 1
+        """, {"ids": ids})
+    return conn.execute("SELECT COUNT(*) FROM company_360").fetchone()[0]
+
+
+# --- 企業概覽：依統編（或名稱解析出的統編集合）以主鍵查找 ---
+def company_overview(conn, company_id=None, company_ids=None):
+    if company_ids is not None:
+        sql = "SELECT * FROM company_360 WHERE company_id IN (SELECT value FROM json_each(?)) ORDER BY company_id"
+        params = [json.dumps(company_ids)]
+    else:
+        sql = "SELECT * FROM company_360 WHERE company_id = ?"
+        params = [parse_company_id(company_id)]
+    cursor = conn.execute(sql, params)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+# --- 由概覽列加總儀表板指標（欄位前綴 rd_ / smart_），與統計摘要表的結果一致 ---
+def overview_metrics(rows, prefix):
+    return {
+        "total_cases": sum(r[f"{prefix}_cases"] for r in rows),
+        "total_amount": sum(r[f"{prefix}_amount"] for r in rows),
+        "approved_cases": sum(r[f"{prefix}_approved_cases"] for r in rows),
+        "approved_amount": sum(r[f"{prefix}_approved_amount"] for r in rows),
+    }
+
+
+# --- 批次統編：從貼上的文字或檔案內容取出 7～8 位數字（Excel 常吃掉統編開頭的 0），去除重複並保留順序 ---
+def parse_company_ids(text):
+    ids = (int(m) for m in re.findall(r"(?<!\d)\d{7,8}(?!\d)", text or ""))
+    return list(dict.fromkeys(ids))
+
+
+# --- 批次摘要：整批統編一次查詢，每家公司一列（依輸入順序，查無資料者也列出）---
+# 統編清單以 JSON 陣列傳入並 join 概覽表與統計摘要表；年度/組別篩選套用在摘要表上
+def batch_query(company_ids, year=None, group=None):
+    parts, params = [], [json.dumps([int(i) for i in company_ids])]
+    for prefix in ("rd", "smart"):
+        clause, clause_params = make_filter("a", year=year, group=group)
+        parts.append(f"""
+            {prefix} AS (
+                SELECT a.company_id, SUM(a.total_cases) AS cases, TOTAL(a.total_amount) AS amount,
+                       SUM(a.approved_cases) AS approved_cases, TOTAL(a.approved_amount) AS approved_amount
+                FROM {prefix}_summary AS a
+                WHERE a.company_id IN (SELECT company_id FROM ids) {clause}
+                GROUP BY a.company_id
+            )""")
+        params.extend(clause_params)
+    sql = f"""
+        WITH ids AS (SELECT key AS n, value AS company_id FROM json_each(?)),
+        {",".join(parts)}
+        SELECT ids.company_id, c.company_name,
+               CASE WHEN c.company_id IS NULL THEN '查無資料' ELSE '' END AS note,
+               IFNULL(rd.cases, 0) AS rd_cases, IFNULL(rd.amount, 0) AS rd_amount,
+               IFNULL(rd.approved_cases, 0) AS rd_approved_cases, IFNULL(rd.approved_amount, 0) AS rd_approved_amount,
+               IFNULL(smart.cases, 0) AS smart_cases, IFNULL(smart.amount, 0) AS smart_amount,
+               IFNULL(smart.approved_cases, 0) AS smart_approved_cases,
+               IFNULL(smart.approved_amount, 0) AS smart_approved_amount,
+               c.ipo_type, c.ipo_status, c.ipo_result, c.trading_rank, c.trading_group
+        FROM ids
+        LEFT JOIN company_360 AS c ON c.company_id = ids.company_id
+        LEFT JOIN rd ON rd.company_id = ids.company_id
+        LEFT JOIN smart ON smart.company_id = ids.company_id
+        ORDER BY ids.n
+    """
+    return sql, params
+
+
+# --- 公司名稱 → 統編集合 ---
+# trigram 需 3 個字以上才能走索引；較短的關鍵字改以 LIKE 掃描索引表（僅含不重複名稱，資料量小）
+# 以 +company_name 避開 trigram 對 3 字以下中文 LIKE 的處理（SQLite 3.40 會回傳空結果）
+def resolve_company_ids(conn, company_name):
+    company_name = company_name.strip()
+    if len(company_name) >= 3:
+        sql = "SELECT DISTINCT company_id FROM company_name_fts WHERE company_name_fts MATCH ?"
+        params = ['"' + company_name.replace('"', '""') + '"']
+    else:
+        sql = "SELECT DISTINCT company_id FROM company_name_fts WHERE +company_name LIKE ?"
+        params = [f"%{company_name}%"]
+    return [row[0] for row in conn.execute(sql, params)]
+
+
+# --- 統編一律轉成整數比對，才能使用 INTEGER 欄位上的索引 ---
+def parse_company_id(text):
+    text = (text or "").strip()
+    return int(text) if re.fullmatch(r"\d+", text) else text
+
+
+# --- 啟動資料：申請年度選項 ---
+def load_year_options(conn):
+    rows = conn.execute("""
+        SELECT DISTINCT apply_year FROM rd_project WHERE apply_year IS NOT NULL
+        UNION
+        SELECT DISTINCT apply_year FROM smart_project WHERE apply_year IS NOT NULL
+    """).fetchall()
+    return sorted((row[0] for row in rows), reverse=True)
+
+
+# --- 公司條件：名稱優先（先經全文索引解析為統編集合），否則使用統編 ---
+def company_filter(conn, company_id=None, company_name=None):
+    if company_name and company_name.strip():
+        return {"company_ids": resolve_company_ids(conn, company_name)}
+    return {"company_id": company_id}
+
+
+# --- 篩選條件：回傳 (SQL 片段, 參數) ---
+def make_filter(alias, company_id=None, company_ids=None, year=None, group=None):
+    clause, params = "", []
+    if company_ids is not None:
+        # 統編清單以 JSON 陣列單一參數傳入，清單長度不影響 SQL 文字與參數個數
+        clause += f" AND {alias}.company_id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps([int(i) for i in company_ids]))
+    elif company_id:
+        clause += f" AND {alias}.company_id = ?"
+        params.append(parse_company_id(company_id))
+    if year:
+        clause += f" AND {alias}.apply_year = ?"
+        params.append(int(year))
+    if group:
+        clause += f' AND trim({alias}."group") = ?'
+        params.append(group)
+    return clause, params
+
+
+# --- 研發資料 ---
+def rd_query(company_id=None, company_ids=None, year=None, group=None):
+    sql = """
+        SELECT a.*, b.apply_amount, b.approved
+        FROM rd_project AS a
+        LEFT JOIN rd_item AS b
+        ON a.apply_year = b.apply_year
+           AND a.company_id = b.company_id
+           AND a.project_name = b.project_name
+        WHERE 1=1
+    """
+    clause, params = make_filter("a", company_id, company_ids, year, group)
+    return sql + clause, params
+
+
+# --- 設備資料（組別由 industry_group 對應表 join 取得；組別篩選在 SQL 內完成，先由對應表找出產業類別再查找）---
+def smart_query(company_id=None, company_ids=None, year=None, group=None):
+    sql = """
+        SELECT a.*, b.item_no, b.item_name, b.item_type, b.total_amount, b.subsidy, b.apply_amount, b.first_review, b.final_review,
+               g."group" AS mapped_group
+        FROM smart_project AS a
+        LEFT JOIN smart_item AS b
+        ON a.apply_year = b.apply_year
+           AND a.company_id = b.company_id
+           AND a.plan_name = b.plan_name
+        LEFT JOIN industry_group AS g
+        ON g.industry_category = a.industry_category
+        WHERE 1=1
+    """
+    clause, params = make_filter("a", company_id, company_ids, year)
+    if group:
+        clause += ' AND g."group" = ?'
+        params.append(group)
+    return sql + clause, params
+
+
+# --- 上市櫃資料（無申請年度；日期直接在 SQL 轉為民國年字串）---
+IPO_COLUMNS = [
+    "company_name", "company_id", "ipo_type", "country", "capital", "broker", "status", "group",
+    "visit_date", "apply_date", "meeting_date", "result", "remark",
+]
+
+
+def ipo_query(company_id=None, company_ids=None, group=None):
+    columns = ", ".join(
+        f'{roc_date_sql("a." + col)} AS {col}' if col.endswith("_date") else f'a."{col}"' for col in IPO_COLUMNS
+    )
+    sql = f"SELECT {columns} FROM ipo_info AS a WHERE 1=1"
+    clause, params = make_filter("a", company_id, company_ids, group=group)
+    return sql + clause, params
+
+
+# --- 筆數 ---
+def count_query(sql, params):
+    return f"SELECT COUNT(*) FROM ({sql})", params
+
+
+# --- keyset 分頁：依主鍵排序，從上一頁最後一筆的鍵值之後取 page_size 筆 ---
+# 鍵值以 _page_key0.. 欄位一併回傳，供下一頁使用
+def page_query(table, sql, params, after=None, page_size=PAGE_SIZE_OPTIONS[0]):
+    keys = PAGE_KEYS[table]
+    key_cols = ", ".join(f"{key} AS _page_key{i}" for i, key in enumerate(keys))
+    sql = sql.replace("SELECT ", f"SELECT {key_cols}, ", 1)
+    params = list(params)
+    if after is not None:
+        sql += f" AND ({', '.join(keys)}) > ({', '.join('?' * len(keys))})"
+        params.extend(after)
+    sql += f" ORDER BY {', '.join(keys)} LIMIT ?"
+    params.append(page_size)
+    return sql, params
+
+
+# --- EXPLAIN QUERY PLAN：找出全表掃描 ---
+def explain(conn, sql, params=()):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+# FTS5 的 MATCH 查詢在計畫中顯示為 "SCAN ... VIRTUAL TABLE INDEX n:M..."，屬於索引查找
+# json_each 掃描的是參數傳入的統編陣列，不是資料表
+def full_scans(plan):
+    return [
+        step for step in plan
+        if step.startswith("SCAN ") and "CONSTANT ROW" not in step and not step.startswith("SCAN json_each ")
+        and step != "SCAN ids"  # 批次摘要逐一走訪輸入的統編清單
+        and not re.search(r"VIRTUAL TABLE INDEX \d+:M", step)
+    ]
+
+
+# 代表性查詢：統編、年度、組別查找都不應出現全表掃描
+PLAN_CHECKS = {
+    "研發-統編": lambda: rd_query(company_id="12345678"),
+    "研發-年度": lambda: rd_query(year=112),
+    "研發-組別": lambda: rd_query(group="數位服務組"),
+    "研發-統編+年度": lambda: rd_query(company_id="12345678", year=112),
+    "研發-名稱": lambda: rd_query(company_ids=[12345678, 87654321]),
+    "設備-統編": lambda: smart_query(company_id="12345678"),
+    "設備-年度": lambda: smart_query(year=112),
+    "設備-組別": lambda: smart_query(group="數位服務組"),
+    "設備-組別+年度": lambda: smart_query(year=112, group="數位服務組"),
+    "設備-名稱": lambda: smart_query(company_ids=[12345678, 87654321]),
+    "上市櫃-統編": lambda: ipo_query(company_id="12345678"),
+    "上市櫃-組別": lambda: ipo_query(group="數位服務組"),
+    "上市櫃-名稱": lambda: ipo_query(company_ids=[12345678, 87654321]),
+    "企業概覽-統編": lambda: (
+        "SELECT * FROM company_360 WHERE company_id = ?", [12345678]
+    ),
+    "企業概覽-名稱": lambda: (
+        "SELECT * FROM company_360 WHERE company_id IN (SELECT value FROM json_each(?))", ["[12345678, 87654321]"]
+    ),
+    "批次摘要": lambda: batch_query([12345678, 87654321]),
+    "批次摘要+年度+組別": lambda: batch_query([12345678, 87654321], year=112, group="數位服務組"),
+    "名稱索引": lambda: (
+        "SELECT DISTINCT company_id FROM company_name_fts WHERE company_name_fts MATCH ?", ['"資訊服務"']
+    ),
+}
+
+
+def check_query_plans(conn):
+    report = []
+    for name, build in PLAN_CHECKS.items():
+        sql, params = build()
+        plan = explain(conn, sql, params)
+        report.append((name, plan, full_scans(plan)))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="企業履歷查詢資料庫工具")
+    parser.add_argument("--db", default=DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="建立索引")
+    sub.add_parser("rebuild-name-index", help="重建公司名稱全文索引")
+    refresh = sub.add_parser("refresh-summaries", help="重算統計摘要表")
+    refresh.add_argument("--year", type=int, action="append", help="只重算指定申請年度，可重複指定")
+    refresh_360 = sub.add_parser("refresh-company-360", help="重建企業 360 概覽表")
+    refresh_360.add_argument("--company-id", type=int, action="append", help="只重建指定統編，可重複指定")
+    mapping = sub.add_parser("set-industry-group", help="設定設備投抵產業類別對應的組別")
+    mapping.add_argument("industry_category")
+    mapping.add_argument("group", choices=GROUP_OPTIONS)
+    sub.add_parser("explain", help="檢查代表性查詢是否仍有全表掃描")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    try:
+        if args.command == "migrate":
+            migrate(conn)
+            print("✅ 索引建立完成")
+            return 0
+        if args.command == "rebuild-name-index":
+            print(f"✅ 公司名稱索引重建完成，共 {rebuild_name_index(conn)} 筆")
+            return 0
+        if args.command == "refresh-summaries":
+            refresh_summaries(conn, args.year)
+            print(f"✅ 統計摘要重算完成（年度：{args.year or '全部'}）")
+            return 0
+        if args.command == "set-industry-group":
+            migrate(conn)
+            n = set_industry_group(conn, args.industry_category, args.group)
+            print(f"✅ {args.industry_category} → {args.group}，已重算 {n} 組（年度, 公司）的摘要與概覽")
+            return 0
+        if args.command == "refresh-company-360":
+            total = refresh_company_360(conn, args.company_id)
+            print(f"✅ 企業 360 概覽重建完成（統編：{args.company_id or '全部'}），共 {total} 家公司")
+            return 0
+
+        failed = False
+        for name, plan, scans in check_query_plans(conn):
+            print(f"{'❌' if scans else '✅'} {name}")
+            for step in plan:
+                print(f"    {step}")
+            failed = failed or bool(scans)
+        return 1 if failed else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
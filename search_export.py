@@ -0,0 +1,129 @@
+import csv
+import io
+import os
+import tempfile
+import zipfile
+
+import pandas as pd
+from openpyxl import Workbook
+
+import search_db
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet 匯出為選用功能
+    pa = None
+
+# ✅ 每次自 cursor 取出的筆數（決定匯出時的記憶體上限）
+CHUNK_SIZE = 5000
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "search_exports")
+
+EXPORT_FORMATS = {
+    "xlsx": ("Excel (.xlsx)", ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV (.zip)", ".zip", "application/zip"),
+}
+if pa is not None:
+    EXPORT_FORMATS["parquet"] = ("Parquet (.zip)", ".zip", "application/zip")
+
+
+# --- 查詢結果轉為顯示用格式：中文欄位（金額、民國年日期已在匯入與查詢時處理）---
+# 數值欄以 pd.to_numeric 轉換（匯入時無法解析而保留原文的值顯示為空白），金額欄一律為 float64，整批為 NULL 時也維持數值欄
+def prepare_frame(table, df):
+    df = df.drop(columns=[c for c in df.columns if c.startswith("_page_key")])
+    for col in search_db.NUMERIC_COLUMNS & set(df.columns):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+        if col in search_db.AMOUNT_COLUMNS:
+            df[col] = df[col].astype("float64")
+    return df.rename(columns=search_db.COLUMN_LABELS[table])
+
+
+def numeric_labels(table):
+    labels = search_db.COLUMN_LABELS[table]
+    return {labels.get(col, col) for col in search_db.NUMERIC_COLUMNS}
+
+
+# --- 逐批讀取查詢結果，每批轉成顯示格式後交出（第一批即使為空也交出，以取得欄位名稱）---
+def iter_frames(conn, table, sql, params, chunk_size=CHUNK_SIZE):
+    cursor = conn.execute(sql, params)
+    columns = [d[0] for d in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        yield prepare_frame(table, pd.DataFrame.from_records(rows, columns=columns))
+        if len(rows) < chunk_size:
+            break
+
+
+def _rows(df):
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+# --- Excel：write-only 模式逐列寫入，不在記憶體保留整張工作表 ---
+def _write_xlsx(conn, sheets, path):
+    wb = Workbook(write_only=True)
+    for name, table, sql, params in sheets:
+        ws = wb.create_sheet(title=name[:31])
+        for i, df in enumerate(iter_frames(conn, table, sql, params)):
+            if i == 0:
+                ws.append(list(df.columns))
+            for row in _rows(df):
+                ws.append(row)
+    wb.save(path)
+
+
+# --- CSV：每個工作表一個 CSV（UTF-8 BOM，Excel 可直接開啟），打包成 zip ---
+def _write_csv(conn, sheets, path):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, table, sql, params in sheets:
+            with zf.open(f"{name}.csv", "w") as raw:
+                out = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+                writer = csv.writer(out)
+                for i, df in enumerate(iter_frames(conn, table, sql, params)):
+                    if i == 0:
+                        writer.writerow(df.columns)
+                    writer.writerows(_rows(df))
+                out.flush()
+                out.detach()
+
+
+# --- Parquet：數值欄（依欄位決定）為 float64、其餘為字串，每批 schema 相同 ---
+def _arrow_batch(df, numeric):
+    arrays = {}
+    for col in df.columns:
+        if col in numeric:
+            values = pd.to_numeric(df[col], errors="coerce").astype("float64")
+            arrays[col] = pa.array(values, type=pa.float64(), from_pandas=True)
+        else:
+            arrays[col] = pa.array([None if pd.isnull(v) else str(v) for v in df[col]], type=pa.string())
+    return pa.table(arrays)
+
+
+# --- Parquet：每個工作表一個 parquet 檔，逐批寫入 row group ---
+def _write_parquet(conn, sheets, path):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, table, sql, params in sheets:
+            with zf.open(f"{name}.parquet", "w") as raw:
+                writer = None
+                numeric = numeric_labels(table)
+                for df in iter_frames(conn, table, sql, params):
+                    batch = _arrow_batch(df, numeric)
+                    if writer is None:
+                        writer = pq.ParquetWriter(raw, batch.schema)
+                    writer.write_table(batch)
+                writer.close()
+
+
+WRITERS = {"xlsx": _write_xlsx, "csv": _write_csv, "parquet": _write_parquet}
+
+
+# --- 重新執行查詢並串流寫入暫存檔，回傳檔案路徑 ---
+def export(conn, sheets, fmt="xlsx"):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=EXPORT_FORMATS[fmt][1], dir=EXPORT_DIR)
+    os.close(fd)
+    try:
+        WRITERS[fmt](conn, sheets, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
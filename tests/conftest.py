@@ -0,0 +1,16 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# ✅ 每個測試使用一份專案內附資料庫的複本，不動到 mydb.sqlite 本身
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "mydb.sqlite"
+    shutil.copy(os.path.join(ROOT, "mydb.sqlite"), path)
+    return str(path)
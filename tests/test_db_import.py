@@ -0,0 +1,112 @@
+import csv
+
+import pytest
+
+from db_import import import_sources, main
+from search_db import connect, migrate
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def export_table(conn, table, path):
+    cursor = conn.execute(f"SELECT * FROM {table}")
+    return write_csv(path, [d[0] for d in cursor.description], cursor.fetchall())
+
+
+def rows(conn, table):
+    return sorted(conn.execute(f"SELECT * FROM {table}").fetchall(), key=repr)
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = connect(db_path)
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def test_upsert_table_with_primary_key(conn, tmp_path):
+    (company_id, name), = conn.execute("SELECT company_id, company_name FROM company LIMIT 1").fetchall()
+    before = conn.execute("SELECT COUNT(*) FROM company").fetchone()[0]
+    path = write_csv(tmp_path / "company.csv", ["company_id", "company_name"],
+                     [[company_id, name + "（更名）"], [99999999, "新公司"]])
+
+    stats = import_sources(conn, [("company", path, None)])
+
+    assert stats["rows"] == {"company": 2}
+    assert conn.execute("SELECT COUNT(*) FROM company").fetchone()[0] == before + 1
+    assert conn.execute("SELECT company_name FROM company WHERE company_id = ?", (company_id,)).fetchone()[0] == name + "（更名）"
+
+
+# 匯出後原樣匯回：沒有主鍵的表以取代鍵整組取代，送件日期為空的列也不能遺失
+def test_round_trip_replaces_table_without_primary_key(conn, tmp_path):
+    before = rows(conn, "ipo_info")
+    assert any(row[9] is None for row in before)
+    path = export_table(conn, "ipo_info", tmp_path / "ipo_info.csv")
+
+    stats = import_sources(conn, [("ipo_info", path, None)])
+
+    assert stats["rows"] == {"ipo_info": len(before)}
+    assert stats["skipped"] == {"ipo_info": 0}
+    assert rows(conn, "ipo_info") == before
+
+
+def test_replace_key_updates_matching_rows_only(conn, tmp_path):
+    before = conn.execute("SELECT COUNT(*) FROM ipo_info").fetchone()[0]
+    company_id = conn.execute("SELECT company_id FROM ipo_info WHERE apply_date IS NULL LIMIT 1").fetchone()[0]
+    path = write_csv(tmp_path / "ipo_info.csv", ["company_id", "status", "apply_date"],
+                     [[company_id, "已送件", "2024/1/5"]])
+
+    import_sources(conn, [("ipo_info", path, None)])
+
+    assert conn.execute("SELECT COUNT(*) FROM ipo_info").fetchone()[0] == before
+    assert conn.execute(
+        "SELECT status, apply_date FROM ipo_info WHERE company_id = ?", (company_id,)
+    ).fetchall() == [("已送件", "2024-01-05")]
+
+
+# 來源常見的未補零日期、民國年與負數金額都要正確轉換，不能變成 NULL
+def test_import_normalizes_source_formats(conn, tmp_path):
+    company_id = conn.execute("SELECT company_id FROM ipo_info LIMIT 1").fetchone()[0]
+    path = write_csv(tmp_path / "ipo_info.csv", ["company_id", "visit_date", "apply_date", "meeting_date", "capital"],
+                     [[company_id, "2023/1/3", "112/03/05", "待定", "-500"]])
+
+    import_sources(conn, [("ipo_info", path, None)])
+
+    assert conn.execute(
+        "SELECT visit_date, apply_date, meeting_date, capital FROM ipo_info WHERE company_id = ?", (company_id,)
+    ).fetchall() == [("2023-01-03", "2023-03-05", "待定", -500)]
+
+
+def test_replace_option_replaces_whole_table(db_path, tmp_path):
+    path = write_csv(tmp_path / "trading.csv", ["company_id", "company_name", "rank"],
+                     [[12345678, "甲公司", 1], [87654321, "乙公司", 2]])
+
+    assert main(["--db", db_path, "--replace", "trading_list", f"trading_list={path}"]) == 0
+
+    conn = connect(db_path)
+    try:
+        assert conn.execute("SELECT company_id, company_name, rank FROM trading_list ORDER BY rank").fetchall() == [
+            (12345678, "甲公司", 1), (87654321, "乙公司", 2),
+        ]
+    finally:
+        conn.close()
+
+
+# 任一來源檔缺少鍵值欄位時整批回復，先前已暫存的檔案也不寫入
+def test_missing_key_columns_roll_back(conn, tmp_path):
+    before = {table: rows(conn, table) for table in ("company", "ipo_info")}
+    good = write_csv(tmp_path / "company.csv", ["company_id", "company_name"], [[99999999, "新公司"]])
+    bad = write_csv(tmp_path / "ipo_info.csv", ["company_name", "status"], [["新公司", "已送件"]])
+
+    with pytest.raises(ValueError, match="company_id"):
+        import_sources(conn, [("company", good, None), ("ipo_info", bad, None)])
+
+    assert not conn.in_transaction
+    assert {table: rows(conn, table) for table in before} == before
@@ -0,0 +1,149 @@
+import pytest
+
+from dedup import (
+    BIRTH_FIELD,
+    CHINESE_NAME_FIELD,
+    ENGLISH_NAME_FIELD,
+    MAX_PAIRWISE_BLOCK,
+    MERGE_SOURCE_FIELD,
+    find_duplicates,
+    merge_duplicates,
+    merge_group,
+)
+from json_stream import MISSING_VALUE
+from ocr_profiles import load_profile
+from record_store import PASSPORT_FIELD
+
+
+@pytest.fixture(scope="module")
+def profile():
+    return load_profile("goldencard")
+
+
+def record(source, english=MISSING_VALUE, chinese=MISSING_VALUE, birth=MISSING_VALUE, passport=MISSING_VALUE, **fields):
+    return {
+        ENGLISH_NAME_FIELD: english,
+        CHINESE_NAME_FIELD: chinese,
+        BIRTH_FIELD: birth,
+        PASSPORT_FIELD: passport,
+        "來源檔案": source,
+        **fields,
+    }
+
+
+def groups_of(records):
+    return sorted(sorted(g) for g in find_duplicates(records))
+
+
+# --- 分組 ---
+def test_same_passport_merges_despite_formatting_and_name_typos():
+    records = [
+        record("a.pdf", english="John Smith", passport="A 123-456"),
+        record("b.pdf", english="Jhon Smyth", passport="a123456"),
+    ]
+    assert groups_of(records) == [[0, 1]]
+
+
+def test_fuzzy_name_with_same_birth_date_merges():
+    records = [
+        record("a.pdf", english="Smith John", birth="1990-01-02"),
+        record("b.pdf", english="Jon Smith", birth="02 JAN 1990"),
+    ]
+    assert groups_of(records) == [[0, 1]]
+
+
+def test_same_name_without_identifiers_merges():
+    records = [record("a.pdf", chinese="王 小明"), record("b.pdf", chinese="王小明")]
+    assert groups_of(records) == [[0, 1]]
+
+
+def test_conflicting_passports_do_not_merge_even_with_same_name():
+    records = [
+        record("a.pdf", english="John Smith", chinese="約翰", birth="1990-01-02", passport="A123"),
+        record("b.pdf", english="John Smith", chinese="約翰", birth="1990-01-02", passport="B456"),
+    ]
+    assert groups_of(records) == [[0], [1]]
+
+
+def test_conflicting_birth_dates_do_not_merge_even_with_same_name():
+    records = [
+        record("a.pdf", english="John Smith", birth="1990-01-02"),
+        record("b.pdf", english="John Smith", birth="1985-07-30"),
+    ]
+    assert groups_of(records) == [[0], [1]]
+
+
+def test_record_without_passport_cannot_bridge_two_conflicting_passports():
+    records = [
+        record("a.pdf", english="John Smith", passport="A123"),
+        record("cv.pdf", english="John Smith"),
+        record("b.pdf", english="John Smith", passport="B456"),
+    ]
+    groups = groups_of(records)
+    assert len(groups) == 2
+    assert not any(0 in g and 2 in g for g in groups)
+
+
+def test_large_birth_block_uses_sorted_neighbourhood():
+    # 同一出生日期的區塊超過 MAX_PAIRWISE_BLOCK 筆：只比對排序後前後幾筆，模糊相似的姓名仍會合併
+    birth = "2000-01-01"
+    records = [record(f"f{n}.pdf", chinese=chr(0x4E00 + n) * 3, birth=birth) for n in range(MAX_PAIRWISE_BLOCK + 10)]
+    records += [
+        record("a.pdf", english="Alexander Hamilton", birth=birth),
+        record("b.pdf", english="Alexandr Hamilton", birth=birth),
+    ]
+    groups = groups_of(records)
+    assert len(records) > MAX_PAIRWISE_BLOCK + 1
+    assert [len(records) - 2, len(records) - 1] in groups
+    assert len(groups) == len(records) - 1
+
+
+# --- 逐欄合併 ---
+def test_merge_group_takes_majority_value_and_flags_disagreement(profile):
+    records = [
+        record("a.pdf", english="John Smith", 月薪="100000"),
+        record("b.pdf", english="John Smith", 月薪="250000"),
+        record("c.pdf", english="John Smith", 月薪="100000"),
+    ]
+    merged = merge_group(records, profile)
+    assert merged["月薪"] == "100000"
+    assert merged["來源檔案"] == "a.pdf、b.pdf、c.pdf"
+    assert merged[MERGE_SOURCE_FIELD].startswith("a.pdf：")
+    assert "月薪（值不一致）" in merged[MERGE_SOURCE_FIELD]
+    assert "英文名字＋英文姓氏（值不一致）" not in merged[MERGE_SOURCE_FIELD]
+
+
+def test_merge_group_breaks_ties_with_longer_value(profile):
+    records = [
+        record("a.pdf", english="John Smith", 現職公司="台積電"),
+        record("b.pdf", english="John Smith", 現職公司="台灣積體電路製造股份有限公司"),
+    ]
+    merged = merge_group(records, profile)
+    assert merged["現職公司"] == "台灣積體電路製造股份有限公司"
+    assert "b.pdf：現職公司（值不一致）" in merged[MERGE_SOURCE_FIELD]
+
+
+def test_merge_group_normalizes_identifiers_and_ignores_missing(profile):
+    records = [
+        record("a.pdf", english="John Smith", birth="02 JAN 1990", passport="a 123 456", 國籍=MISSING_VALUE),
+        record("b.pdf", english="John Smith", birth="1990/1/2", passport="A123456", 國籍="美國"),
+    ]
+    merged = merge_group(records, profile)
+    assert merged[BIRTH_FIELD] == "1990-01-02"
+    assert merged[PASSPORT_FIELD] == "A123456"
+    assert merged["國籍"] == "美國"
+    assert merged["性別"] == MISSING_VALUE
+    assert "值不一致" not in merged[MERGE_SOURCE_FIELD]
+
+
+def test_merge_duplicates_keeps_first_position_and_counts_merged(profile):
+    records = [
+        record("a.pdf", english="John Smith", passport="A123"),
+        record("b.pdf", english="Mary Jones", passport="B456"),
+        record("c.pdf", english="John Smith", passport="A123"),
+    ]
+    merged, removed = merge_duplicates(records, profile)
+    assert removed == 1
+    assert [r[ENGLISH_NAME_FIELD] for r in merged] == ["John Smith", "Mary Jones"]
+    assert merged[0]["來源檔案"] == "a.pdf、c.pdf"
+    assert merged[1] == records[1]
@@ -0,0 +1,25 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+from excel_style import BODY_ROW_HEIGHT, BODY_STYLE, HEADER_STYLE, write_styled_workbook
+
+
+def test_styled_workbook():
+    df = pd.DataFrame({
+        "姓名": ["王小明", None],
+        "其他工作經歷": [[], {"公司": "甲"}],
+        "年齡": [0, 35],
+    })
+    ws = load_workbook(write_styled_workbook(df, {"姓名": 20})).active
+
+    assert [c.value for c in ws[1]] == ["姓名", "其他工作經歷", "年齡"]
+    assert [c.value for c in ws[2]] == ["王小明", "[]", 0]
+    assert [c.value for c in ws[3]] == [None, "{'公司': '甲'}", 35]
+    assert ws[1][0].style == HEADER_STYLE
+    assert ws[2][1].style == BODY_STYLE and ws[2][2].style != BODY_STYLE
+    assert ws.column_dimensions["A"].width == 20
+
+    # 固定列高只套用在資料列，標題列與資料下方的空白列維持預設
+    assert ws.row_dimensions[2].height == ws.row_dimensions[3].height == BODY_ROW_HEIGHT
+    assert ws.row_dimensions[1].height is None and ws.row_dimensions[4].height is None
+    assert not ws.sheet_format.customHeight
@@ -0,0 +1,55 @@
+from job_queue import STALE_SECONDS, JobQueue
+from ocr_scheduler import SharedTokenBucket
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class File:
+    def __init__(self, name, data=b"data"):
+        self.name = name
+        self.data = data
+
+    def getvalue(self):
+        return self.data
+
+
+def test_stale_finalizing_job_is_handed_to_another_worker(tmp_path):
+    clock = Clock()
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), str(tmp_path / "jobs"), clock=clock)
+    job_id = queue.submit("審查人員", [File("a.pdf")], ["goldencard"])
+    task = queue.claim("w1")
+    queue.complete(task, "w1", {"goldencard": {"name": "a.pdf", "records": [], "level": "success"}})
+    assert queue.take_finished("w1") == [job_id]
+
+    # w1 彙整途中中止：心跳持續時不會被改派，逾時後回到處理中並由 w2 彙整
+    clock.now += STALE_SECONDS / 2
+    queue.beat("w1")
+    clock.now += STALE_SECONDS / 2 + 1
+    assert queue.claim("w2") is None
+    assert queue.job(job_id)["status"] == "finalizing"
+    clock.now += STALE_SECONDS
+    assert queue.claim("w2") is None
+    assert queue.job(job_id)["status"] == "running"
+    assert queue.take_finished("w2") == [job_id]
+    assert queue.is_active(job_id)
+    queue.finish(job_id, "done")
+    assert not queue.is_active(job_id)
+
+
+def test_shared_token_bucket_limits_all_holders(tmp_path):
+    clock, waits = Clock(), []
+    path = str(tmp_path / "jobs.sqlite")
+    a, b = (SharedTokenBucket(path, rate_per_minute=60, burst=2, clock=clock, sleep=waits.append) for _ in range(2))
+    a.acquire()
+    b.acquire()
+    assert waits == []
+    clock.now += 0.5
+    b.sleep = lambda seconds: (waits.append(seconds), setattr(clock, "now", clock.now + seconds))
+    b.acquire()
+    assert waits == [0.5]
@@ -0,0 +1,73 @@
+import pytest
+
+from json_stream import MISSING_VALUE, JsonArrayStreamParser, normalize_record, parse_records
+
+
+def feed_in_chunks(text, size):
+    parser = JsonArrayStreamParser()
+    records = []
+    for i in range(0, len(text), size):
+        records.extend(parser.feed(text[i:i + size]))
+    parser.close()
+    return records, parser
+
+
+def test_fenced_array_with_bom_and_prose():
+    text = '﻿說明如下：\n```json\n[{"姓名": "王小明"}, {"姓名": "李 \\"大\\" 華", "經歷": ["a", {"b": 1}]}]\n```\n以上'
+    records, parser = parse_records(text)
+    assert records == [{"姓名": "王小明"}, {"姓名": '李 "大" 華', "經歷": ["a", {"b": 1}]}]
+    assert parser.errors == []
+
+
+# 串流分段位置不影響結果（包含切在字串跳脫字元與括號中間）
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_chunk_boundaries(size):
+    text = '[{"a": "x}\\"]{", "b": [1, 2]}, {"a": "y"}]'
+    records, parser = feed_in_chunks(text, size)
+    assert records == [{"a": 'x}"]{', "b": [1, 2]}, {"a": "y"}]
+    assert parser.errors == []
+
+
+def test_single_object_is_one_record():
+    records, _ = parse_records('```json\n{"a": 1}\n```')
+    assert records == [{"a": 1}]
+
+
+# 上一個物件少了結尾括號：丟棄該物件，從下一個物件繼續
+def test_missing_closing_brace():
+    records, parser = parse_records('[{"a": 1, "b": "x", {"a": 2}, {"a": 3}]')
+    assert records == [{"a": 2}, {"a": 3}]
+    assert parser.errors == ['{"a": 1, "b": "x", ']
+
+
+# 陣列層級的非物件元素記為錯誤，前後的紀錄照常保留
+def test_stray_elements():
+    records, parser = parse_records('[{"a": 1}, "說明文字", 42, {"a": 2}, null]')
+    assert records == [{"a": 1}, {"a": 2}]
+    assert parser.errors == ['"說明文字"', "42", "null"]
+
+
+def test_invalid_object_is_skipped():
+    records, parser = parse_records('[{"a": 1}, {"a": 2,}, {"a": 3}]')
+    assert records == [{"a": 1}, {"a": 3}]
+    assert parser.errors == ['{"a": 2,}']
+
+
+# 輸出被截斷：已完成的紀錄保留，未完成的物件記為錯誤
+def test_truncated_output():
+    parser = JsonArrayStreamParser()
+    records = parser.feed('[{"a": 1}, {"a": "未完')
+    assert records == [{"a": 1}]
+    assert parser.close() == []
+    assert parser.errors == ['{"a": "未完']
+
+
+def test_no_json():
+    records, parser = parse_records("抱歉，無法辨識此檔案")
+    assert records == [] and not parser.started and parser.errors == []
+
+
+def test_normalize_record():
+    assert normalize_record(["a"], ["姓名"]) == (None, [])
+    record, missing = normalize_record({"姓名": "王"}, ["姓名", "國籍"])
+    assert record == {"姓名": "王", "國籍": MISSING_VALUE} and missing == ["國籍"]
@@ -0,0 +1,49 @@
+import io
+
+from ocr_engine import FakeModelClient, ocr_file
+from ocr_profiles import load_profile
+from ocr_scheduler import RequestScheduler
+
+
+class FlakyClient(FakeModelClient):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def generate(self, prompt, handle):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("temporary")
+        return super().generate(prompt, handle)
+
+
+def make_file():
+    f = io.BytesIO(b"%PDF-1.4")
+    f.name = "a.pdf"
+    return f
+
+
+def scheduler():
+    return RequestScheduler(rate_per_minute=6000, sleep=lambda seconds: None)
+
+
+def test_no_retry_message_without_retries():
+    result = ocr_file(make_file(), FlakyClient(0), load_profile("goldencard"), scheduler())
+    assert result["level"] == "success"
+    assert result["attempts"] == 2
+    assert "重試" not in result["message"]
+
+
+# 第二個以後的設定檔沿用上傳（上傳次數記為 0），產生內容的重試仍要回報
+def test_generate_retries_reported_for_shared_upload():
+    client = FlakyClient(1)
+    handle = client.upload(make_file())
+    result = ocr_file(make_file(), client, load_profile("goldencard"), scheduler(), uploaded=(handle, 0))
+    assert result["attempts"] == 2
+    assert "（API 重試 1 次）" in result["message"]
+
+
+def test_upload_and_generate_retries_are_added():
+    client = FlakyClient(2)
+    result = ocr_file(make_file(), client, load_profile("goldencard"), scheduler())
+    assert "（API 重試 2 次）" in result["message"]
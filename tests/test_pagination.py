@@ -0,0 +1,36 @@
+import pandas as pd
+
+import search_db
+from search_db import connect, migrate
+
+
+def all_pages(conn, table, sql, params, page_size):
+    rows, after = [], None
+    while True:
+        page_sql, page_params = search_db.page_query(table, sql, params, after=after, page_size=page_size)
+        df = pd.read_sql(page_sql, conn, params=page_params)
+        rows.extend(df.itertuples(index=False, name=None))
+        if len(df) < page_size:
+            return rows
+        key_cols = [c for c in df.columns if c.startswith("_page_key")]
+        after = [getattr(v, "item", lambda: v)() for v in df.iloc[-1][key_cols]]
+
+
+# 設備計畫沒有主鍵：鍵值為空或整列重複的計畫落在頁面邊界時，後續頁面不能遺漏或重複資料
+def test_smart_pages_cover_null_and_duplicate_keys(db_path):
+    conn = connect(db_path)
+    try:
+        migrate(conn)
+        company_id = conn.execute("SELECT company_id FROM smart_project LIMIT 1").fetchone()[0]
+        extra = [(company_id, None, None), (company_id, None, None), (company_id, 2023, None), (company_id, None, "無年度")]
+        conn.executemany("INSERT INTO smart_project (company_id, apply_year, plan_name) VALUES (?, ?, ?)", extra)
+        conn.commit()
+
+        sql, params = search_db.smart_query(company_id=str(company_id))
+        total = conn.execute(*search_db.count_query(sql, params)).fetchone()[0]
+        for page_size in (1, 2, 3, 7):
+            rows = all_pages(conn, "smart", sql, params, page_size)
+            assert len(rows) == total
+            assert len({row[:5] for row in rows}) == total
+    finally:
+        conn.close()
@@ -0,0 +1,61 @@
+import pytest
+
+from search_db import connect, migrate, roc_date_sql, typed_value
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2023-01-03", "2023-01-03"),
+    ("2023-04-28 00:00:00", "2023-04-28"),
+    ("2023/1/3", "2023-01-03"),
+    (" 2023.1.3 ", "2023-01-03"),
+    ("2023年1月3日", "2023-01-03"),
+    ("20230103", "2023-01-03"),
+    ("112/03/05", "2023-03-05"),
+    ("112/3/5", "2023-03-05"),
+    ("112年3月5日", "2023-03-05"),
+    ("1120305", "2023-03-05"),
+    (1120305, "2023-03-05"),
+    ("", None),
+    (None, None),
+    # 無法解析的值保留原值
+    ("待定", "待定"),
+    ("2023/2/30", "2023/2/30"),
+])
+def test_date_values(value, expected):
+    assert typed_value("date", value) == expected
+
+
+@pytest.mark.parametrize("kind, value, expected", [
+    ("amount", "1,234,567元", 1234567.0),
+    ("amount", "-500", -500.0),
+    ("amount", " -1,200.5 ", -1200.5),
+    ("amount", 300, 300),
+    ("amount", "  ", None),
+    ("amount", "未提供", "未提供"),
+    ("integer", "12345678.0", 12345678),
+    ("integer", -3.7, -3),
+    ("integer", "-42", -42),
+    ("text", 1.0, 1.0),
+])
+def test_number_values(kind, value, expected):
+    result = typed_value(kind, value)
+    assert result == expected and type(result) is type(expected)
+
+
+# 舊資料庫改型後既有日期全部保留，查詢時以民國年顯示，無法解析的值原樣顯示
+def test_migration_keeps_dates(db_path):
+    conn = connect(db_path)
+    try:
+        before = conn.execute("SELECT COUNT(apply_date), COUNT(visit_date) FROM ipo_info").fetchone()
+        conn.execute("UPDATE ipo_info SET meeting_date = '待定' WHERE rowid = 1")
+        conn.commit()
+        migrate(conn)
+        assert conn.execute("SELECT COUNT(apply_date), COUNT(visit_date) FROM ipo_info").fetchone() == before
+        assert conn.execute(
+            f"SELECT {roc_date_sql('apply_date')}, {roc_date_sql('meeting_date')} FROM ipo_info WHERE rowid = 1"
+        ).fetchone()[1] == "待定"
+        assert conn.execute(
+            f"SELECT {roc_date_sql('apply_date')} FROM ipo_info WHERE apply_date = '2023-04-28'"
+        ).fetchone() == ("112/4/28",)
+    finally:
+        conn.close()
@@ -0,0 +1,56 @@
+import zipfile
+
+import pandas as pd
+import pytest
+
+import search_db
+import search_export
+from db_import import import_sources
+from search_db import connect, migrate
+from test_db_import import write_csv
+
+
+# 匯入時無法解析的金額以原文保存，顯示與各格式匯出都不能因此失敗
+@pytest.fixture
+def conn(db_path, tmp_path):
+    conn = connect(db_path)
+    migrate(conn)
+    year, company_id, project = conn.execute(
+        "SELECT apply_year, company_id, project_name FROM rd_project LIMIT 1"
+    ).fetchone()
+    path = write_csv(tmp_path / "rd_item.csv", ["apply_year", "company_id", "project_name", "apply_amount"],
+                     [[year, company_id, project, "待補"]])
+    import_sources(conn, [("rd_item", path, None)])
+    yield conn, company_id
+    conn.close()
+
+
+def test_prepare_frame_blanks_unparsed_amounts(conn):
+    conn, company_id = conn
+    sql, params = search_db.rd_query(company_id=str(company_id))
+    df = search_export.prepare_frame("rd", pd.read_sql(sql, conn, params=params))
+    assert df["申請金額"].dtype == "float64"
+    assert df["申請金額"].isna().any()
+
+
+@pytest.mark.parametrize("fmt", list(search_export.EXPORT_FORMATS))
+def test_export_with_unparsed_amounts(conn, fmt):
+    conn, company_id = conn
+    sql, params = search_db.rd_query(company_id=str(company_id))
+    path = search_export.export(conn, [("研發資料", "rd", sql, params)], fmt)
+    try:
+        if fmt != "xlsx":
+            with zipfile.ZipFile(path) as zf:
+                assert zf.namelist()
+    finally:
+        search_export.os.remove(path)
+
+
+# Parquet schema 由欄位決定：第一批全為數值、後一批含原文時 schema 仍相同
+def test_arrow_batches_share_schema():
+    pytest.importorskip("pyarrow")
+    numeric = search_export.numeric_labels("rd")
+    first = search_export._arrow_batch(pd.DataFrame({"申請金額": [100.0], "公司統編": [1], "計畫名稱": ["a"]}), numeric)
+    second = search_export._arrow_batch(pd.DataFrame({"申請金額": ["待補"], "公司統編": [2], "計畫名稱": [None]}), numeric)
+    assert first.schema == second.schema
+    assert second.column("申請金額").to_pylist() == [None]
@@ -0,0 +1,84 @@
+import io
+
+import pytest
+
+from ocr_cache import sha256_hex
+from ocr_engine import FILE_TTL, FakeModelClient, upload_file
+from upload_registry import DEFAULT_SAFETY_MARGIN, ORPHAN_GRACE, UploadRegistry
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_file(data=b"%PDF-1.4 applicant"):
+    f = io.BytesIO(data)
+    f.name = "a.pdf"
+    return f
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def client(clock):
+    return FakeModelClient(clock=clock)
+
+
+@pytest.fixture
+def registry(tmp_path, clock):
+    return UploadRegistry(str(tmp_path / "cache.sqlite"), clock=clock)
+
+
+def test_registered_upload_is_reused(client, registry):
+    first, _ = upload_file(make_file(), client, registry=registry)
+    second, attempts = upload_file(make_file(), client, registry=registry)
+    assert second is first
+    assert client.uploads == 1 and attempts == 1
+    assert registry.get(sha256_hex(make_file().getvalue())) == first.name
+
+
+# 剩餘效期不足安全邊際時視為過期，重新上傳並更新登錄表
+def test_upload_near_expiry_is_replaced(client, registry, clock):
+    first, _ = upload_file(make_file(), client, registry=registry)
+    clock.now += FILE_TTL - DEFAULT_SAFETY_MARGIN
+    second, _ = upload_file(make_file(), client, registry=registry)
+    assert second.name != first.name
+    assert client.uploads == 2
+    assert registry.count() == 1
+
+
+# 遠端檔案已被刪除時忘記舊紀錄並重新上傳
+def test_missing_remote_file_is_forgotten(client, registry):
+    first, _ = upload_file(make_file(), client, registry=registry)
+    client.delete_file(first.name)
+    second, _ = upload_file(make_file(), client, registry=registry)
+    assert second.name != first.name
+    assert registry.get(sha256_hex(make_file().getvalue())) == second.name
+
+
+def test_forget(client, registry):
+    upload_file(make_file(), client, registry=registry)
+    registry.forget(sha256_hex(make_file().getvalue()))
+    assert registry.count() == 0
+
+
+def test_cleanup_removes_stale_entries_and_orphans(client, registry, clock):
+    kept, _ = upload_file(make_file(b"kept"), client, registry=registry)
+    expired, _ = upload_file(make_file(b"expired"), client, registry=registry)
+    registry.put(sha256_hex(b"expired"), expired.name, clock.now - 1)
+    orphan = client.upload(make_file(b"orphan"), display_name=registry.display_name("orphan"))
+    foreign = client.upload(make_file(b"foreign"), display_name="其他工具的檔案")
+    clock.now += ORPHAN_GRACE + 1
+    recent = client.upload(make_file(b"recent"), display_name=registry.display_name("recent"))
+
+    assert registry.cleanup(client) == (1, 2)
+    assert set(client.files) == {kept.name, foreign.name, recent.name}
+    assert registry.count() == 1
+    assert orphan.name not in client.files
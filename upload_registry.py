@@ -0,0 +1,90 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from ocr_cache import DEFAULT_CACHE_PATH
+
+# ✅ 剩餘效期不足此秒數的上傳視為過期（避免產生內容途中檔案被刪除）
+DEFAULT_SAFETY_MARGIN = 3600
+# 上傳時的顯示名稱前綴：清理時只刪除本工具上傳、但登錄表已不認得的檔案
+DISPLAY_PREFIX = "ocr-upload:"
+# 剛上傳、可能尚未寫入登錄表的檔案不視為孤立
+ORPHAN_GRACE = 600
+
+
+# --- 已上傳檔案登錄表：檔案內容雜湊 → 遠端檔案名稱與到期時間（與 OCR 快取存在同一個 SQLite 檔）---
+class UploadRegistry:
+    def __init__(self, path=DEFAULT_CACHE_PATH, safety_margin=DEFAULT_SAFETY_MARGIN, clock=time.time):
+        self.path = path
+        self.safety_margin = safety_margin
+        self.clock = clock
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS upload_handle (
+                    file_hash TEXT PRIMARY KEY,
+                    remote_name TEXT,
+                    expires_at REAL,
+                    created_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_upload_handle_expires ON upload_handle(expires_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def display_name(file_hash):
+        return DISPLAY_PREFIX + file_hash
+
+    # 回傳仍有效的遠端檔案名稱；沒有或即將到期時回傳 None
+    def get(self, file_hash):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT remote_name FROM upload_handle WHERE file_hash = ? AND expires_at > ?",
+                (file_hash, self.clock() + self.safety_margin),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, file_hash, remote_name, expires_at):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO upload_handle VALUES (?, ?, ?, ?)",
+                (file_hash, remote_name, expires_at, self.clock()),
+            )
+
+    def forget(self, file_hash):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM upload_handle WHERE file_hash = ?", (file_hash,))
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM upload_handle").fetchone()[0]
+
+    # --- 清理：移除過期紀錄、遠端已不存在的紀錄，並刪除遠端上由本工具上傳但未登錄（孤立）的檔案 ---
+    # client 需提供 list_files() → [(遠端名稱, 顯示名稱, 建立時間, 到期時間)] 與 delete_file(遠端名稱)
+    # 回傳 (移除的登錄筆數, 刪除的遠端檔案數)
+    def cleanup(self, client):
+        now = self.clock()
+        remote = {name: (display_name, created_at) for name, display_name, created_at, _ in client.list_files()}
+        with self._connect() as conn:
+            rows = conn.execute("SELECT file_hash, remote_name, expires_at FROM upload_handle").fetchall()
+            stale = {h for h, name, expires_at in rows if expires_at <= now or name not in remote}
+            conn.executemany("DELETE FROM upload_handle WHERE file_hash = ?", [(h,) for h in stale])
+        live = {name for h, name, _ in rows if h not in stale}
+
+        deleted = 0
+        for name, (display_name, created_at) in remote.items():
+            orphan = name not in live and created_at < now - ORPHAN_GRACE
+            if orphan and (display_name or "").startswith(DISPLAY_PREFIX):
+                try:
+                    client.delete_file(name)
+                    deleted += 1
+                except Exception:
+                    pass  # 其他程序同時刪除或已到期，下次清理再處理
+        return len(stale), deleted